@@ -5,8 +5,12 @@ import pandas as pd
 import threading
 import atexit
 from utils.audio_transcribe import ensure_cache_folders
-from utils.responses_cache import get_cached_response, store_response
-from utils.google_clients import read_google_sheets
+from utils.responses_cache import get_cached_response, store_response, get_response_index
+from utils.application_store import normalize_application_id
+from utils.hf_utils import commit_buffer
+from utils.results_store import results_writer
+from utils.stage_ledger import get_stage_ledger
+from utils.sheet_snapshot import get_sheet_snapshot, invalidate_sheet_snapshot
 from constants import APPLICATION_ID, FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME
 from utils.filter_responses import filter_responses
 from main import run_scoring_pipeline
@@ -72,13 +76,11 @@ def load_application_ids():
         # Create cache folders if they don't exist
         ensure_cache_folders()
         
-        # Read the filtration sheet
-        df = read_google_sheets(FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME)
+        # Read the filtration sheet from the shared snapshot so reruns don't download it again
+        snapshot = get_sheet_snapshot(FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME)
         
-        if APPLICATION_ID in df.columns:
-            app_ids = df[APPLICATION_ID].dropna().unique().tolist()
-            app_ids = [str(int(id)) for id in app_ids if str(id).strip()]
-            return app_ids
+        if APPLICATION_ID in snapshot.df.columns:
+            return [str(id) for id in snapshot.record_store.ids()]
         else:
             st.error(f"Column '{APPLICATION_ID}' not found in sheet")
             return []
@@ -225,6 +227,11 @@ def generate_analysis(app_id, local_folder=LOCAL_FOLDER):
             # Run the scoring pipeline
             app_id = int(app_id)
             run_scoring_pipeline(local_folder, app_id)
+            # Commit this application's responses together now instead of on the next interval flush.
+            # Buffered shard records are queued first: a killed Streamlit process never runs atexit.
+            get_stage_ledger().sync()
+            results_writer.flush()
+            commit_buffer.flush(reason="analysis generated")
             st.success(f"Analysis generated for Application ID {app_id}")
         except Exception as e:
             logging.exception(f"Error generating analysis: {str(e)}")
@@ -241,13 +248,20 @@ def main():
     # Load application IDs
     app_ids = load_application_ids()
     
+    # One listing of the responses dataset tells which applications are already analysed
+    try:
+        scored_ids = get_response_index().complete_ids()
+    except Exception as e:
+        logging.error(f"Error loading response index: {str(e)}")
+        scored_ids = set()
+    
     # Application ID dropdown
     if app_ids:
         selected_id = st.selectbox(
             "Select Application ID",
             options=app_ids,
             index=0 if app_ids else None,
-            format_func=lambda x: f"Application #{x}"
+            format_func=lambda x: f"Application #{x}" + (" ✓" if normalize_application_id(x) in scored_ids else "")
         )
         
         # Generate buttons
@@ -268,6 +282,12 @@ def main():
                 # Just clear the UI by setting the flag
                 st.session_state.show_results = False
                 st.success("Output cleared. The cached analysis is still available.")
+
+        with col3:
+            if st.button("Refresh Sheet"):
+                # Drop the shared snapshot so new applications show up before its TTL expires
+                invalidate_sheet_snapshot(FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME)
+                st.rerun()
         
         # Display JSON responses only if show_results is True
         if selected_id and st.session_state.show_results:
@@ -0,0 +1,209 @@
+"""
+Staged batch engine for scoring many applications.
+
+The scoring pipeline is split into fetch -> transcode -> transcribe -> score -> persist
+stages. Each stage has its own pool of worker threads and hands applications to the
+next stage through a bounded queue, so Drive downloads, ffmpeg, transcription and LLM
+calls for different applications overlap while memory and disk use stay bounded.
+"""
+import logging
+import queue
+import threading
+import time
+
+from constants import FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME, LOCAL_FOLDER, SCORING_MODE
+from main import pipeline_stages, run_stage
+from utils.sheet_snapshot import get_sheet_snapshot
+from utils.transcode_pool import get_transcode_pool, TRANSCODE_WORKERS
+
+logger = logging.getLogger("batch_pipeline")
+
+# Worker threads per stage. Fetch, transcribe and score are network-bound; transcode is CPU-bound
+# and sized to the transcode pool, which runs the actual ffmpeg processes.
+DEFAULT_STAGE_WORKERS = {
+    "fetch": 2,
+    "transcode": TRANSCODE_WORKERS,
+    "transcribe": 2,
+    "score": 2,
+    "persist": 1,
+}
+DEFAULT_QUEUE_SIZE = 2
+
+
+def stage_workers_for_concurrency(concurrency: int) -> dict:
+    """
+    Stage workers for running `concurrency` applications at once.
+
+    The network-bound stages get `concurrency` workers each and are held to their APIs'
+    budgets by the shared rate limiters. Transcode is CPU-bound, so it gets one worker per
+    transcode pool slot (TRANSCODE_WORKERS) whatever the network concurrency.
+    """
+    concurrency = max(1, concurrency)
+    return {
+        "fetch": concurrency,
+        "transcode": TRANSCODE_WORKERS,
+        "transcribe": concurrency,
+        "score": concurrency,
+        "persist": 1,
+    }
+
+# Marks the end of the input on a stage queue
+_DONE = object()
+
+
+class StageStats:
+    """Per-stage counters collected while a batch runs."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def record(self, started_at: float, finished_at: float, ok: bool):
+        with self._lock:
+            if ok:
+                self.processed += 1
+            else:
+                self.failed += 1
+            self.busy_seconds += finished_at - started_at
+            self.started_at = started_at if self.started_at is None else min(self.started_at, started_at)
+            self.finished_at = finished_at if self.finished_at is None else max(self.finished_at, finished_at)
+
+    def as_dict(self) -> dict:
+        """Counts, busy time and throughput (applications per minute of stage wall time)."""
+        wall_seconds = (self.finished_at - self.started_at) if self.started_at is not None else 0.0
+        handled = self.processed + self.failed
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 2),
+            "wall_seconds": round(wall_seconds, 2),
+            "throughput_per_min": round(handled * 60 / wall_seconds, 2) if wall_seconds > 0 else None,
+            "avg_seconds": round(self.busy_seconds / handled, 2) if handled else None,
+        }
+
+
+class BatchResult:
+    """Outcome of run_scoring_batch."""
+
+    def __init__(self, results: dict, failures: dict, stage_stats: list, elapsed_seconds: float):
+        # Application ID -> (behavior JSON, skill JSON), in input order
+        self.results = results
+        # Application ID -> (stage name, exception)
+        self.failures = failures
+        self.stage_stats = stage_stats
+        self.elapsed_seconds = elapsed_seconds
+
+    def stats(self) -> list:
+        return [stats.as_dict() for stats in self.stage_stats]
+
+
+def _stage_worker(name, func, inbox, outbox, downstream_workers, stats, failures, remaining, lock):
+    while True:
+        context = inbox.get()
+        if context is _DONE:
+            break
+        started_at = time.perf_counter()
+        try:
+            context = run_stage(name, func, context)
+            ok = True
+        except Exception as e:
+            ok = False
+            failures[context["id"]] = (name, e)
+            logger.error(f"[{name}] Failed for application ID {context['id']}: {e}")
+        stats.record(started_at, time.perf_counter(), ok)
+        if ok:
+            outbox.put(context)
+
+    # The last worker of a stage to finish passes an end marker to every downstream worker
+    with lock:
+        remaining[name] -= 1
+        last = remaining[name] == 0
+    if last:
+        for _ in range(downstream_workers):
+            outbox.put(_DONE)
+
+
+def run_scoring_batch(ids, local_directory: str = LOCAL_FOLDER, snapshot=None, stage_workers: dict = None,
+                      queue_size: int = DEFAULT_QUEUE_SIZE, scoring_mode: str = SCORING_MODE) -> BatchResult:
+    """
+    Score many applications through the staged pipeline.
+
+    Args:
+        ids: Application IDs to process. Results are reported in this order.
+        local_directory: Folder holding per-application scratch directories
+        snapshot: Pre-fetched filtration sheet snapshot. Defaults to the shared cached one.
+        stage_workers: Overrides for DEFAULT_STAGE_WORKERS
+        queue_size: Capacity of the queue in front of each stage
+        scoring_mode: Passed to the score stage ("concurrent", "sequential" or "combined")
+
+    Returns:
+        BatchResult: Per-application results and failures, and per-stage statistics
+    """
+    ids = list(ids)
+    workers = dict(DEFAULT_STAGE_WORKERS, **(stage_workers or {}))
+    snapshot = snapshot or get_sheet_snapshot(FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME)
+    records = snapshot.record_store
+    stages = pipeline_stages(records, local_directory, scoring_mode)
+
+    # Queue i feeds stage i; the persist stage hands finished contexts to the collector
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages] + [queue.Queue()]
+    stage_stats = [StageStats(name, workers[name]) for name, _ in stages]
+    failures = {}
+    remaining = {name: workers[name] for name, _ in stages}
+    lock = threading.Lock()
+    started_at = time.perf_counter()
+
+    threads = []
+    for index, (name, func) in enumerate(stages):
+        # The collector after the last stage reads a single end marker
+        downstream_workers = workers[stages[index + 1][0]] if index + 1 < len(stages) else 1
+        for worker in range(workers[name]):
+            thread = threading.Thread(
+                target=_stage_worker,
+                args=(name, func, queues[index], queues[index + 1], downstream_workers,
+                      stage_stats[index], failures, remaining, lock),
+                name=f"batch-{name}-{worker}",
+                daemon=True,
+            )
+            thread.start()
+            threads.append(thread)
+
+    logger.info(f"Starting batch of {len(ids)} applications with stage workers {workers}")
+    for id in ids:
+        queues[0].put({"id": id})
+    for _ in range(workers["fetch"]):
+        queues[0].put(_DONE)
+
+    try:
+        for thread in threads:
+            thread.join()
+    except BaseException:
+        # Interrupted: kill running ffmpeg processes rather than leaving them behind
+        get_transcode_pool().cancel_all()
+        raise
+
+    completed = {}
+    while True:
+        context = queues[-1].get()
+        if context is _DONE:
+            break
+        completed[context["id"]] = (context["results"]["behavior"], context["results"]["skill"])
+
+    results = {id: completed[id] for id in ids if id in completed}
+    batch_result = BatchResult(results, failures, stage_stats, time.perf_counter() - started_at)
+    logger.info(
+        f"Batch finished in {batch_result.elapsed_seconds:.1f}s: "
+        f"{len(results)} succeeded, {len(failures)} failed"
+    )
+    for stats in batch_result.stats():
+        logger.info(f"Stage stats: {stats}")
+    logger.info(f"Transcode pool stats: {get_transcode_pool().stats()}")
+    return batch_result
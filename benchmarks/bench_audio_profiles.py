@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Compare the audio profiles used to extract a pitch's audio for transcription.
+
+Encodes the same sample audio with every profile in AUDIO_PROFILES and reports encode
+time, file size, bitrate and how many minutes of audio fit under the transcription
+upload limit. With --transcribe, each file is also transcribed with the pipeline's
+primary model through the configured backend (TRANSCRIPTION_BACKEND; OPENAI_BASE_URL is
+honored) and the transcript length is reported.
+
+The sample is generated locally with ffmpeg: synthesized speech when ffmpeg was built
+with flite, otherwise a speech-band test signal (fine for size and time, but it has no
+words to transcribe). Pass --input to use a real recording instead; --transcribe
+requires speech, so without flite it needs --input.
+
+Usage:
+    python benchmarks/bench_audio_profiles.py [--seconds 300] [--input pitch.mp4] [--transcribe]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.audio_transcribe import (AUDIO_PROFILES, TRANSCRIPTION_MAX_UPLOAD_BYTES, audio_duration_seconds,
+                                    audio_encoding_args, transcribe_audio_file)
+from utils.transcription_strategy import TRANSCRIPTION_PRIMARY_MODEL
+
+SAMPLE_TEXT = (
+    "Hi, I'm the founder of a logistics startup. We have talked to fifty customers, "
+    "shipped three product iterations in two months and signed our first paying client. "
+)
+
+
+def ffmpeg(*args):
+    subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", *args], check=True, capture_output=True)
+
+
+def generate_sample(path: str, seconds: float):
+    """Writes `seconds` of 44.1 kHz stereo sample audio to a WAV file. Returns whether it is speech."""
+    text_path = os.path.join(os.path.dirname(path), "sample.txt")
+    with open(text_path, "w") as f:
+        f.write(SAMPLE_TEXT * 200)
+    try:
+        ffmpeg("-f", "lavfi", "-i", f"flite=textfile={text_path}", "-t", str(seconds),
+               "-ar", "44100", "-ac", "2", path)
+        return True
+    except subprocess.CalledProcessError:
+        # Voice-band tones with syllable-like amplitude modulation over background noise
+        ffmpeg("-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+               "-f", "lavfi", "-i", f"sine=frequency=1250:duration={seconds}",
+               "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.05:duration={seconds}",
+               "-filter_complex", "[0][1][2]amix=inputs=3,tremolo=f=4:d=0.8",
+               "-ar", "44100", "-ac", "2", path)
+        return False
+
+
+def run_profile(profile: str, source: str, directory: str, transcribe: bool) -> dict:
+    output_path = os.path.join(directory, f"sample_{profile}{AUDIO_PROFILES[profile]['extension']}")
+    started_at = time.perf_counter()
+    try:
+        ffmpeg("-i", source, *audio_encoding_args(profile), output_path)
+    except subprocess.CalledProcessError:
+        return {"profile": profile, "error": "encoder not available in this ffmpeg build"}
+    encode_seconds = time.perf_counter() - started_at
+
+    size = os.path.getsize(output_path)
+    seconds = audio_duration_seconds(output_path)
+    report = {
+        "profile": profile,
+        "encode_seconds": encode_seconds,
+        "size_mb": size / 1024 / 1024,
+        "kbps": size * 8 / 1000 / seconds,
+        "max_minutes": TRANSCRIPTION_MAX_UPLOAD_BYTES / (size / seconds) / 60,
+        "transcript_chars": None,
+    }
+    if transcribe:
+        started_at = time.perf_counter()
+        transcript = transcribe_audio_file(output_path, TRANSCRIPTION_PRIMARY_MODEL, seconds)
+        report["transcribe_seconds"] = time.perf_counter() - started_at
+        report["transcript_chars"] = len(transcript)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=300, help="Length of the generated sample")
+    parser.add_argument("--input", help="Audio or video file to encode instead of a generated sample")
+    parser.add_argument("--transcribe", action="store_true", help="Also transcribe every encoding")
+    args = parser.parse_args()
+
+    if shutil.which("ffmpeg") is None:
+        sys.exit("ffmpeg is required")
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = args.input
+        if source is None:
+            source = os.path.join(directory, "sample.wav")
+            if not generate_sample(source, args.seconds):
+                if args.transcribe:
+                    sys.exit("ffmpeg has no flite support, so the generated sample has no speech to transcribe: "
+                             "pass --input with a recording to use --transcribe")
+                print("ffmpeg has no flite support, using a speech-band test signal\n")
+        reports = [run_profile(profile, source, directory, args.transcribe) for profile in AUDIO_PROFILES]
+
+    print(f"{'profile':<12} {'encode s':>9} {'size MB':>8} {'kbps':>6} {'max min':>8} {'transcript':>11}")
+    for report in reports:
+        if "error" in report:
+            print(f"{report['profile']:<12} {report['error']}")
+            continue
+        transcript = report["transcript_chars"] if report["transcript_chars"] is not None else "-"
+        print(f"{report['profile']:<12} {report['encode_seconds']:>9.2f} {report['size_mb']:>8.2f} "
+              f"{report['kbps']:>6.0f} {report['max_minutes']:>8.0f} {transcript:>11}")
+
+    baseline = next((r for r in reports if r["profile"] == "mp3_hifi" and "error" not in r), None)
+    if baseline:
+        print()
+        for report in reports:
+            if report is not baseline and "error" not in report:
+                print(f"{report['profile']} is {1 - report['size_mb'] / baseline['size_mb']:.0%} smaller than mp3_hifi "
+                      f"and encodes {baseline['encode_seconds'] / report['encode_seconds']:.1f}x as fast")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Compare combined versus separate skill and behavior scoring.
+
+Runs both scoring modes against the local stub OpenAI server and reports, per
+application, input tokens sent and wall-clock latency. Separate mode issues the two
+assessment requests concurrently, as SCORING_MODE=concurrent does. The OpenAI rate
+limiters are turned off, so only the scoring modes are compared.
+
+Usage:
+    python benchmarks/bench_combined_scoring.py [--applications 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# The shared OpenAI rate limiters would otherwise dominate the latencies, and which mode
+# drained the bucket first would decide the result
+os.environ["OPENAI_REQUESTS_PER_MINUTE"] = "0"
+os.environ["OPENAI_TOKENS_PER_MINUTE"] = "0"
+
+from benchmarks.stub_openai_server import StubOpenAIServer
+
+SAMPLE_TRANSCRIPT = (
+    "Hi, I'm the founder of a logistics startup. We have talked to fifty customers, "
+    "shipped three product iterations in two months and signed our first paying client. "
+) * 60
+SAMPLE_COMPANY_DETAILS = "COMPANY PROFILE\n" + "=" * 50 + "\n\n" + "Vision: Same-day delivery for every town.\n" * 40
+
+
+def run_mode(server, mode: str, applications: int) -> dict:
+    from main import COMBINED_DIMENSIONS, generate_dimension, generate_combined
+
+    latencies = []
+    server.reset()
+    for _ in range(applications):
+        started_at = time.perf_counter()
+        if mode == "combined":
+            results, errors = generate_combined(COMBINED_DIMENSIONS, SAMPLE_COMPANY_DETAILS, SAMPLE_TRANSCRIPT)
+            assert not errors and set(results) == set(COMBINED_DIMENSIONS), errors
+        else:
+            with ThreadPoolExecutor(max_workers=len(COMBINED_DIMENSIONS)) as executor:
+                futures = [executor.submit(generate_dimension, dimension, SAMPLE_COMPANY_DETAILS, SAMPLE_TRANSCRIPT)
+                           for dimension in COMBINED_DIMENSIONS]
+                results = [future.result() for future in futures]
+        latencies.append(time.perf_counter() - started_at)
+
+    requests = list(server.requests)
+    return {
+        "mode": mode,
+        "requests_per_app": len(requests) / applications,
+        "input_tokens_per_app": sum(r["prompt_tokens"] for r in requests) / applications,
+        "output_tokens_per_app": sum(r["completion_tokens"] for r in requests) / applications,
+        "median_latency": statistics.median(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--applications", type=int, default=5)
+    args = parser.parse_args()
+
+    with StubOpenAIServer() as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        reports = [run_mode(server, mode, args.applications) for mode in ("separate", "combined")]
+
+    separate, combined = reports
+    print(f"{'mode':<10} {'requests':>9} {'input tok':>10} {'output tok':>11} {'latency s':>10}")
+    for report in reports:
+        print(f"{report['mode']:<10} {report['requests_per_app']:>9.1f} {report['input_tokens_per_app']:>10.0f} "
+              f"{report['output_tokens_per_app']:>11.0f} {report['median_latency']:>10.2f}")
+    saved = 1 - combined["input_tokens_per_app"] / separate["input_tokens_per_app"]
+    print(f"\nCombined mode sends {saved:.0%} fewer input tokens per application "
+          f"({combined['median_latency'] / separate['median_latency']:.2f}x the latency of separate mode).")
+
+
+if __name__ == "__main__":
+    main()
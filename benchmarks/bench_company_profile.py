@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of company profile formatting.
+
+Compares the original per-call formatter with the compiled formatter, both cold
+(every row formatted) and warm (unchanged rows served from the memo), over a
+synthetic cohort shaped like the filtration sheet.
+
+Usage:
+    python benchmarks/bench_company_profile.py [--rows 2000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import filter_responses as fr
+
+
+def legacy_format_company_response(company_response):
+    """The formatter as it was before compilation, kept here as the baseline."""
+    formatted_text = "COMPANY PROFILE\n" + "=" * 50 + "\n\n"
+    formatted_text += "Basic Information:\n" + "-" * 20 + "\n"
+    if "What is your vision for the company?" in company_response:
+        formatted_text += f"Vision: {company_response.get('What is your vision for the company?')}\n\n"
+    if "What is the greater mission beyond building a profitable business?" in company_response:
+        formatted_text += f"Mission: {company_response.get('What is the greater mission beyond building a profitable business?')}\n\n"
+    if "Describe your solution in detail" in company_response:
+        formatted_text += f"Solution: {company_response.get('Describe your solution in detail')}\n\n"
+
+    sections = [
+        ("\nMarket Information:\n" + "-" * 20 + "\n", list(fr.MARKET_FIELDS), "{}: {}\n"),
+        ("\nCustomer Information:\n" + "-" * 20 + "\n", list(fr.CUSTOMER_FIELDS), "{}: {}\n"),
+        ("\nTeam Skills and Traits:\n" + "-" * 20 + "\n" + "Skills (rated 1-5):\n", list(fr.SKILL_FIELDS), "- {}: {}\n"),
+        ("\nTraits (rated 1-5):\n", list(fr.TRAIT_FIELDS), "- {}: {}\n"),
+        ("\nProduct Information:\n" + "-" * 20 + "\n", list(fr.PRODUCT_FIELDS), "{}: {}\n"),
+        ("\nTeam Background:\n" + "-" * 20 + "\n", list(fr.BACKGROUND_FIELDS), "{}:\n{}\n\n"),
+    ]
+    categorized = []
+    for heading, fields, line in sections:
+        formatted_text += heading
+        for field in fields:
+            if field in company_response and company_response[field]:
+                formatted_text += line.format(field, company_response[field])
+        categorized += fields
+
+    remaining_fields = set(company_response.keys()) - set(categorized + [field for field, _ in fr.BASIC_FIELDS])
+    if remaining_fields:
+        formatted_text += "\nAdditional Information:\n" + "-" * 20 + "\n"
+        for field in remaining_fields:
+            if company_response[field]:
+                formatted_text += f"{field}: {company_response[field]}\n"
+    return formatted_text
+
+
+def make_rows(count: int) -> list:
+    fields = ([field for field, _ in fr.BASIC_FIELDS] + fr.MARKET_FIELDS + fr.CUSTOMER_FIELDS + fr.SKILL_FIELDS +
+              fr.TRAIT_FIELDS + fr.PRODUCT_FIELDS + fr.BACKGROUND_FIELDS +
+              [f"Additional question {n}" for n in range(10)])
+    rows = []
+    for id in range(count):
+        row = {}
+        for position, field in enumerate(fields):
+            if field in fr.SKILL_FIELDS or field in fr.TRAIT_FIELDS:
+                row[field] = (id + position) % 5 + 1
+            elif (id + position) % 7 == 0:
+                row[field] = ""
+            else:
+                row[field] = f"Answer {position} for application {id}. " * 3
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    for id, row in enumerate(rows):
+        expected = sorted(legacy_format_company_response(row).splitlines())
+        assert sorted(fr.format_company_response(row, id=id).splitlines()) == expected, f"Output differs for row {id}"
+
+    def legacy():
+        for row in rows:
+            legacy_format_company_response(row)
+
+    def compiled_cold():
+        fr.clear_company_profile_cache()
+        for id, row in enumerate(rows):
+            fr.format_company_response(row, id=id)
+
+    def compiled_warm():
+        for id, row in enumerate(rows):
+            fr.format_company_response(row, id=id)
+
+    fr.PROFILE_CACHE_SIZE = max(fr.PROFILE_CACHE_SIZE, args.rows)
+    compiled_warm()
+    timings = {
+        "legacy": min(timeit.repeat(legacy, number=1, repeat=args.repeat)),
+        "compiled (cold)": min(timeit.repeat(compiled_cold, number=1, repeat=args.repeat)),
+    }
+    compiled_warm()
+    timings["compiled (memoized)"] = min(timeit.repeat(compiled_warm, number=1, repeat=args.repeat))
+
+    print(f"Formatting {args.rows} profiles, best of {args.repeat}:")
+    for name, seconds in timings.items():
+        speedup = timings["legacy"] / seconds if seconds else float("inf")
+        print(f"  {name:<20} {seconds * 1000:8.2f} ms  {seconds / args.rows * 1e6:7.2f} us/row  {speedup:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Check chunked transcription against the local stub server.
+
+Synthesizes a pitch of tone words (see benchmarks/stub_openai_server.py) whose transcript
+is known exactly, with a few long pauses, and transcribes it whole and in overlapping
+chunks. The stitched transcript must equal the expected one word for word: any word
+duplicated or lost at a chunk boundary is reported. Also prints both latencies.
+
+Usage:
+    python benchmarks/check_chunked_transcription.py [--words 600] [--chunk-seconds 60] [--overlap 5] [--concurrency 4]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.stub_openai_server import StubOpenAIServer, synthesize_tone_words, tone_word
+from constants import AUDIO_PROFILE
+from utils.audio_preprocess import decode_levels, encode_pcm
+from utils.audio_transcribe import AUDIO_PROFILES, transcribe_audio_file
+from utils.chunked_transcription import plan_chunks, transcribe_chunked
+
+
+def first_difference(expected: list, actual: list):
+    for index, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            return index
+    return None if len(expected) == len(actual) else min(len(expected), len(actual))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=600)
+    parser.add_argument("--chunk-seconds", type=float, default=60)
+    parser.add_argument("--overlap", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    if shutil.which("ffmpeg") is None:
+        sys.exit("ffmpeg is required")
+
+    # A long pause every 97 words, like a speaker stopping to change slides
+    pauses = {index: 2.5 for index in range(97, args.words, 97)}
+    expected = [tone_word(index) for index in range(args.words)]
+
+    with tempfile.TemporaryDirectory() as directory, StubOpenAIServer() as server:
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        audio_path = os.path.join(directory, f"pitch{AUDIO_PROFILES[AUDIO_PROFILE]['extension']}")
+        encode_pcm(synthesize_tone_words(args.words, pauses), audio_path, AUDIO_PROFILE)
+        levels, duration = decode_levels(audio_path)
+        print(f"{duration:.0f}s of audio, {args.words} words")
+        print(f"Chunks: {plan_chunks(levels, duration, args.chunk_seconds, args.overlap)}")
+
+        started_at = time.perf_counter()
+        whole = transcribe_audio_file(audio_path, "whisper-1").split()
+        whole_seconds = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        chunked = transcribe_chunked(audio_path, "whisper-1", chunk_seconds=args.chunk_seconds,
+                                     overlap_seconds=args.overlap, concurrency=args.concurrency).split()
+        chunked_seconds = time.perf_counter() - started_at
+
+    print(f"Whole file: {len(whole)} words in {whole_seconds:.2f}s")
+    print(f"Chunked:    {len(chunked)} words in {chunked_seconds:.2f}s")
+    ok = True
+    for name, words in (("whole file", whole), ("chunked", chunked)):
+        index = first_difference(expected, words)
+        if index is not None:
+            ok = False
+            print(f"{name} transcript differs from word {index}: expected {expected[index:index + 8]}, "
+                  f"got {words[index:index + 8]}")
+    print("Stitched transcript matches the expected words" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
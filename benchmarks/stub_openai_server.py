@@ -0,0 +1,241 @@
+"""
+Local stand-in for the OpenAI HTTP API, used by the benchmark scripts.
+
+Serves /v1/chat/completions with canned assessment JSON and token usage, and sleeps
+for a latency modelled on prompt and completion size so different request shapes can
+be compared without network access or API cost. Point the OpenAI client at it with
+OPENAI_BASE_URL=<server.base_url>.
+
+Tokens are estimated as characters / 4.
+
+/v1/audio/transcriptions transcribes "tone words": audio in which every word is a short
+sine tone whose frequency encodes the word (see synthesize_tone_words). Tests can build
+audio whose exact transcript is known, e.g. to check how chunked transcripts are stitched.
+Decoding the upload needs ffmpeg.
+"""
+import json
+import subprocess
+import threading
+import time
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+SKILLS = [
+    "Analytical", "Communication", "Judgement", "Negotiation", "Problem Solving",
+    "Financial", "Technical", "Sales and Marketing", "Project Management", "Network Building",
+]
+BEHAVIORS = [
+    "Conviction", "Relentless", "Resilience", "Curiosity", "Reliable", "Believable",
+    "Courage", "Innovative", "Energy", "Trustworthy", "Inspirational", "Clarity",
+]
+
+
+TONE_SAMPLE_RATE = 16000
+TONE_WORD_SECONDS = 0.4
+TONE_GAP_SECONDS = 0.15
+TONE_BASE_HZ = 300.0
+TONE_STEP_HZ = 12.5
+# Distinct tone words; word indices repeat with this period
+TONE_VOCABULARY = 200
+# Tones shorter than this (cut off at a chunk edge) are not heard as a word
+TONE_MIN_SECONDS = 0.2
+
+
+def tone_word(index: int) -> str:
+    return f"w{index % TONE_VOCABULARY}"
+
+
+def synthesize_tone_words(count: int, pauses: dict = None) -> np.ndarray:
+    """
+    16 kHz mono float samples of `count` tone words, w0 w1 ... (repeating), with a short gap
+    between words.
+
+    Args:
+        pauses: Word index -> extra seconds of silence before that word
+    """
+    pauses = pauses or {}
+    t = np.arange(int(TONE_WORD_SECONDS * TONE_SAMPLE_RATE)) / TONE_SAMPLE_RATE
+    # Short fades so the tone edges do not click
+    envelope = np.minimum(1.0, np.minimum(t, TONE_WORD_SECONDS - t) / 0.02)
+    pieces = []
+    for index in range(count):
+        silence = TONE_GAP_SECONDS + pauses.get(index, 0.0)
+        pieces.append(np.zeros(int(silence * TONE_SAMPLE_RATE)))
+        frequency = TONE_BASE_HZ + (index % TONE_VOCABULARY) * TONE_STEP_HZ
+        pieces.append(0.3 * envelope * np.sin(2 * np.pi * frequency * t))
+    pieces.append(np.zeros(int(TONE_GAP_SECONDS * TONE_SAMPLE_RATE)))
+    return np.concatenate(pieces).astype(np.float32)
+
+
+def transcribe_tone_words(audio: bytes):
+    """Decodes uploaded audio with ffmpeg and reads its tone words. Returns (text, audio seconds)."""
+    pcm = subprocess.run(["ffmpeg", "-loglevel", "error", "-i", "pipe:0", "-ac", "1", "-ar", str(TONE_SAMPLE_RATE),
+                          "-f", "s16le", "pipe:1"], input=audio, capture_output=True, check=True).stdout
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+    frame = TONE_SAMPLE_RATE // 100
+    frame_count = len(samples) // frame
+    levels = np.sqrt(np.mean(np.square(samples[:frame_count * frame].reshape(frame_count, frame)), axis=1))
+    voiced = np.concatenate(([0], (levels > 0.02).astype(np.int8), [0]))
+    words = []
+    for start, end in np.flatnonzero(np.diff(voiced)).reshape(-1, 2):
+        if (end - start) * frame < TONE_MIN_SECONDS * TONE_SAMPLE_RATE:
+            continue
+        burst = samples[start * frame:end * frame]
+        spectrum = np.abs(np.fft.rfft(burst * np.hanning(len(burst))))
+        frequency = np.fft.rfftfreq(len(burst), 1 / TONE_SAMPLE_RATE)[spectrum.argmax()]
+        words.append(tone_word(int(round((frequency - TONE_BASE_HZ) / TONE_STEP_HZ))))
+    return " ".join(words), len(samples) / TONE_SAMPLE_RATE
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _assessment(names):
+    return {
+        name: {
+            "Citations": f"Stub citation for {name}.",
+            "Reasoning": f"Stub reasoning for {name}, generated by the local stub server.",
+            "Rating": 7,
+        }
+        for name in names
+    }
+
+
+def stub_chat_content(system_prompt: str) -> dict:
+    """The JSON a stub chat completion returns for a system prompt."""
+    if "Combined Output Format" in system_prompt:
+        return {"skill": _assessment(SKILLS), "behavior": _assessment(BEHAVIORS)}
+    if "Skills and Definitions" in system_prompt:
+        return _assessment(SKILLS)
+    return _assessment(BEHAVIORS)
+
+
+class StubOpenAIServer:
+    """
+    Threaded stub server. Use as a context manager or call start() / stop().
+
+    Args:
+        base_latency: Seconds added to every request
+        input_token_latency: Seconds per prompt token
+        output_token_latency: Seconds per completion token
+        audio_latency: Seconds per second of uploaded audio
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, base_latency: float = 0.05,
+                 input_token_latency: float = 0.00002, output_token_latency: float = 0.0002,
+                 audio_latency: float = 0.01):
+        self.base_latency = base_latency
+        self.input_token_latency = input_token_latency
+        self.output_token_latency = output_token_latency
+        self.audio_latency = audio_latency
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def record(self, entry: dict):
+        with self._lock:
+            self.requests.append(entry)
+
+    def reset(self):
+        with self._lock:
+            self.requests = []
+
+    def _chat_completion(self, body: dict) -> dict:
+        messages = body.get("messages", [])
+        system_prompt = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+        content = json.dumps(stub_chat_content(system_prompt), indent=2)
+        completion_tokens = estimate_tokens(content)
+
+        time.sleep(self.base_latency + prompt_tokens * self.input_token_latency +
+                   completion_tokens * self.output_token_latency)
+        self.record({"endpoint": "chat", "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _transcription(self, content_type: str, raw_body: bytes):
+        """Returns (response body, content type) for a multipart transcription request."""
+        message = BytesParser(policy=policy.default).parsebytes(
+            b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + raw_body)
+        fields = {part.get_param("name", header="content-disposition"): part.get_payload(decode=True)
+                  for part in message.iter_parts()}
+        text, audio_seconds = transcribe_tone_words(fields["file"])
+        time.sleep(self.base_latency + audio_seconds * self.audio_latency)
+        self.record({"endpoint": "transcription", "audio_seconds": audio_seconds, "words": len(text.split())})
+        if fields.get("response_format", b"json").decode() == "text":
+            return text.encode(), "text/plain"
+        return json.dumps({"text": text}).encode(), "application/json"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw_body = self.rfile.read(length)
+                if self.path.endswith("/chat/completions"):
+                    self._send_json(200, server._chat_completion(json.loads(raw_body)))
+                elif self.path.endswith("/audio/transcriptions"):
+                    data, content_type = server._transcription(self.headers.get("Content-Type", ""), raw_body)
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                else:
+                    self._send_json(404, {"error": {"message": f"Stub server has no route {self.path}"}})
+
+        return Handler
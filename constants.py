@@ -1,3 +1,5 @@
+import os
+
 APPLICATION_ID = "Enter your application number here"
 VIDEO_LINK = "Share a private YouTube link to a video pitch of your company"
 LOCAL_FOLDER = "compliance_data"
@@ -7,4 +9,43 @@ GOOGLE_SHEET_ESTIMATES = "Share a Google Sheet/Research Report that links to you
 SUBMITTED_AT = "Submitted At"
 TOKEN = "Token"
 
+# How the skill and behavior assessments are scored: "concurrent", "sequential", or
+# "combined" (both rubrics in one LLM call)
+SCORING_MODE = os.getenv("SCORING_MODE", "concurrent")
+
+# Applications the nightly scheduler works on at once in each network-bound pipeline stage
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "2"))
+
+# Seconds a shared filtration sheet snapshot is reused before the sheet is read again
+SHEET_SNAPSHOT_TTL_SECONDS = float(os.getenv("SHEET_SNAPSHOT_TTL_SECONDS", "300"))
+
+# Refresh snapshots by fetching only rows appended since the last read ("0" to always read the whole sheet),
+# with a full re-read at least this often to pick up edits to earlier rows
+SHEET_INCREMENTAL_SYNC = os.getenv("SHEET_INCREMENTAL_SYNC", "1") != "0"
+SHEET_FULL_RESYNC_SECONDS = float(os.getenv("SHEET_FULL_RESYNC_SECONDS", "3600"))
+# An incremental refresh reads back this many of the last known rows and as many randomly sampled earlier
+# ones, on top of a checksum of the application ID column, to catch edits made alongside an append
+SHEET_VERIFY_SAMPLE_ROWS = int(os.getenv("SHEET_VERIFY_SAMPLE_ROWS", "20"))
+
+# Extract audio while the video downloads by piping it into ffmpeg ("0" to download, then convert).
+# Videos whose container needs seeking (e.g. MP4 with the index at the end) are always downloaded first.
+STREAM_AUDIO_EXTRACTION = os.getenv("STREAM_AUDIO_EXTRACTION", "1") != "0"
+
+# Encoding of the audio uploaded for transcription, a key of AUDIO_PROFILES in utils/audio_transcribe.py.
+# speech_mp3 (16 kHz mono, 48 kbps) only needs the MP3 encoder the pipeline already relied on;
+# speech_opus is a quarter of its size where ffmpeg has libopus. mp3_hifi is the original 192 kbps encoding.
+AUDIO_PROFILE = os.getenv("AUDIO_PROFILE", "speech_mp3")
+# Cut long silences out of the audio before it is transcribed ("1" to enable), see utils/audio_preprocess.py
+TRIM_SILENCE = os.getenv("TRIM_SILENCE", "0") == "1"
+# When audio is transcribed in overlapping chunks, concurrently (see utils/chunked_transcription.py):
+# "auto" only for files over the transcription upload limit, "on" for any file longer than a chunk, "off" never
+TRANSCRIPTION_CHUNKING = os.getenv("TRANSCRIPTION_CHUNKING", "auto")
+# Which transcription models run and which transcript is kept (see utils/transcription_strategy.py):
+# "primary_only", "fallback" (second model only when the first transcript fails the quality check) or "parallel"
+TRANSCRIPTION_STRATEGY = os.getenv("TRANSCRIPTION_STRATEGY", "fallback")
+# What transcribes audio (see utils/transcription_backends.py): "openai", "stub" (deterministic,
+# offline) or "local" (faster-whisper on this machine's CPUs, if installed). "stub" and "local" run one
+# model, so TRANSCRIPTION_STRATEGY is primary_only for them.
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "openai")
+
 MODEL_PITCH = """This is Surakshit, and I am going to introduce you to GadiMech, a platform that's transforming the car care industry. I would like to take this opportunity to discuss a real incident that made us think about GadiMech, and I'm sure you will relate with it too. So me and Sarvesh went to a company service center at around 12 in the afternoon, and the i20 car came in for servicing. The customer was told that the car would be serviced by 8 p.m. and he can come and pick it up by then. To my surprise, the car was serviced in just 30 minutes, and you can only imagine what would have happened in 30 minutes. The car was washed from the outside and polished from the inside, so that it looks like it has been serviced. And to my surprise, he was given a bill of 12,000 rupees, which included oil change, parts repairs and whatnot. Now you tell me, as a customer, how would you get to know? There's no way you can find out, you just have to believe them. So car maintenance industry is stricken with these problems. Higher prices and poor experience at the company service centers. How do you trust traditional service centers? And how to ensure transparency? How do I discover a quality service center? And who's going to keep a tab on them? I am not going to sit there for 8 hours. That's exactly where Garimek comes in. Garimek is a car care ecosystem that connects car owners with quality service centers. Our platform offers a seamless service booking experience, ensuring affordable prices, quality assurance and real-time tracking, making the process completely transparent. This not only enhances the car owner's experience, but also boosts business for the service centers. The opportunity here is massive. The TAM in India alone is 60,000 crores, with car owners constantly seeking better, more affordable and trustworthy car care services. Now, our business model is built on multiple revenue streams. We earn through a take rate on services and margins on spares. With the service center, through the customers, we generate revenue through Garimek exclusive memberships and M-commerce sales for car accessories. The B2B partnerships like insurance claims, fleet servicing orders and used car marketplaces are also some avenues to get revenue. Our go-to-market strategy is a blend of online and offline growth. We focus on delivering a delightful customer experience, guiding them throughout the process with our personalized hand-holding approach, ensuring we build long-term trust and satisfaction. Within just three months of operations in Jaipur, we've started seeing great initial traction. We've partnered with six associated workshops and generated over 2,000 leads. The main ingredient is still the Garimek founding team. We bring together a blend of deep automotive industry experience along with tech and product expertise. This combination allows us to not only understand the customer pain points, but also to solve them effectively, delivering an unparalleled experience in the market. Now, Garimek is poised to redefine the car servicing industry by providing a trustworthy, transparent and customer-centric solution to an unorganized market. With a strong team, scalable business model and early traction, we would love to disrupt the car care industry. And that would be my pitch."""
\ No newline at end of file
@@ -1,54 +1,380 @@
-from utils.google_clients import download_drive_file, read_google_sheets
-from utils.audio_transcribe import convert_file_mp3, get_video_transcription
+from utils.google_clients import download_drive_file
+from utils.audio_transcribe import convert_file_mp3, get_video_transcription, stream_drive_audio, find_video_file
+from utils.audio_preprocess import trim_silence
 from utils.filter_responses import filter_responses
 
-from constants import APPLICATION_ID, VIDEO_LINK, LOCAL_FOLDER, FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME, MODEL_PITCH
+from constants import APPLICATION_ID, VIDEO_LINK, LOCAL_FOLDER, FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME, MODEL_PITCH, SCORING_MODE, STREAM_AUDIO_EXTRACTION, TRIM_SILENCE
 from prompts.behavior_prompts import behavior_system_prompt, behavior_user_prompt
 from prompts.skill_prompts import skill_system_prompt, skill_user_prompt
+from prompts.combined_prompts import combined_system_prompt, combined_user_prompt
 from utils.openai_llm import get_response_from_openai
 from utils.responses_cache import get_cached_response, store_response
+from utils.sheet_snapshot import get_sheet_snapshot
+from utils.stage_ledger import get_stage_ledger, STAGE_CHECKPOINTS
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import logging
 import json
+import os
+import shutil
 
 logging.basicConfig(level=logging.INFO)
 
-def run_scoring_pipeline(local_directory, id):
-    filtration_df = read_google_sheets(FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME)
-    company_details = filter_responses(id, filtration_df)
-    application_id(id, filtration_df, local_directory)
-    convert_file_mp3(local_directory, id)
-    transcript_dict = get_video_transcription(local_directory, id)
+# Every assessment scored for an application: response type -> (system prompt, user prompt).
+# Adding an entry here is enough for it to be cached, scored and stored like the others.
+SCORING_DIMENSIONS = {
+    "behavior": (behavior_system_prompt, behavior_user_prompt),
+    "skill": (skill_system_prompt, skill_user_prompt),
+}
 
-    if get_cached_response(id, "behavior") is not None:
-        behavior_response_json = get_cached_response(id, "behavior")
+# Assessments that "combined" scoring mode requests together in one call with combined_system_prompt
+COMBINED_DIMENSIONS = ("skill", "behavior")
+
+SCORING_MODES = ("concurrent", "sequential", "combined")
+
+
+@lru_cache(maxsize=None)
+def compile_system_prompt(system_prompt: str):
+    """
+    Pre-render a system prompt template around its {company_details} placeholder.
+
+    The model pitch and escaped braces are substituted once, so each application only
+    concatenates its company profile between the two returned halves instead of running
+    str.format over the whole prompt.
+
+    Returns:
+        tuple: (text before the company details, text after the company details)
+    """
+    before, after = system_prompt.split("{company_details}")
+    return before.format(model_pitch=MODEL_PITCH), after.format(model_pitch=MODEL_PITCH)
+
+
+def render_system_prompt(system_prompt: str, company_details: str) -> str:
+    before, after = compile_system_prompt(system_prompt)
+    return before + company_details + after
+
+
+class ScoringError(RuntimeError):
+    """Raised when one or more assessments fail.
+
+    Assessments that did complete are already stored and are available on `results`.
+    """
+
+    def __init__(self, id, results: dict, errors: dict):
+        self.id = id
+        self.results = results
+        self.errors = errors
+        failed = ", ".join(f"{dimension}: {error}" for dimension, error in errors.items())
+        super().__init__(f"Scoring failed for application ID {id} ({failed})")
+
+
+def run_scoring_pipeline(local_directory, id, scoring_mode: str = SCORING_MODE, snapshot=None):
+    # Reuse a pre-fetched filtration sheet snapshot, falling back to the shared cached one
+    snapshot = snapshot or get_sheet_snapshot(FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME)
+    context = {"id": id}
+    for name, stage in pipeline_stages(snapshot.record_store, local_directory, scoring_mode):
+        context = run_stage(name, stage, context)
+    return context["results"]["behavior"], context["results"]["skill"]
+
+
+# --- Pipeline stages --- #
+# Each stage takes and returns the per-application context dict, so the same stages
+# back both the single-application pipeline above and the batch engine in batch_pipeline.
+# Stages record their checkpoints in the stage ledger and skip work an earlier attempt finished.
+
+def pipeline_stages(records, local_directory, scoring_mode: str = SCORING_MODE):
+    """The (name, function) pairs of the scoring pipeline, in order."""
+    return [
+        ("fetch", lambda context: fetch_stage(context["id"], records, local_directory)),
+        ("transcode", transcode_stage),
+        ("transcribe", transcribe_stage),
+        ("score", lambda context: score_stage(context, scoring_mode=scoring_mode)),
+        ("persist", persist_stage),
+    ]
+
+
+def run_stage(name, stage, context):
+    """Run one pipeline stage, recording a failure in the stage ledger before re-raising it."""
+    try:
+        return stage(context)
+    except Exception as e:
+        get_stage_ledger().fail(context["id"], STAGE_CHECKPOINTS[name], e)
+        raise
+
+
+def application_workdir(local_directory, id):
+    """Scratch directory holding the downloaded video and audio for one application."""
+    return os.path.join(local_directory, str(id))
+
+
+def remove_application_workdir(workdir):
+    """Delete an application's scratch directory and everything left in it."""
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def has_local_media(workdir, id):
+    """Whether the video, audio or transcript of an application is still on disk."""
+    if os.path.exists(f"transcriptions/{id}.json"):
+        return True
+    return os.path.isdir(workdir) and any(not file.startswith(".") for file in os.listdir(workdir))
+
+
+def fetch_stage(id, records, local_directory):
+    """Format the company profile and download the pitch video for an application.
+
+    `records` is the ApplicationRecordStore of the filtration sheet snapshot.
+    """
+    ledger = get_stage_ledger()
+    ledger.begin(id)
+    workdir = application_workdir(local_directory, id)
+    company_details = filter_responses(id, records)
+    if ledger.reached(id, "downloaded") and has_local_media(workdir, id):
+        logging.info(f"Video for application ID {id} was already downloaded. Skipping download.")
     else:
-        behavior_system_prompt_formatted = behavior_system_prompt.format(model_pitch=MODEL_PITCH, company_details= company_details)
-        behavior_user_prompt_formatted = behavior_user_prompt.format(transcript=transcript_dict[str(id)])
-        behavior_response = get_response_from_openai(behavior_system_prompt_formatted, behavior_user_prompt_formatted)
-        behavior_response_json = json.loads(behavior_response)
-        store_response(id, behavior_response_json, "behavior")
-        print(behavior_response_json)
-
-    if get_cached_response(id, "skill") is not None:
-        skill_response_json = get_cached_response(id, "skill")
+        video_path = application_id(id, records, workdir)
+        ledger.mark(id, "downloaded")
+        return {"id": id, "company_details": company_details, "workdir": workdir, "video_path": video_path}
+    return {"id": id, "company_details": company_details, "workdir": workdir}
+
+
+def transcode_stage(context):
+    """Extract the audio track of the downloaded video, trimming long silences if TRIM_SILENCE is set."""
+    # With trimming the video is kept, so the trimmed audio is cut from it and encoded only once
+    if not convert_file_mp3(context["workdir"], context["id"], video_path=context.get("video_path"),
+                            keep_video=TRIM_SILENCE):
+        raise RuntimeError(f"Could not extract audio for application ID {context['id']}")
+    if TRIM_SILENCE and not os.path.exists(f"transcriptions/{context['id']}.json"):
+        try:
+            context["trim"] = trim_silence(context["workdir"], context["id"],
+                                           video_path=find_video_file(context["workdir"], context["id"]))
+        except Exception as e:
+            # Trimming only saves transcription time, so transcribe the untrimmed audio instead
+            logging.warning(f"Could not trim silence for application ID {context['id']}: {e}")
+    get_stage_ledger().mark(context["id"], "transcoded")
+    return context
+
+
+def transcribe_stage(context):
+    """Transcribe the extracted audio and remove the application's scratch directory."""
+    id = context["id"]
+    transcript_dict = get_video_transcription(context["workdir"], id)
+    context["transcript"] = transcript_dict[str(id)]
+    get_stage_ledger().mark(id, "transcribed")
+    # The transcript is cached, so nothing in the scratch directory is needed any more
+    remove_application_workdir(context["workdir"])
+    return context
+
+
+def score_stage(context, scoring_mode: str = SCORING_MODE):
+    """Score every assessment, leaving newly generated responses in context["pending"]."""
+    ledger = get_stage_ledger()
+    context["pending"] = {}
+    try:
+        context["results"] = score_application(
+            context["id"], context["company_details"], context["transcript"],
+            scoring_mode=scoring_mode, pending=context["pending"]
+        )
+    except ScoringError as e:
+        # Keep the assessments that did complete before surfacing the failure
+        for dimension in e.results:
+            ledger.mark(context["id"], f"scored_{dimension}")
+        persist_stage(context)
+        raise
+    for dimension in context["results"]:
+        ledger.mark(context["id"], f"scored_{dimension}")
+    ledger.mark(context["id"], "scored")
+    return context
+
+
+def persist_stage(context):
+    """Store the newly generated responses from the score stage.
+
+    Responses are queued in the journaled commit buffer, which uploads them even if this
+    process stops first, so a fully scored application is checkpointed as uploaded here.
+    """
+    for dimension, response_json in context.get("pending", {}).items():
+        store_response(context["id"], response_json, dimension)
+    context["pending"] = {}
+    if "results" in context:
+        get_stage_ledger().mark(context["id"], "uploaded")
+    return context
+
+
+def generate_dimension(dimension: str, company_details: str, transcript: str) -> dict:
+    """Request a single assessment from the LLM, without consulting or updating the cache."""
+    system_prompt, user_prompt = SCORING_DIMENSIONS[dimension]
+    system_prompt_formatted = render_system_prompt(system_prompt, company_details)
+    user_prompt_formatted = user_prompt.format(transcript=transcript)
+    response = get_response_from_openai(system_prompt_formatted, user_prompt_formatted)
+    return json.loads(response)
+
+
+def generate_combined(dimensions, company_details: str, transcript: str):
+    """
+    Request several assessments from the LLM in one JSON-mode call, without consulting or updating the cache.
+
+    Args:
+        dimensions: Response types to return, a subset of COMBINED_DIMENSIONS
+        company_details: The formatted company profile
+        transcript: The pitch transcript
+
+    Returns:
+        tuple: (response type -> assessment JSON, response type -> exception for assessments missing from the response)
+    """
+    system_prompt_formatted = render_system_prompt(combined_system_prompt, company_details)
+    user_prompt_formatted = combined_user_prompt.format(transcript=transcript)
+    response_json = json.loads(get_response_from_openai(system_prompt_formatted, user_prompt_formatted))
+
+    results, errors = {}, {}
+    for dimension in dimensions:
+        if isinstance(response_json.get(dimension), dict) and response_json[dimension]:
+            results[dimension] = response_json[dimension]
+        else:
+            errors[dimension] = ValueError(f"Combined response has no {dimension} assessment")
+    return results, errors
+
+
+def _store_or_collect(id, dimension, response_json, pending):
+    if pending is None:
+        store_response(id, response_json, dimension)
     else:
-        skill_system_prompt_formatted = skill_system_prompt.format(model_pitch=MODEL_PITCH, company_details= company_details)
-        skill_user_prompt_formatted = skill_user_prompt.format(transcript=transcript_dict[str(id)])
-        skill_response = get_response_from_openai(skill_system_prompt_formatted, skill_user_prompt_formatted)
-        skill_response_json = json.loads(skill_response)
-        store_response(id, skill_response_json, "skill")
-        print(skill_response_json)
-    return behavior_response_json, skill_response_json
-    
-def application_id(id, filtration_df, local_directory):  
-    print(filtration_df[filtration_df[APPLICATION_ID]==id])
-    drive_link = filtration_df[filtration_df[APPLICATION_ID]==id][VIDEO_LINK].values[0]
+        pending[dimension] = response_json
+    print(response_json)
+
+
+def score_dimension(id, dimension: str, company_details: str, transcript: str, pending: dict = None):
+    """
+    Score a single assessment for an application, reusing the cached response if one exists.
+
+    Args:
+        id: The application ID
+        dimension: The response type, a key of SCORING_DIMENSIONS
+        company_details: The formatted company profile
+        transcript: The pitch transcript
+        pending: If given, a newly generated response is put here instead of being stored
+
+    Returns:
+        dict: The assessment JSON
+    """
+    cached_response = get_cached_response(id, dimension)
+    if cached_response is not None:
+        return cached_response
+
+    response_json = generate_dimension(dimension, company_details, transcript)
+    _store_or_collect(id, dimension, response_json, pending)
+    return response_json
+
+
+def score_combined(id, dimensions, company_details: str, transcript: str, pending: dict = None):
+    """
+    Score several assessments for an application with a single combined LLM call.
+
+    Cached assessments are reused and only the missing ones are requested. Each
+    assessment in the combined response is stored like a separately scored one.
+
+    Returns:
+        tuple: (response type -> assessment JSON, response type -> exception)
+    """
+    results = {}
+    for dimension in dimensions:
+        cached_response = get_cached_response(id, dimension)
+        if cached_response is not None:
+            results[dimension] = cached_response
+    missing = [dimension for dimension in dimensions if dimension not in results]
+    if not missing:
+        return results, {}
+
+    try:
+        generated, errors = generate_combined(missing, company_details, transcript)
+    except Exception as e:
+        return results, {dimension: e for dimension in missing}
+    for dimension, response_json in generated.items():
+        _store_or_collect(id, dimension, response_json, pending)
+    results.update(generated)
+    return results, errors
+
+
+def score_application(id, company_details: str, transcript: str, dimensions=None, scoring_mode: str = SCORING_MODE, pending: dict = None):
+    """
+    Score every assessment for an application.
+
+    In "concurrent" mode all assessments are started at once and awaited together,
+    in "sequential" mode they run one after the other, and in "combined" mode the
+    COMBINED_DIMENSIONS are requested in a single LLM call (any other assessments are
+    scored concurrently). Each assessment is cached and stored independently, so a
+    failure in one does not discard the others.
+
+    Args:
+        id: The application ID
+        company_details: The formatted company profile
+        transcript: The pitch transcript
+        dimensions: Response types to score. Defaults to all SCORING_DIMENSIONS.
+        scoring_mode: "concurrent", "sequential" or "combined"
+        pending: If given, newly generated responses are collected here instead of being stored
+
+    Returns:
+        dict: Response type -> assessment JSON
+
+    Raises:
+        ScoringError: If any assessment failed, after all others have finished.
+    """
+    if scoring_mode not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode: {scoring_mode}")
+    dimensions = list(dimensions or SCORING_DIMENSIONS)
+    results, errors = {}, {}
+
+    if scoring_mode == "combined":
+        combined = [dimension for dimension in dimensions if dimension in COMBINED_DIMENSIONS]
+        if combined:
+            combined_results, combined_errors = score_combined(id, combined, company_details, transcript, pending)
+            results.update(combined_results)
+            errors.update(combined_errors)
+        dimensions = [dimension for dimension in dimensions if dimension not in combined]
+        scoring_mode = "concurrent"
+
+    if scoring_mode == "concurrent" and dimensions:
+        with ThreadPoolExecutor(max_workers=len(dimensions), thread_name_prefix="scoring") as executor:
+            futures = {
+                dimension: executor.submit(score_dimension, id, dimension, company_details, transcript, pending)
+                for dimension in dimensions
+            }
+            for dimension, future in futures.items():
+                try:
+                    results[dimension] = future.result()
+                except Exception as e:
+                    errors[dimension] = e
+    elif scoring_mode == "sequential":
+        for dimension in dimensions:
+            try:
+                results[dimension] = score_dimension(id, dimension, company_details, transcript, pending)
+            except Exception as e:
+                errors[dimension] = e
+
+    if errors:
+        for dimension, error in errors.items():
+            logging.error(f"{dimension} scoring failed for application ID {id}: {error}")
+        raise ScoringError(id, results, errors)
+    return results
+
+def application_id(id, records, local_directory):
+    """Download an application's video into its scratch directory.
+
+    Returns the path of the downloaded video, or None if only its audio was extracted
+    while streaming (or was already there).
+    """
+    drive_link = records[id].video_link
     print(drive_link)
-    if "drive.google.com" in drive_link:
-        download_drive_file(id, drive_link, local_directory)
+    if drive_link and "drive.google.com" in drive_link:
+        # The transcode stage skips applications whose audio already exists
+        if STREAM_AUDIO_EXTRACTION and stream_drive_audio(id, drive_link, local_directory):
+            return None
+        downloaded = download_drive_file(id, drive_link, local_directory)
+        if downloaded is None:
+            raise RuntimeError(f"Could not download the video of application ID {id}")
+        return None if downloaded['cached'] else downloaded['local_path']
     else:
         logging.error("Non-drive link cannot process video")
         raise ValueError("Non-drive link cannot process video")
 
 if __name__ == "__main__":
-    run_scoring_pipeline(LOCAL_FOLDER, 688)
\ No newline at end of file
+    run_scoring_pipeline(LOCAL_FOLDER, 688)
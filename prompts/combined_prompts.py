@@ -0,0 +1,88 @@
+from prompts.skill_prompts import skill_system_prompt, skill_user_prompt
+from prompts.behavior_prompts import behavior_system_prompt
+
+# The skill and behavior rubrics (definitions, scoring guidance, steps and output format),
+# without the model pitch and company details that both prompts repeat.
+_CONTEXT_MARKER = "Given below in triple backticks"
+skill_rubric = skill_system_prompt[:skill_system_prompt.index(_CONTEXT_MARKER)].strip()
+behavior_rubric = behavior_system_prompt[:behavior_system_prompt.index(_CONTEXT_MARKER)].strip()
+
+combined_system_prompt = """You will perform two independent assessments of the same founder pitch in a single response: a SKILL assessment and a BEHAVIOR assessment. Each assessment has its own rubric below. Apply each rubric on its own, exactly as if it were the only task, and do not let one assessment influence the other.
+
+==================== SKILL ASSESSMENT RUBRIC ====================
+
+""" + skill_rubric + """
+
+==================== BEHAVIOR ASSESSMENT RUBRIC ====================
+
+""" + behavior_rubric + """
+
+==================== SHARED CONTEXT ====================
+
+Given below in triple backticks(```) is an ideal video pitch of a company that scores a maximum 10 on all the skills and all the behaviors listed above. Using this as a reference rate the transcript provided to you.
+```{model_pitch}```
+
+Given also is the founders company details in the format of a JSON to help you score where the key is the question and value is the answer for that company. For keys from the below list, the values are the founders (out of 5) rating of the founding team on the skills and behaviors denoted by the keys:
+1.	'Analytical',
+2.	'Communication',
+3.	'Judgement',
+4.	'Negotiation',
+5.	'Problem Solving',
+6.	'Financial',
+7.	'Technical',
+8.	'Sales and Marketing',
+9.	'Project Management',
+10.	'Network Building',
+11.	'Product Management',
+12.	'Conviction/Belief',
+13.	'Relentlessness',
+14.	'Resilience',
+15.	'Curiosity',
+16.	'Reliability',
+17.	'Courage',
+18.	'Innovative',
+19.	'Energetic',
+20.	'Inspiring',
+21.	'Clear Thinking',
+22.	'Pace of Execution'
+
+
+Founder Company Form Details
+```{company_details}```
+
+Remember Company Details also provide a form of self assessment of the founders on the skills and behaviors listed above. Complement the information provided in the transcript with the self assessment especially where the transcript does not provide enough information.
+
+# Combined Output Format
+
+Return a single JSON object with exactly two top-level keys. The value of "skill" is the complete skill assessment in the skill rubric's output format, and the value of "behavior" is the complete behavior assessment in the behavior rubric's output format:
+
+```json
+{{
+  "skill": {{
+    "Analytical": {{
+      "Citations": "...",
+      "Reasoning": "...",
+      "Rating": X
+    }},
+    ...
+  }},
+  "behavior": {{
+    "Conviction": {{
+      "Citations": "...",
+      "Reasoning": "...",
+      "Rating": X
+    }},
+    ...
+  }}
+}}
+```
+
+# Notes
+
+- Keep explanations concise but informative.
+- If a skill or behavior is not well-addressed in the given pitch, make sure the rating reflects that.
+- Avoid assigning a rating without a justification; always provide reasoning linked directly to the content in the transcript.
+- Use the founder's self-assessment and company details as additional context when necessary.
+"""
+
+combined_user_prompt = skill_user_prompt
@@ -11,10 +11,17 @@ from datetime import datetime
 # Add the current directory to the path
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
-from utils.responses_cache import get_last_processed_id, store_last_processed_id, get_all_processed_ids
-from utils.google_clients import read_google_sheets
-from constants import APPLICATION_ID, FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME, LOCAL_FOLDER
-from main import run_scoring_pipeline
+from utils.responses_cache import get_last_processed_id, store_last_processed_id, get_all_processed_ids, get_response_cache_stats, get_response_index
+from utils.sheet_snapshot import get_sheet_snapshot, sheet_sync_stats
+from utils.hf_utils import commit_buffer
+from utils.results_store import results_writer, compact_cohort
+from utils.stage_ledger import get_stage_ledger
+from utils.rate_limit import rate_limit_stats
+from utils.openai_llm import openai_connection_stats
+from utils.transcription_backends import transcription_backend_stats
+from constants import APPLICATION_ID, FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME, LOCAL_FOLDER, SCHEDULER_CONCURRENCY
+from batch_pipeline import run_scoring_batch, stage_workers_for_concurrency
+from main import application_workdir, remove_application_workdir
 
 # Configure logging
 logging.basicConfig(
@@ -31,13 +38,14 @@ logger = logging.getLogger("application_processor")
 
 def process_new_applications():
     """
-    Process applications based on their position in the sheet.
+    Process new and previously failed applications.
     This function:
     1. Reads the Google Sheet to get all application IDs in their original order
     2. Gets the last processed ID from the tracking file
-    3. Finds the position of the last processed ID in the sheet
-    4. Processes all applications that appear at positions up to that index
-    5. Updates the last processed ID with the ID of the last processed application
+    3. Selects the applications after that position, plus every application in the stage ledger
+    4. Skips finished applications and failed ones that have used up their attempts
+    5. Processes the rest, each resuming from the last checkpoint it reached
+    6. Updates the last processed ID with the ID of the last finished application
 
     Returns:
         int: Number of applications processed
@@ -51,8 +59,11 @@ def process_new_applications():
 
         # Read the Google Sheet to get all application IDs
         try:
-            filtration_df = read_google_sheets(FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME)
-            logger.info(f"Successfully read Google Sheet with {len(filtration_df)} entries")
+            # Always start a run from the latest sheet; the snapshot is then shared with the pipeline and UI
+            snapshot = get_sheet_snapshot(FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME, force_refresh=True)
+            filtration_df = snapshot.df.copy()
+            logger.info(f"Successfully read Google Sheet with {len(filtration_df)} entries (snapshot version {snapshot.version})")
+            logger.info(f"Sheet sync stats: {sheet_sync_stats()}")
         except Exception as e:
             logger.error(f"Error reading Google Sheet: {str(e)}")
             return 0
@@ -71,47 +82,73 @@ def process_new_applications():
         # Get all application IDs from the sheet in their original order
         all_app_ids = filtration_df[APPLICATION_ID].tolist()
 
-        # Find the index position of the last processed ID in the sheet
-        last_processed_index = -1
-
-        # If last_processed_id is in the sheet, find its position
+        # Find the position of the first application after the last processed ID in the sheet
         if last_processed_id in all_app_ids:
-            last_processed_index = all_app_ids.index(last_processed_id)
-            logger.info(f"Found last processed ID {last_processed_id} at position {last_processed_index}")
+            first_new_index = all_app_ids.index(last_processed_id) + 1
+            logger.info(f"Found last processed ID {last_processed_id} at position {first_new_index - 1}")
         else:
-            # If the ID isn't in the sheet, we'll process all applications
-            logger.info(f"Last processed ID {last_processed_id} not found in sheet, will process all applications")
-            last_processed_index = len(all_app_ids) - 1
-
-        # Process all applications up to and including the last processed index
-        logger.info(f"Processing all applications after position {last_processed_index}")
-
-        processed_count = 0
-        new_last_processed_id = last_processed_id
-
-        # Process all applications with index position <= last_processed_index
-        for i, app_id in enumerate(all_app_ids):
-            if i >= last_processed_index:
-                try:
-                    logger.info(f"Processing application ID: {app_id} at position {i}")
-                    run_scoring_pipeline(LOCAL_FOLDER, app_id)
-                    processed_count += 1
-
-                    # Update the last processed ID to this one
-                    new_last_processed_id = app_id
-
-                    logger.info(f"Successfully processed application ID: {app_id}")
-                    # Update the tracking file with the ID of the last processed application
-                    if new_last_processed_id != last_processed_id:
-                        store_last_processed_id(new_last_processed_id)
-                        logger.info(f"Updated last processed ID to {new_last_processed_id}")
-                except Exception as e:
-                    logger.error(f"Error processing application ID {app_id}: {str(e)}")
-                    # Continue with the next application even if this one fails
+            # If the ID isn't in the sheet, only the latest application is new
+            logger.info(f"Last processed ID {last_processed_id} not found in sheet, will process the latest application")
+            first_new_index = len(all_app_ids) - 1
+
+        # Applications before that position that the stage ledger has never seen were handled
+        # before the ledger existed. Everything else the ledger decides.
+        ledger = get_stage_ledger()
+        candidate_app_ids = [app_id for i, app_id in enumerate(all_app_ids)
+                             if i >= first_new_index or app_id in ledger]
+
+        # Skip applications that already have every response stored, using one listing of the responses dataset
+        response_index = get_response_index(force_refresh=True)
+        already_scored = {app_id for app_id in candidate_app_ids
+                          if ledger.is_complete(app_id) or not response_index.missing_types(app_id)}
+        if already_scored:
+            logger.info(f"Skipping {len(already_scored)} applications that already have all responses stored")
+
+        # Retry failed applications until they run out of attempts
+        given_up = {app_id for app_id in candidate_app_ids if app_id not in already_scored and ledger.exhausted(app_id)}
+        for app_id in given_up:
+            logger.warning(f"Not retrying application ID {app_id} after {ledger.entry(app_id)['attempts']} attempts, "
+                           f"last error: {ledger.last_error(app_id)}")
+            remove_application_workdir(application_workdir(LOCAL_FOLDER, app_id))
+
+        # Process the remaining applications through the staged batch engine
+        skipped = already_scored | given_up
+        app_ids_to_process = [app_id for app_id in candidate_app_ids if app_id not in skipped]
+        batch_result = run_scoring_batch(app_ids_to_process, LOCAL_FOLDER, snapshot=snapshot,
+                                         stage_workers=stage_workers_for_concurrency(SCHEDULER_CONCURRENCY),
+                                         queue_size=SCHEDULER_CONCURRENCY)
+        processed_count = len(batch_result.results)
+
+        for app_id, (stage, error) in batch_result.failures.items():
+            logger.error(f"Error processing application ID {app_id} in {stage} stage: {str(error)}")
+
+        # Keep the last processed ID up to date for older tooling: the last finished application in sheet order
+        finished_app_ids = [app_id for app_id in all_app_ids
+                            if app_id in batch_result.results or app_id in already_scored]
+        if finished_app_ids:
+            new_last_processed_id = finished_app_ids[-1]
+            if new_last_processed_id != last_processed_id:
+                store_last_processed_id(new_last_processed_id)
+                logger.info(f"Updated last processed ID to {new_last_processed_id}")
 
         logger.info(f"Finished processing applications. Processed {processed_count} applications")
+        logger.info(f"Response cache stats: {get_response_cache_stats()}")
+        logger.info(f"Stage ledger: {ledger.summary()}")
+        # Wait time per limiter shows which API budget bounds the run
+        for name, stats in rate_limit_stats().items():
+            logger.info(f"Rate limiter {name}: {stats}")
+        logger.info(f"OpenAI connection stats: {openai_connection_stats()}")
+        logger.info(f"Transcription backend stats: {transcription_backend_stats()}")
         return processed_count
 
     except Exception as e:
         logger.error(f"Error in process_new_applications: {str(e)}")
-        return 0
\ No newline at end of file
+        return 0
+    finally:
+        # Commit everything this run stored in one go rather than waiting for the flush interval
+        results_writer.flush()
+        get_stage_ledger().sync()
+        commit_buffer.flush(reason="end of scheduler run")
+        logger.info(f"Commit buffer stats: {commit_buffer.stats()}")
+        # Keep a cohort readable in a few shard downloads as runs and UI analyses add small shards
+        compact_cohort()
\ No newline at end of file
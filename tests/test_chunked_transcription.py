@@ -0,0 +1,59 @@
+import utils.transcription_backends as transcription_backends
+from utils.chunked_transcription import stitch_transcripts, stitch_window_words, transcribe_chunks
+
+
+def test_overlap_is_kept_once():
+    first = "we started in one city and grew to five cities across the north last year"
+    second = "to five cities across the north last year and now we sell to retail chains"
+    assert stitch_transcripts([first, second], overlap_seconds=5) == (
+        "we started in one city and grew to five cities across the north last year "
+        "and now we sell to retail chains"
+    )
+
+
+def test_words_cut_at_chunk_edges_are_dropped():
+    first = "our revenue grew three times over the last twelve mon"
+    second = "ths over the last twelve months with the same team"
+    assert stitch_transcripts([first, second], overlap_seconds=5) == (
+        "our revenue grew three times over the last twelve months with the same team"
+    )
+
+
+def test_spurious_bigram_is_not_taken_for_the_overlap():
+    first = "in the beginning we sold to small shops across the city and then we moved to larger retail chains"
+    second = "next we plan to raise money and expand in the city centre with our own stores"
+    assert stitch_transcripts([first, second], overlap_seconds=5) == f"{first} {second}"
+
+
+def test_match_outside_the_overlap_window_is_ignored():
+    # Shares a long run with the start of the previous text, far from where chunks overlap
+    first = "we sell software to small businesses " + " ".join(f"word{i}" for i in range(60))
+    second = "we sell software to small businesses in three more countries"
+    assert stitch_transcripts([first, second], overlap_seconds=5) == f"{first} {second}"
+
+
+def test_overlap_on_silence_concatenates():
+    first = "thank you for watching our pitch"
+    second = "any questions are welcome"
+    assert stitch_transcripts([first, second], overlap_seconds=5) == f"{first} {second}"
+
+
+def test_window_grows_with_the_overlap():
+    assert stitch_window_words(10) > stitch_window_words(5) > 0
+
+
+def test_chunk_durations_are_passed_to_the_backend(tmp_path, monkeypatch):
+    def no_probe(path):
+        raise AssertionError(f"probed {path}")
+
+    monkeypatch.setattr(transcription_backends, "audio_duration_seconds", no_probe)
+    backend = transcription_backends.StubBackend()
+    monkeypatch.setattr("utils.chunked_transcription.get_transcription_backend", lambda: backend)
+    chunk_files = []
+    for index, seconds in enumerate([60.0, 30.0]):
+        path = tmp_path / f"chunk_{index}.mp3"
+        path.write_bytes(bytes([index]) * 64)
+        chunk_files.append((str(path), seconds))
+
+    transcribe_chunks(chunk_files, "whisper-1")
+    assert backend.stats()["audio_seconds"] == 90.0
@@ -0,0 +1,29 @@
+import pandas as pd
+
+from constants import APPLICATION_ID, VIDEO_LINK, SUBMITTED_AT
+from utils.application_store import ApplicationRecordStore
+from utils.company_details import get_company_details
+
+
+def _sheet(rows):
+    return pd.DataFrame([{APPLICATION_ID: id, VIDEO_LINK: link, SUBMITTED_AT: "2024-01-01", "Sector": sector}
+                         for id, link, sector in rows])
+
+
+def test_last_60_rows_keyed_by_video_link():
+    sheet = _sheet([(id, f"https://youtu.be/{id}", "SaaS") for id in range(100)])
+    details = get_company_details(sheet)
+    assert list(details) == [f"https://youtu.be/{id}" for id in range(40, 100)]
+    assert details["https://youtu.be/99"] == {VIDEO_LINK: "https://youtu.be/99", "Sector": "SaaS"}
+
+
+def test_rows_without_an_id_are_included():
+    sheet = _sheet([(1, "https://youtu.be/a", "SaaS"), (None, "https://youtu.be/b", "D2C")])
+    assert set(get_company_details(sheet)) == {"https://youtu.be/a", "https://youtu.be/b"}
+
+
+def test_last_row_wins_for_a_repeated_video_link():
+    sheet = _sheet([(1, "https://youtu.be/a", "SaaS"), (1, "https://youtu.be/a", "Fintech")])
+    assert get_company_details(ApplicationRecordStore(sheet))["https://youtu.be/a"]["Sector"] == "Fintech"
+    # ID lookups still take the first row
+    assert ApplicationRecordStore(sheet)[1].company_response["Sector"] == "SaaS"
@@ -0,0 +1,97 @@
+"""
+ID-indexed store of filtration sheet rows.
+
+The store is built once per sheet snapshot and gives O(1) lookup of an application's
+row, company details and video link, instead of scanning the DataFrame per application.
+"""
+import pandas as pd
+
+from constants import APPLICATION_ID, VIDEO_LINK, GOOGLE_SHEET_ESTIMATES, SUBMITTED_AT, TOKEN
+
+# Sheet columns that are not part of the company details shown to the LLM
+COMPANY_DETAILS_EXCLUDED_KEYS = (APPLICATION_ID, GOOGLE_SHEET_ESTIMATES, SUBMITTED_AT, TOKEN)
+
+
+def normalize_application_id(id):
+    """Canonical key for an application ID read from the sheet or the UI (688, 688.0 and "688" are equal)."""
+    try:
+        return int(float(id))
+    except (TypeError, ValueError):
+        return str(id).strip()
+
+
+class ApplicationRecord:
+    """
+    One application's row in the filtration sheet.
+
+    Attributes:
+        id: The normalized application ID, or None for a row without one
+        row: The full sheet row as a dict
+        company_response: The row without COMPANY_DETAILS_EXCLUDED_KEYS
+        video_link: The pitch video link, or None
+    """
+
+    __slots__ = ("id", "row", "company_response", "video_link")
+
+    def __init__(self, id, row: dict):
+        self.id = id
+        self.row = row
+        self.company_response = {key: value for key, value in row.items() if key not in COMPANY_DETAILS_EXCLUDED_KEYS}
+        self.video_link = row.get(VIDEO_LINK)
+
+
+class ApplicationRecordStore:
+    """Application records of a sheet, indexed by application ID, in sheet order."""
+
+    def __init__(self, filtration_df: pd.DataFrame):
+        self._records = {}
+        # Every row in sheet order, including rows without an ID, for company_details_by_video_link
+        self._rows = []
+        has_ids = APPLICATION_ID in filtration_df.columns
+        for row in filtration_df.to_dict(orient="records"):
+            raw_id = row.get(APPLICATION_ID) if has_ids else None
+            if raw_id is None or pd.isna(raw_id) or str(raw_id).strip() == "":
+                self._rows.append(ApplicationRecord(None, row))
+                continue
+            id = normalize_application_id(raw_id)
+            record = ApplicationRecord(id, row)
+            self._rows.append(record)
+            # Like the DataFrame lookups this replaces, the first row for an ID wins
+            if id not in self._records:
+                self._records[id] = record
+
+    def get(self, id):
+        """Returns the ApplicationRecord for an application ID, or None."""
+        return self._records.get(normalize_application_id(id))
+
+    def __getitem__(self, id):
+        record = self.get(id)
+        if record is None:
+            raise KeyError(f"Application ID {id} not found in filtration sheet")
+        return record
+
+    def __contains__(self, id):
+        return normalize_application_id(id) in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def ids(self) -> list:
+        """Application IDs in sheet order."""
+        return list(self._records)
+
+    def company_details_by_video_link(self, last_n: int = None) -> dict:
+        """
+        Company details keyed by video link.
+
+        Unlike the ID lookups, this goes by sheet rows: rows without an application ID are
+        included, and of several rows with the same video link the last one wins.
+
+        Args:
+            last_n: Only include the last N rows of the sheet
+
+        Returns:
+            dict: Video link -> company response dict
+        """
+        records = self._rows if last_n is None else self._rows[-last_n:]
+        return {record.video_link: record.company_response for record in records}
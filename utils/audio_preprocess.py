@@ -0,0 +1,261 @@
+"""
+Silence trimming of extracted audio before transcription.
+
+Pitch recordings often start and end with dead air and contain long pauses, all of which
+is paid for in transcription time and cost. trim_silence decodes an application's audio
+to 16 kHz mono PCM on disk and measures the level of every 30 ms frame, reading the PCM
+in blocks so only the levels are held in memory. An energy-based voice activity detector
+finds speech in the levels, and silent spans longer than TRIM_MIN_SILENCE_SECONDS are
+cut by ffmpeg, preferably from the downloaded video so the audio is encoded only once.
+
+Each trim records which spans of the original audio were kept, so times in the trimmed
+audio (e.g. of a transcript segment) can be mapped back to the original video with
+trimmed_to_original. The mapping and the amount of audio removed are saved to
+transcriptions/{id}_trim.json.
+"""
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from constants import AUDIO_PROFILE
+from utils.audio_transcribe import AUDIO_PROFILES, audio_encoding_args, find_audio_file
+from utils.transcode_pool import get_transcode_pool, TRANSCODE_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_SECONDS = 0.03
+# Frames quieter than this (dB relative to full scale) count as silence
+TRIM_SILENCE_THRESHOLD_DB = float(os.getenv("TRIM_SILENCE_THRESHOLD_DB", "-40"))
+# Only silent spans at least this long are cut; shorter pauses are part of normal speech
+TRIM_MIN_SILENCE_SECONDS = float(os.getenv("TRIM_MIN_SILENCE_SECONDS", "1.0"))
+# Silence kept on each side of speech, so words are not clipped
+TRIM_PADDING_SECONDS = 0.25
+# Audio is left untouched if trimming would remove less than this
+TRIM_MIN_REMOVED_SECONDS = 1.0
+# Frames whose level is computed at once
+LEVEL_BLOCK_FRAMES = 4096
+# Granularity, in seconds, at which ffmpeg selects the kept audio. Cut times are multiples of it.
+CUT_STEP_SECONDS = 0.01
+
+
+def trim_mapping_path(id) -> str:
+    return f"transcriptions/{id}_trim.json"
+
+
+def frame_levels_db(samples: np.ndarray, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """
+    RMS level of each frame in dBFS.
+
+    Accepts float samples in [-1, 1] or 16-bit integer samples. Frames are converted to float32 LEVEL_BLOCK_FRAMES at a time, so no full-length
+    copy of the samples is made.
+    """
+    frame_length = int(SAMPLE_RATE * frame_seconds)
+    frame_count = len(samples) // frame_length
+    scale = 1 / 32768.0 if np.issubdtype(samples.dtype, np.integer) else 1.0
+    rms = np.empty(frame_count, dtype=np.float32)
+    for first in range(0, frame_count, LEVEL_BLOCK_FRAMES):
+        last = min(frame_count, first + LEVEL_BLOCK_FRAMES)
+        frames = np.asarray(samples[first * frame_length:last * frame_length], dtype=np.float32)
+        frames = frames.reshape(last - first, frame_length) * np.float32(scale)
+        rms[first:last] = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def decode_levels(audio_path: str) -> tuple:
+    """
+    Frame levels of an audio file, read LEVEL_BLOCK_FRAMES frames at a time so its samples
+    are never all in memory.
+
+    Returns:
+        tuple: (levels in dBFS of each FRAME_SECONDS frame, duration in seconds)
+    """
+    with tempfile.NamedTemporaryFile(suffix=".pcm") as pcm_file:
+        cmd = ["ffmpeg", "-i", audio_path, "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-y", pcm_file.name]
+        process = get_transcode_pool().run(cmd, name=f"decode {os.path.basename(audio_path)}",
+                                           timeout=TRANSCODE_TIMEOUT_SECONDS)
+        if process.returncode != 0:
+            raise RuntimeError(f"Could not decode {audio_path}: {process.stderr[-2000:]}")
+        duration = os.path.getsize(pcm_file.name) // 2 / SAMPLE_RATE
+        block_bytes = LEVEL_BLOCK_FRAMES * int(SAMPLE_RATE * FRAME_SECONDS) * 2
+        levels = []
+        with open(pcm_file.name, "rb") as f:
+            for block in iter(lambda: f.read(block_bytes), b""):
+                levels.append(frame_levels_db(np.frombuffer(block[:len(block) // 2 * 2], dtype="<i2")))
+    return (np.concatenate(levels) if levels else np.zeros(0, dtype=np.float32)), duration
+
+
+def speech_segments(levels: np.ndarray, duration: float, threshold_db: float = TRIM_SILENCE_THRESHOLD_DB,
+                    min_silence_seconds: float = TRIM_MIN_SILENCE_SECONDS,
+                    padding_seconds: float = TRIM_PADDING_SECONDS) -> list:
+    """
+    Spans of the audio to keep.
+
+    Frames above the threshold are speech. Silent runs shorter than min_silence_seconds
+    are kept as pauses, and padding_seconds of silence is kept around every cut.
+
+    Args:
+        levels: Level of each FRAME_SECONDS frame, see frame_levels_db
+        duration: Duration of the audio in seconds
+
+    Returns:
+        list: (start, end) times in seconds, sorted and non-overlapping
+    """
+    voiced = levels > threshold_db
+    if not voiced.any():
+        return []
+
+    # Runs of consecutive voiced frames as (first frame, frame after the last)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    runs = edges.reshape(-1, 2) * FRAME_SECONDS
+
+    segments = []
+    for start, end in runs:
+        start = max(0.0, start - padding_seconds)
+        end = min(duration, end + padding_seconds)
+        if segments and start - segments[-1][1] < min_silence_seconds:
+            segments[-1] = (segments[-1][0], max(segments[-1][1], end))
+        else:
+            segments.append((start, end))
+    # Trailing samples that do not fill a frame follow the last frame's decision
+    if segments and voiced[-1]:
+        segments[-1] = (segments[-1][0], duration)
+    return [(round(start, 3), round(end, 3)) for start, end in segments]
+
+
+def build_mapping(segments: list) -> list:
+    """Kept spans with the time each one starts at in the trimmed audio."""
+    mapping = []
+    trimmed_start = 0.0
+    for start, end in segments:
+        mapping.append({"original_start": start, "original_end": end, "trimmed_start": round(trimmed_start, 3)})
+        trimmed_start += end - start
+    return mapping
+
+
+def trimmed_to_original(seconds: float, mapping: list) -> float:
+    """Maps a time in the trimmed audio to the same moment in the original audio."""
+    for segment in reversed(mapping):
+        if seconds >= segment["trimmed_start"]:
+            return round(segment["original_start"] + seconds - segment["trimmed_start"], 3)
+    return seconds
+
+
+def encode_pcm(samples: np.ndarray, output_path: str, profile: str):
+    """Encodes 16 kHz mono float samples to output_path with an audio profile."""
+    part_path = f"{output_path}.part"
+    with tempfile.NamedTemporaryFile(suffix=".pcm") as pcm_file:
+        (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tofile(pcm_file.name)
+        cmd = ["ffmpeg", "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", pcm_file.name,
+               *audio_encoding_args(profile), "-y", part_path]
+        process = get_transcode_pool().run(cmd, name=f"encode {os.path.basename(output_path)}",
+                                           timeout=TRANSCODE_TIMEOUT_SECONDS)
+    if process.returncode != 0:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise RuntimeError(f"Could not encode trimmed audio {output_path}: {process.stderr[-2000:]}")
+    os.replace(part_path, output_path)
+
+
+def cut_segments(source_path: str, segments: list, output_path: str, profile: str):
+    """
+    Encodes the given spans of a file's audio, joined, to output_path with an audio profile.
+
+    The audio is resampled to the profile's sample rate and split into CUT_STEP_SECONDS
+    frames, of which those starting inside a span are kept. Span boundaries must be multiples
+    of CUT_STEP_SECONDS (as speech_segments produces) for the cut to be exact.
+    """
+    part_path = f"{output_path}.part"
+    profile_args = AUDIO_PROFILES[profile]["args"]
+    sample_rate = int(profile_args[profile_args.index("-ar") + 1]) if "-ar" in profile_args else SAMPLE_RATE
+    # The small offset keeps the frame starting at each span's end out despite rounding
+    selection = "+".join(f"between(t,{start - 0.001:.3f},{end - 0.001:.3f})" for start, end in segments)
+    audio_filter = (f"aresample={sample_rate},asetpts=PTS-STARTPTS,"
+                    f"asetnsamples=n={int(sample_rate * CUT_STEP_SECONDS)}:p=0,"
+                    f"aselect='{selection}',asetpts=N/SR/TB")
+    cmd = ["ffmpeg", "-i", source_path, "-af", audio_filter, *audio_encoding_args(profile), "-y", part_path]
+    process = get_transcode_pool().run(cmd, name=f"cut {os.path.basename(output_path)}",
+                                       timeout=TRANSCODE_TIMEOUT_SECONDS)
+    if process.returncode != 0:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise RuntimeError(f"Could not encode trimmed audio {output_path}: {process.stderr[-2000:]}")
+    os.replace(part_path, output_path)
+
+
+def trim_silence(local_directory: str, id, profile: str = AUDIO_PROFILE, video_path: str = None) -> dict:
+    """
+    Cuts long silences out of an application's extracted audio, in place.
+
+    Args:
+        local_directory: The application's scratch directory holding the audio
+        id: The application ID
+        profile: Audio profile the trimmed audio is encoded with
+        video_path: The downloaded video the audio was extracted from, if any. The kept
+            spans are cut from it rather than from the already encoded audio.
+
+    Returns:
+        dict: original_seconds, trimmed_seconds, removed_seconds, removed_ratio and the
+        mapping of kept spans (see build_mapping), as saved to transcriptions/{id}_trim.json.
+        None if there is no audio to trim.
+    """
+    # Kept next to the audio too, so audio that was downloaded again is trimmed again
+    local_mapping_path = os.path.join(local_directory, os.path.basename(trim_mapping_path(id)))
+    if os.path.exists(local_mapping_path):
+        # Trimmed by an earlier attempt
+        with open(local_mapping_path, "r") as f:
+            return json.load(f)
+    audio_path = find_audio_file(local_directory, id)
+    if audio_path is None:
+        return None
+
+    levels, original_seconds = decode_levels(audio_path)
+    segments = speech_segments(levels, original_seconds)
+    if not segments:
+        logger.warning(f"No speech detected in the audio of ID {id}, leaving it untrimmed")
+        segments = [(0.0, round(original_seconds, 3))]
+
+    trimmed_seconds = sum(end - start for start, end in segments)
+    removed_seconds = original_seconds - trimmed_seconds
+    if removed_seconds < TRIM_MIN_REMOVED_SECONDS:
+        segments = [(0.0, round(original_seconds, 3))]
+        trimmed_seconds, removed_seconds = original_seconds, 0.0
+    else:
+        # Cut from the video if it is still here, so the kept audio is encoded only once
+        source_path = video_path if video_path and os.path.exists(video_path) else audio_path
+        output_path = os.path.join(local_directory, f"{id}{AUDIO_PROFILES[profile]['extension']}")
+        cut_segments(source_path, segments, output_path, profile)
+        if output_path != audio_path:
+            os.remove(audio_path)
+
+    report = {
+        "original_seconds": round(original_seconds, 3),
+        "trimmed_seconds": round(trimmed_seconds, 3),
+        "removed_seconds": round(removed_seconds, 3),
+        "removed_ratio": round(removed_seconds / original_seconds, 4) if original_seconds else 0.0,
+        "threshold_db": TRIM_SILENCE_THRESHOLD_DB,
+        "mapping": build_mapping(segments),
+    }
+    os.makedirs(os.path.dirname(trim_mapping_path(id)), exist_ok=True)
+    for path in (trim_mapping_path(id), local_mapping_path):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    logger.info(f"Trimmed {report['removed_seconds']:.1f}s of silence ({report['removed_ratio']:.0%}) "
+                f"from the audio of ID {id}, {report['trimmed_seconds']:.1f}s left")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Report the silence trim_silence would remove from an audio file")
+    parser.add_argument("audio_path")
+    args = parser.parse_args()
+    levels, total = decode_levels(args.audio_path)
+    segments = speech_segments(levels, total)
+    kept = sum(end - start for start, end in segments)
+    print(f"{total:.1f}s of audio, {kept:.1f}s of speech, {total - kept:.1f}s removable "
+          f"({(total - kept) / total if total else 0:.0%}) in {len(segments)} segments")
@@ -1,10 +1,18 @@
 import os
+import re
 import json
-from openai import OpenAI
+import contextlib
 
 from dotenv import load_dotenv, find_dotenv
 import subprocess
 import shutil
+import itertools
+import tempfile
+from concurrent.futures import CancelledError
+
+from constants import AUDIO_PROFILE
+from utils.transcode_pool import get_transcode_pool, FFMPEG_THREADS, TRANSCODE_TIMEOUT_SECONDS
+from utils.google_clients import drive_file_id_from_link, get_drive_file_metadata, iter_drive_file
 
 load_dotenv(find_dotenv())
 
@@ -12,6 +20,40 @@ import logging
 
 logging.basicConfig(level=logging.INFO)
 
+# Encodings the audio track can be extracted to: file extension, ffmpeg muxer and codec options.
+# Speech recognition models resample to 16 kHz mono, so the speech profiles drop everything above that.
+AUDIO_PROFILES = {
+    # The original encoding, full-band stereo MP3
+    "mp3_hifi": {
+        "extension": ".mp3",
+        "format": "mp3",
+        "args": ["-acodec", "libmp3lame", "-ab", "192k", "-ar", "44100"],
+    },
+    "speech_mp3": {
+        "extension": ".mp3",
+        "format": "mp3",
+        "args": ["-acodec", "libmp3lame", "-ab", "48k", "-ar", "16000", "-ac", "1"],
+    },
+    "speech_opus": {
+        "extension": ".ogg",
+        "format": "ogg",
+        "args": ["-acodec", "libopus", "-b:a", "24k", "-ar", "16000", "-ac", "1", "-application", "voip"],
+    },
+    "speech_m4a": {
+        "extension": ".m4a",
+        "format": "ipod",
+        "args": ["-acodec", "aac", "-b:a", "48k", "-ar", "16000", "-ac", "1"],
+    },
+}
+AUDIO_EXTENSIONS = sorted({profile["extension"] for profile in AUDIO_PROFILES.values()})
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv']
+# Upload limit of the OpenAI transcription endpoint
+TRANSCRIPTION_MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+# Bytes of a video inspected to decide whether ffmpeg can read it from a pipe
+STREAM_SNIFF_BYTES = 64 * 1024
+# Seconds after which reading a file's duration is given up
+PROBE_TIMEOUT_SECONDS = 60
+
 # Create necessary folders for caching
 def ensure_cache_folders():
     folders = ["transcriptions", "responses"]
@@ -20,10 +62,70 @@ def ensure_cache_folders():
             os.makedirs(folder)
             print(f"Created {folder} directory for caching")
 
+def audio_encoding_args(profile: str = AUDIO_PROFILE) -> list:
+    """ffmpeg output options that extract the audio track of a video with an audio profile."""
+    if profile not in AUDIO_PROFILES:
+        raise ValueError(f"Unknown audio profile {profile}, expected one of {', '.join(AUDIO_PROFILES)}")
+    return ["-vn", *AUDIO_PROFILES[profile]["args"], "-threads", str(FFMPEG_THREADS),
+            "-f", AUDIO_PROFILES[profile]["format"]]
+
+def audio_file_path(local_directory: str, id: str, profile: str = AUDIO_PROFILE) -> str:
+    return os.path.join(local_directory, f"{id}{AUDIO_PROFILES[profile]['extension']}")
+
+def find_audio_file(local_directory: str, id: str):
+    """Path of the extracted audio of an application in any profile's format, or None."""
+    for extension in AUDIO_EXTENSIONS:
+        path = os.path.join(local_directory, f"{id}{extension}")
+        if os.path.exists(path):
+            return path
+    return None
+
+def audio_duration_seconds(path: str):
+    """Duration of an audio or video file as reported by ffmpeg, or None if it cannot be read."""
+    try:
+        # ffmpeg prints the input's "Duration: HH:MM:SS.ss"; the null output with -t 0 decodes nothing
+        cmd = ["ffmpeg", "-hide_banner", "-i", path, "-t", "0", "-f", "null", "-"]
+        with get_transcode_pool().popen(cmd, name=f"probe {os.path.basename(path)}", timeout=PROBE_TIMEOUT_SECONDS,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True) as process:
+            output = process.communicate()[1]
+    except (OSError, subprocess.TimeoutExpired, CancelledError):
+        return None
+    match = re.search(r"Duration: (\d+):(\d+):([\d.]+)", output)
+    if match is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def find_video_file(local_directory: str, id: str):
+    """
+    Path of the downloaded video of an application, or None.
+
+    Videos are downloaded as {id}{extension}. A directory holding a single video under
+    another name (downloaded before files were named by ID) is accepted as well.
+    """
+    if not os.path.isdir(local_directory):
+        return None
+    videos = [file for file in os.listdir(local_directory)
+              if not file.startswith('.') and os.path.splitext(file)[1].lower() in VIDEO_EXTENSIONS]
+    for file in videos:
+        if os.path.splitext(file)[0] == str(id):
+            return os.path.join(local_directory, file)
+    if len(videos) == 1:
+        return os.path.join(local_directory, videos[0])
+    return None
+
+def transcribe_audio_file(audio_path: str, model: str, audio_seconds: float = None) -> str:
+    """
+    Transcribes one audio file as plain text with the configured backend (TRANSCRIPTION_BACKEND).
+
+    audio_seconds is the file's duration if the caller already knows it, saving a probe.
+    """
+    # Imported here as the backends build on this module
+    from utils.transcription_backends import get_transcription_backend
+    return get_transcription_backend().transcribe(audio_path, model, audio_seconds)
+
 def get_video_transcription(local_directory: str, id: str):
     ensure_cache_folders()
-    open_ai_api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=open_ai_api_key)
     transcript_dict = {}
     
     # Process all MP3 files in the directory
@@ -38,36 +140,57 @@ def get_video_transcription(local_directory: str, id: str):
                 transcript_dict = transcription
     else:
         print(f"Transcribing file id {file_id}...")
-        with open(f"{local_directory}/{file_id}.mp3", 'rb') as audio_file:
-            transcription = client.audio.transcriptions.create(
-                model="gpt-4o-transcribe", 
-                file=audio_file, 
-                response_format="text",
-                # prompt=file_id
-            )
-            transcription_v2 = client.audio.transcriptions.create(
-                file=audio_file,
-                model="whisper-1",
-                response_format="text",
-                # timestamp_granularities=["word"]
+        audio_path = find_audio_file(local_directory, file_id)
+        if audio_path is None:
+            raise FileNotFoundError(f"No extracted audio for ID {file_id} in {local_directory}")
+        # Imported here as chunked transcription builds on this module
+        from utils.chunked_transcription import should_chunk, split_into_chunks, transcribe_chunks
+        from utils.transcription_strategy import transcribe_with_strategy
+        from utils.transcription_backends import get_transcription_backend
+        # Probed once; the backends are given the durations rather than probing every call
+        audio_seconds = audio_duration_seconds(audio_path)
+        with contextlib.ExitStack() as stack:
+            # Split once; every model the strategy tries transcribes the same chunk files
+            if should_chunk(audio_path):
+                chunk_files = stack.enter_context(split_into_chunks(audio_path))
+            else:
+                chunk_files = [(audio_path, audio_seconds)]
+            transcription = transcribe_with_strategy(
+                file_id,
+                lambda model: transcribe_chunks(chunk_files, model),
+                audio_seconds,
+                single_model=get_transcription_backend().single_model
             )
-            if len(transcription) <= len(transcription_v2):
-                transcription = transcription_v2
-                logging.info(f"Using Whisper-1 transcription for {file_id} got length {len(transcription)}")
-            transcript_dict[str(file_id)] = transcription
-                
-            # Cache the transcription
-            with open(transcription_cache_path, 'w') as cache_file:
-                json.dump(transcript_dict, cache_file)
-            print(f"Cached transcription for {file_id}")
-            os.remove(f"{local_directory}/{file_id}.mp3")
+        transcript_dict[str(file_id)] = transcription
+            
+        # Cache the transcription
+        with open(transcription_cache_path, 'w') as cache_file:
+            json.dump(transcript_dict, cache_file)
+        print(f"Cached transcription for {file_id}")
+        os.remove(audio_path)
     return transcript_dict
 
-def convert_file_mp3(local_directory:str, id:str):
-    # Check if MP3 already exists for this ID
-    mp3_path = os.path.join(local_directory, f"{id}.mp3")
-    if os.path.exists(mp3_path) or os.path.exists(f"transcriptions/{id}.json"):
-        print(f"MP3 file for ID {id} or its transcription already exists. Skipping conversion.")
+def convert_file_mp3(local_directory:str, id:str, profile:str = AUDIO_PROFILE, video_path:str = None,
+                     keep_video:bool = False):
+    """
+    Extracts the audio track of an application's video with an audio profile.
+
+    Only the application's own video is converted (see find_video_file), and it is removed
+    once its audio has been extracted unless keep_video is set.
+
+    Args:
+        local_directory: The application's scratch directory
+        id: The application ID, which names the audio file
+        profile: A key of AUDIO_PROFILES
+        video_path: The video to convert. Defaults to the application's video in local_directory.
+        keep_video: Leave the video in place, e.g. for trim_silence to cut the audio from it
+
+    Returns:
+        bool: True if the audio file (or the transcription) exists afterwards
+    """
+    # Check if the audio already exists for this ID
+    if find_audio_file(local_directory, id) or os.path.exists(f"transcriptions/{id}.json"):
+        print(f"Audio file for ID {id} or its transcription already exists. Skipping conversion.")
         return True
         
     # Check if ffmpeg is installed
@@ -75,68 +198,157 @@ def convert_file_mp3(local_directory:str, id:str):
         print("Error: ffmpeg is not installed or not in PATH. Please install ffmpeg first.")
         return False
     
-    # Ensure directory exists
-    if not os.path.exists(local_directory):
-        print(f"Error: Directory {local_directory} does not exist")
+    input_path = video_path or find_video_file(local_directory, id)
+    if input_path is None or not os.path.exists(input_path):
+        print(f"Error: No video for ID {id} in {local_directory}")
         return False
     
-    converted = False
-    for file in os.listdir(local_directory):
-        # Skip mp3 files and hidden files
-        if file.endswith('.mp3') or file.startswith('.'):
-            continue
-        
-        # Check if this is a video file (common video extensions)
-        video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv']
-        is_video = any(file.lower().endswith(ext) for ext in video_extensions)
-        
-        if not is_video:
-            print(f"Skipping {file} - not a recognized video format")
-            continue
-        
-        print(f"Converting {file} to MP3...")
+    file = os.path.basename(input_path)
+    output_path = audio_file_path(local_directory, id, profile)
+    # Written under a temporary name so an interrupted conversion is never mistaken for finished audio
+    part_path = f"{output_path}.part"
+    print(f"Converting {file} to {os.path.basename(output_path)}...")
+    
+    try:
+        # Use proper ffmpeg parameters for extracting audio
+        cmd = [
+            "ffmpeg",
+            "-i", input_path,        # Input file
+            *audio_encoding_args(profile),
+            "-y",                    # Overwrite output file
+            part_path                # Output file
+        ]
         
-        input_path = os.path.join(local_directory, file)
-        output_path = os.path.join(local_directory, f"{id}.mp3")
+        # Run the command in the shared transcode pool, which bounds ffmpeg processes to the cores
+        process = get_transcode_pool().run(cmd, name=str(id), timeout=TRANSCODE_TIMEOUT_SECONDS)
         
-        try:
-            # Use proper ffmpeg parameters for extracting audio
-            cmd = [
-                "ffmpeg",
-                "-i", input_path,        # Input file
-                "-vn",                   # Disable video
-                "-acodec", "libmp3lame", # Use MP3 codec
-                "-ab", "192k",          # Audio bitrate
-                "-ar", "44100",         # Audio sample rate
-                "-y",                    # Overwrite output file
-                output_path              # Output file
-            ]
-            
-            # Run the command and capture output
-            process = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            # Check if conversion was successful
-            if process.returncode == 0:
-                print(f"Successfully converted {file} to {id}.mp3")
-                converted = True
-                # Remove original file
+        # Check if conversion was successful
+        if process.returncode == 0:
+            os.replace(part_path, output_path)
+            print(f"Successfully converted {file} to {os.path.basename(output_path)}")
+            # Remove original file
+            if not keep_video:
                 os.remove(input_path)
-            else:
-                print(f"Error converting {file}")
-                print(f"ffmpeg error: {process.stderr}")
-        
-        except Exception as e:
-            print(f"Conversion failed: {str(e)}")
+            return True
+        print(f"Error converting {file}")
+        print(f"ffmpeg error: {process.stderr}")
+    
+    except subprocess.TimeoutExpired:
+        print(f"Conversion of {file} timed out after {TRANSCODE_TIMEOUT_SECONDS:.0f}s")
+    except Exception as e:
+        print(f"Conversion failed: {repr(e)}")
     
-    if not converted:
-        print("No files were converted. Check if the directory contains valid video files.")
+    if os.path.exists(part_path):
+        os.remove(part_path)
     
-    return converted
+    return False
+
+def is_streamable_container(head: bytes) -> bool:
+    """
+    Whether ffmpeg can extract audio from a video read from a pipe, judging by its first bytes.
+
+    MP4/MOV files can only be read front to back when their moov atom (the index) comes
+    before the mdat atom (the media); files with a trailing moov need seeking. Matroska/WebM,
+    FLV and MPEG-TS are always streamable. Anything else is treated as not streamable.
+    """
+    if head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"pnot"):
+        offset = 0
+        while offset + 8 <= len(head):
+            box_size = int.from_bytes(head[offset:offset + 4], "big")
+            box_type = head[offset + 4:offset + 8]
+            if box_type == b"moov":
+                return True
+            if box_type == b"mdat":
+                return False
+            if box_size == 1:
+                # 64-bit box size
+                if offset + 16 > len(head):
+                    return False
+                box_size = int.from_bytes(head[offset + 8:offset + 16], "big")
+            if box_size < 8:
+                return False
+            offset += box_size
+        # moov is not within the inspected bytes
+        return False
+    return (head.startswith(b"\x1a\x45\xdf\xa3")    # Matroska / WebM
+            or head.startswith(b"FLV")
+            or (head[:1] == b"\x47" and head[188:189] == b"\x47"))  # MPEG-TS
+
+def stream_drive_audio(id: str, drive_link: str, local_directory: str, profile: str = AUDIO_PROFILE) -> bool:
+    """
+    Extracts the audio of a Drive video into {local_directory}/{id}.<profile extension> while it downloads.
+
+    The video is streamed from Drive into ffmpeg's stdin, so transcoding overlaps with the
+    transfer and the video is never written to disk.
+
+    Returns:
+        bool: True if the audio file exists afterwards. False if the video has to be downloaded and
+        converted instead: the container needs seeking, ffmpeg is missing, or streaming failed.
+    """
+    audio_path = audio_file_path(local_directory, id, profile)
+    if find_audio_file(local_directory, id) or os.path.exists(f"transcriptions/{id}.json"):
+        print(f"Audio file for ID {id} or its transcription already exists. Skipping audio extraction.")
+        return True
+    if shutil.which('ffmpeg') is None:
+        return False
+
+    part_path = f"{audio_path}.part"
+    try:
+        file_id = drive_file_id_from_link(drive_link)
+        metadata = get_drive_file_metadata(file_id)
+        blocks = iter_drive_file(file_id, size=metadata['size'])
+
+        # Read enough of the video to tell whether its container can be read from a pipe
+        head_blocks = []
+        for block in blocks:
+            head_blocks.append(block)
+            if sum(len(b) for b in head_blocks) >= STREAM_SNIFF_BYTES:
+                break
+        if not is_streamable_container(b"".join(head_blocks)[:STREAM_SNIFF_BYTES]):
+            blocks.close()
+            logging.info(f"Video of ID {id} ({metadata.get('name')}) needs seeking, falling back to download and convert")
+            return False
+
+        os.makedirs(local_directory, exist_ok=True)
+        print(f"Streaming audio of {metadata.get('name')} into {audio_path}...")
+        with tempfile.TemporaryFile() as stderr_file:
+            # Tracked by the transcode pool so it is timed out and cancelled like the pool's jobs,
+            # without taking a worker while it mostly waits for the download
+            with get_transcode_pool().popen(
+                ["ffmpeg", "-i", "pipe:0", *audio_encoding_args(profile), "-y", part_path],
+                name=str(id),
+                timeout=TRANSCODE_TIMEOUT_SECONDS,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=stderr_file
+            ) as process:
+                try:
+                    for block in itertools.chain(head_blocks, blocks):
+                        process.stdin.write(block)
+                except (BrokenPipeError, ValueError):
+                    # ffmpeg exited early (or was killed); its return code says whether that was an error
+                    pass
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+            returncode = process.wait()
+            if returncode != 0:
+                stderr_file.seek(0)
+                error_tail = stderr_file.read().decode(errors="replace")[-2000:]
+                print(f"ffmpeg could not extract audio from the stream of ID {id}: {error_tail}")
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+                return False
+
+        os.replace(part_path, audio_path)
+        print(f"Successfully extracted audio of ID {id} to {audio_path}")
+        return True
+    except Exception as e:
+        print(f"Streaming audio extraction failed for ID {id}, falling back to download and convert: {e!r}")
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return False
 
 def store_response(id: str, response_json: dict):
     """Store response JSON data to a file in the responses folder
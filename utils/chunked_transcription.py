@@ -0,0 +1,228 @@
+"""
+Chunked, concurrent transcription of long audio.
+
+A single transcription request for a whole pitch takes time proportional to its length,
+and files over the provider's upload limit are rejected outright. In chunked mode the
+audio is split into TRANSCRIPTION_CHUNK_SECONDS pieces that overlap by
+TRANSCRIPTION_CHUNK_OVERLAP_SECONDS, the pieces are transcribed concurrently, and the
+texts are stitched back together.
+
+Chunks end at the quietest moment near their target length, so cuts rarely fall inside
+a word. Words spoken in an overlap appear at the end of one chunk's text and the start
+of the next one's; stitching finds the longest run of words the two have in common
+within as many words as can be spoken in the overlap, and keeps it once.
+
+A file is split once (split_into_chunks) and the same chunk files can then be transcribed
+with several models (transcribe_chunks), as the transcription strategies do. Chunks go to
+the transcription backend as one batch, so its own concurrency limit (batch_concurrency)
+applies.
+
+TRANSCRIPTION_CHUNKING (constants.py) selects when chunking is used: "auto" only for files
+over the upload limit, "on" for every file longer than one chunk, "off" never.
+"""
+import contextlib
+import difflib
+import logging
+import math
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from constants import AUDIO_PROFILE, TRANSCRIPTION_CHUNKING
+from utils.audio_transcribe import AUDIO_PROFILES, TRANSCRIPTION_MAX_UPLOAD_BYTES, audio_encoding_args
+from utils.audio_preprocess import FRAME_SECONDS, decode_levels
+from utils.transcode_pool import get_transcode_pool, TRANSCODE_TIMEOUT_SECONDS
+from utils.transcription_backends import get_transcription_backend
+from utils.transcription_strategy import MAX_WORDS_PER_MINUTE
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTION_CHUNK_SECONDS = float(os.getenv("TRANSCRIPTION_CHUNK_SECONDS", "300"))
+# Must hold at least STITCH_MIN_MATCH_WORDS words of speech for the overlap to be found
+TRANSCRIPTION_CHUNK_OVERLAP_SECONDS = float(os.getenv("TRANSCRIPTION_CHUNK_OVERLAP_SECONDS", "5"))
+# Chunks of one file transcribed at once, at most the backend's batch_concurrency
+# (the OpenAI rate limiters still apply)
+TRANSCRIPTION_CHUNK_CONCURRENCY = int(os.getenv("TRANSCRIPTION_CHUNK_CONCURRENCY", "4"))
+# How far before its target end a chunk may be cut to land on a quiet moment
+CHUNK_BOUNDARY_SEARCH_SECONDS = 10.0
+# Shortest common run of words accepted as the overlap; shorter runs (e.g. "the city") are
+# too likely to appear in both texts by chance
+STITCH_MIN_MATCH_WORDS = 4
+# Seconds added to the overlap when sizing the stitching window, as chunk starts move by up
+# to a second to land on a quiet moment
+STITCH_OVERLAP_SLACK_SECONDS = 1.0
+
+
+def should_chunk(audio_path: str, mode: str = TRANSCRIPTION_CHUNKING) -> bool:
+    """Whether an audio file is transcribed in chunks under a TRANSCRIPTION_CHUNKING mode."""
+    if mode == "on":
+        return True
+    if mode == "auto":
+        return os.path.getsize(audio_path) > TRANSCRIPTION_MAX_UPLOAD_BYTES
+    return False
+
+
+# Frames within this many dB of the quietest one count as equally quiet
+QUIET_TOLERANCE_DB = 3.0
+
+
+def _quietest(levels, start: float, end: float) -> float:
+    """Time of the middle of the quietest frame between start and end, the latest one on ties."""
+    first, last = max(0, int(start / FRAME_SECONDS)), int(end / FRAME_SECONDS)
+    if last <= first or first >= len(levels):
+        return end
+    window = levels[first:min(last, len(levels))]
+    quiet = np.flatnonzero(window <= window.min() + QUIET_TOLERANCE_DB)
+    return (first + int(quiet[-1]) + 0.5) * FRAME_SECONDS
+
+
+def plan_chunks(levels, duration: float, chunk_seconds: float = TRANSCRIPTION_CHUNK_SECONDS,
+                overlap_seconds: float = TRANSCRIPTION_CHUNK_OVERLAP_SECONDS,
+                search_seconds: float = CHUNK_BOUNDARY_SEARCH_SECONDS) -> list:
+    """
+    Where to split audio.
+
+    Args:
+        levels: Level of each FRAME_SECONDS frame of the audio, see decode_levels
+        duration: Duration of the audio in seconds
+
+    Returns:
+        list: (start, end) seconds of each chunk. Consecutive chunks overlap by about
+        overlap_seconds, and every chunk but the last ends at a quiet moment.
+    """
+    search_seconds = min(search_seconds, chunk_seconds / 2)
+    chunks = []
+    start = 0.0
+    while start + chunk_seconds < duration:
+        end = _quietest(levels, start + chunk_seconds - search_seconds, start + chunk_seconds)
+        chunks.append((round(start, 3), round(end, 3)))
+        # Start the next chunk on the quietest moment about overlap_seconds earlier
+        next_start = _quietest(levels, end - overlap_seconds - 1.0, end - overlap_seconds + 1.0)
+        start = max(next_start, start + 1.0) if overlap_seconds > 0 else end
+    chunks.append((round(start, 3), round(duration, 3)))
+    return chunks
+
+
+def _normalize(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def stitch_window_words(overlap_seconds: float) -> int:
+    """Most words that can be spoken in an overlap, at MAX_WORDS_PER_MINUTE."""
+    return max(1, math.ceil((overlap_seconds + STITCH_OVERLAP_SLACK_SECONDS) * MAX_WORDS_PER_MINUTE / 60))
+
+
+def stitch_transcripts(texts: list, overlap_seconds: float = TRANSCRIPTION_CHUNK_OVERLAP_SECONDS,
+                       min_match_words: int = STITCH_MIN_MATCH_WORDS) -> str:
+    """
+    Joins the transcripts of consecutive overlapping chunks, keeping overlapping words once.
+
+    The overlap is the longest run of at least min_match_words words shared by the last
+    and first stitch_window_words(overlap_seconds) words of the text so far and the next
+    text. Everything before it in the next text and after it in the text so far (words cut
+    off at the chunk edges) is dropped. Texts without such a run, e.g. because the overlap
+    fell on silence, are simply concatenated.
+    """
+    window_words = stitch_window_words(overlap_seconds)
+    words = []
+    for text in texts:
+        next_words = text.split()
+        if not words:
+            words = next_words
+            continue
+        tail = words[-window_words:]
+        head = next_words[:window_words]
+        match = difflib.SequenceMatcher(None, [_normalize(w) for w in tail], [_normalize(w) for w in head],
+                                        autojunk=False).find_longest_match(0, len(tail), 0, len(head))
+        if match.size >= min_match_words:
+            cut = len(words) - len(tail) + match.a + match.size
+            words = words[:cut] + next_words[match.b + match.size:]
+        else:
+            words = words + next_words
+    return " ".join(words)
+
+
+@contextlib.contextmanager
+def split_into_chunks(audio_path: str, profile: str = AUDIO_PROFILE,
+                      chunk_seconds: float = TRANSCRIPTION_CHUNK_SECONDS,
+                      overlap_seconds: float = TRANSCRIPTION_CHUNK_OVERLAP_SECONDS):
+    """
+    Splits an audio file into overlapping chunk files, removed when the context exits.
+
+    Args:
+        audio_path: The audio file
+        profile: Audio profile the chunks are encoded with
+        chunk_seconds: Target length of a chunk
+        overlap_seconds: Audio shared by consecutive chunks
+
+    Yields:
+        list: (path, seconds) of the chunk files in order, or just (audio_path, its duration)
+        if it fits in one chunk
+    """
+    levels, duration = decode_levels(audio_path)
+    chunks = plan_chunks(levels, duration, chunk_seconds, overlap_seconds)
+    if len(chunks) == 1:
+        yield [(audio_path, duration)]
+        return
+
+    extension = AUDIO_PROFILES[profile]["extension"]
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(audio_path) or None) as directory:
+        chunk_files = []
+        for index, (start, end) in enumerate(chunks):
+            path = os.path.join(directory, f"chunk_{index:03d}{extension}")
+            cmd = ["ffmpeg", "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", audio_path,
+                   *audio_encoding_args(profile), "-y", path]
+            process = get_transcode_pool().run(cmd, name=f"chunk {index} of {os.path.basename(audio_path)}",
+                                               timeout=TRANSCODE_TIMEOUT_SECONDS)
+            if process.returncode != 0:
+                raise RuntimeError(f"Could not encode chunk {index} of {audio_path}: {process.stderr[-2000:]}")
+            chunk_files.append((path, end - start))
+        logger.info(f"Split {os.path.basename(audio_path)} into {len(chunks)} chunks: {chunks}")
+        yield chunk_files
+
+
+def transcribe_chunks(chunk_files: list, model: str = None, concurrency: int = TRANSCRIPTION_CHUNK_CONCURRENCY,
+                      overlap_seconds: float = TRANSCRIPTION_CHUNK_OVERLAP_SECONDS) -> str:
+    """
+    Transcribes chunk files as one batch of the transcription backend and stitches their texts.
+
+    Args:
+        chunk_files: (path, seconds) of the chunk files in order, see split_into_chunks
+        model: The requested model
+        concurrency: Chunks transcribed at once, at most the backend's batch_concurrency
+        overlap_seconds: Audio shared by consecutive chunks, as they were split with
+
+    Returns:
+        str: The stitched transcript
+    """
+    backend = get_transcription_backend()
+    if len(chunk_files) == 1:
+        path, seconds = chunk_files[0]
+        return backend.transcribe(path, model, seconds)
+    paths, seconds = zip(*chunk_files)
+    return stitch_transcripts(backend.transcribe_batch(list(paths), model, concurrency, list(seconds)),
+                              overlap_seconds)
+
+
+def transcribe_chunked(audio_path: str, model: str = None, profile: str = AUDIO_PROFILE,
+                       chunk_seconds: float = TRANSCRIPTION_CHUNK_SECONDS,
+                       overlap_seconds: float = TRANSCRIPTION_CHUNK_OVERLAP_SECONDS,
+                       concurrency: int = TRANSCRIPTION_CHUNK_CONCURRENCY) -> str:
+    """
+    Transcribes an audio file in overlapping chunks, concurrently.
+
+    Args:
+        audio_path: The audio file
+        model: The requested model
+        profile: Audio profile the chunks are encoded with
+        chunk_seconds: Target length of a chunk
+        overlap_seconds: Audio shared by consecutive chunks
+        concurrency: Chunks transcribed at once, at most the backend's batch_concurrency
+
+    Returns:
+        str: The stitched transcript
+    """
+    with split_into_chunks(audio_path, profile, chunk_seconds, overlap_seconds) as chunk_files:
+        return transcribe_chunks(chunk_files, model, concurrency, overlap_seconds)
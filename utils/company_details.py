@@ -1,13 +1,13 @@
 import pandas as pd
 
-def without_keys(d, keys):
-    return {x: d[x] for x in d if x not in keys}
+from utils.application_store import ApplicationRecordStore
 
 
-def get_company_details(filtration_details: pd.DataFrame):
-    company_details = {}
+def get_company_details(filtration_details):
+    """Company details of the last 60 rows of the filtration sheet keyed by video link.
 
-    for keys in list(filtration_details.T.to_dict().keys())[-60:]:
-        company_response = without_keys(filtration_details.T.to_dict()[keys], ['Enter your application number here','Share a Google Sheet/Research Report that links to your estimates', 'Submitted At', 'Token'])
-        company_details[filtration_details.T.to_dict()[keys]['Share a private YouTube link to a video pitch of your company']] = company_response
-    return company_details
\ No newline at end of file
+    Accepts an ApplicationRecordStore, or the filtration sheet DataFrame to index on the fly.
+    """
+    if isinstance(filtration_details, pd.DataFrame):
+        filtration_details = ApplicationRecordStore(filtration_details)
+    return filtration_details.company_details_by_video_link(last_n=60)
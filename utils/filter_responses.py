@@ -1,144 +1,224 @@
 from constants import APPLICATION_ID, VIDEO_LINK, LOCAL_FOLDER, FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME, GOOGLE_SHEET_ESTIMATES, SUBMITTED_AT, TOKEN
+from utils.application_store import ApplicationRecordStore, COMPANY_DETAILS_EXCLUDED_KEYS
 import pandas as pd
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 
 def without_keys(d, keys):
     return {x: d[x] for x in d if x not in keys}
 
-def filter_responses(id: str, filtration_details: pd.DataFrame):
-    company_details = {}
-    filtration_id_key = list(filtration_details[filtration_details[APPLICATION_ID]==id].T.to_dict().keys())[0]
-    filtration_id = filtration_details[filtration_details[APPLICATION_ID]==id].T.to_dict()[filtration_id_key]
-    company_response = without_keys(filtration_id, [APPLICATION_ID,GOOGLE_SHEET_ESTIMATES ,SUBMITTED_AT, TOKEN])
+def filter_responses(id: str, filtration_details):
+    """
+    Formatted company details of an application.
+
+    Args:
+        id: The application ID
+        filtration_details: An ApplicationRecordStore, or the filtration sheet DataFrame
+
+    Returns:
+        str: The formatted company profile
+    """
+    if isinstance(filtration_details, ApplicationRecordStore):
+        company_response = filtration_details[id].company_response
+    else:
+        filtration_id = filtration_details[filtration_details[APPLICATION_ID]==id].to_dict(orient="records")[0]
+        company_response = without_keys(filtration_id, COMPANY_DETAILS_EXCLUDED_KEYS)
     # return company_response
-    return format_company_response(company_response)
+    return format_company_response(company_response, id=id)
+
+
+# --- Company profile layout --- #
+# Fields of each profile section, in the order they are rendered.
+# Basic fields are (field, label) pairs rendered as "<label>: <value>".
+BASIC_FIELDS = [
+    ("What is your vision for the company?", "Vision"),
+    ("What is the greater mission beyond building a profitable business?", "Mission"),
+    ("Describe your solution in detail", "Solution"),
+]
+
+MARKET_FIELDS = [
+    "How large do you think your solution's market is in Crores",
+    "What do you think will be the contribution margin % of the business in 5 years?",
+    "Large Competition",
+    "Mid Size Competition",
+    "Small Competition",
+    "What is the market share of the 3 largest competitors?",
+    "How would you best describe the product status of your competition today?",
+    "How would you best describe the tech status of your competition today?"
+]
+
+CUSTOMER_FIELDS = [
+    "What is your customer type?",
+    "Within India what geography and demography is your customer in?",
+    "What business size are you focused on?",
+    "Which sectors are your customers in?",
+    "What is the annual pricing of your product?",
+    "In Urban what gender is your focus?",
+    "In Rural what gender is your focus?",
+    "Choose your target age group",
+    "What is the target group's income level?",
+    "How much of their annual income could they spend on your product?"
+]
+
+SKILL_FIELDS = [
+    "Analytical", "Communication", "Judgement", "Negotiation", "Problem Solving",
+    "Financial", "Technical", "Sales and Marketing", "Project Management", "Network Building", "Product Management"
+]
+
+TRAIT_FIELDS = [
+    "Conviction/Belief", "Relentlessness", "Resilience", "Curiosity", "Reliability",
+    "Courage", "Innovative", "Energetic", "Inspiring", "Clear Thinking", "Pace of Execution"
+]
+
+PRODUCT_FIELDS = [
+    "What will your product require to be used?",
+    "How many potential users are available for your product?",
+    "What is the level of R&D in Engineering required in your company?",
+    "Intellectual Property",
+    "What is your expected Gross Margin?",
+    "How is your marketing likely to be",
+    "How is your product delivery likely to be"
+]
+
+BACKGROUND_FIELDS = [
+    "What is your biggest success and why?",
+    "What is your biggest failure and why?",
+    "What is a new concept you learnt recently?",
+    "What have you built before as a team?",
+    "Describe your progress with potential customers"
+]
+
+CATEGORIZED_FIELDS = frozenset(
+    [field for field, _ in BASIC_FIELDS] + MARKET_FIELDS + CUSTOMER_FIELDS + SKILL_FIELDS + TRAIT_FIELDS +
+    PRODUCT_FIELDS + BACKGROUND_FIELDS
+)
+
+PROFILE_HEADER = "COMPANY PROFILE\n" + "=" * 50 + "\n\n"
+SECTION_RULE = "-" * 20 + "\n"
+
+# Maximum number of formatted profiles kept by format_company_response
+PROFILE_CACHE_SIZE = 4096
+
+
+class CompanyProfileFormatter:
+    """
+    Company profile formatter compiled for one sheet schema.
+
+    The section layout (which headings and fields appear, in which order, with which
+    prefixes) is resolved once from the schema's columns, so rendering a row is a single
+    pass over a flat list of pieces joined at the end.
+    """
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        present = set(self.columns)
+        layout = [PROFILE_HEADER, "Basic Information:\n" + SECTION_RULE]
+
+        # (field, prefix, suffix, skip empty values)
+        for field, label in BASIC_FIELDS:
+            if field in present:
+                layout.append((field, f"{label}: ", "\n\n", False))
+
+        def add_section(heading, fields, prefix_format, suffix):
+            if heading:
+                layout.append(heading)
+            for field in fields:
+                if field in present:
+                    layout.append((field, prefix_format.format(field=field), suffix, True))
+
+        add_section("\nMarket Information:\n" + SECTION_RULE, MARKET_FIELDS, "{field}: ", "\n")
+        add_section("\nCustomer Information:\n" + SECTION_RULE, CUSTOMER_FIELDS, "{field}: ", "\n")
+        add_section("\nTeam Skills and Traits:\n" + SECTION_RULE + "Skills (rated 1-5):\n", SKILL_FIELDS, "- {field}: ", "\n")
+        add_section("\nTraits (rated 1-5):\n", TRAIT_FIELDS, "- {field}: ", "\n")
+        add_section("\nProduct Information:\n" + SECTION_RULE, PRODUCT_FIELDS, "{field}: ", "\n")
+        add_section("\nTeam Background:\n" + SECTION_RULE, BACKGROUND_FIELDS, "{field}:\n", "\n\n")
+
+        # Any remaining fields that weren't categorized, in sheet column order
+        remaining_fields = [column for column in self.columns if column not in CATEGORIZED_FIELDS]
+        if remaining_fields:
+            add_section("\nAdditional Information:\n" + SECTION_RULE, remaining_fields, "{field}: ", "\n")
+
+        # Merge adjacent literal pieces so rendering appends as few strings as possible
+        self.layout = []
+        for piece in layout:
+            if isinstance(piece, str) and self.layout and isinstance(self.layout[-1], str):
+                self.layout[-1] += piece
+            else:
+                self.layout.append(piece)
+
+    def format(self, company_response: dict) -> str:
+        parts = []
+        append = parts.append
+        for piece in self.layout:
+            if piece.__class__ is str:
+                append(piece)
+                continue
+            field, prefix, suffix, skip_empty = piece
+            value = company_response[field]
+            if skip_empty and not value:
+                continue
+            append(prefix)
+            append(f"{value}")
+            append(suffix)
+        return "".join(parts)
+
 
-def format_company_response(company_response):
+# Schema (tuple of columns) -> CompanyProfileFormatter
+_formatters = {}
+# (application ID, row content digest) -> formatted profile, least recently used first
+_profile_cache = OrderedDict()
+_profile_cache_lock = threading.Lock()
+
+
+def get_company_profile_formatter(columns) -> CompanyProfileFormatter:
+    """Returns the formatter compiled for a schema, compiling it on first use."""
+    columns = tuple(columns)
+    formatter = _formatters.get(columns)
+    if formatter is None:
+        formatter = _formatters.setdefault(columns, CompanyProfileFormatter(columns))
+    return formatter
+
+
+def _row_hash(company_response: dict) -> str:
+    """Content digest of a row. Column order is kept, as the formatter renders in schema order."""
+    return hashlib.sha1(json.dumps(list(company_response.items()), default=str).encode()).hexdigest()
+
+
+def format_company_response(company_response, id=None):
     """
     Format the company response to be more readable for the LLM
     
     Args:
         company_response: Original company response dictionary
+        id: Optional application ID. When given, the result is memoized by
+            (application ID, row content hash) so unchanged rows are not formatted again.
         
     Returns:
         str: A formatted string with clear sections and readable text
     """
-    # Create a structured format with sections
-    formatted_text = "COMPANY PROFILE\n" + "=" * 50 + "\n\n"
-    
-    # Basic Company Info section
-    formatted_text += "Basic Information:\n" + "-" * 20 + "\n"
-    
-    # Extract vision and mission first if they exist
-    if "What is your vision for the company?" in company_response:
-        formatted_text += f"Vision: {company_response.get('What is your vision for the company?')}\n\n"
-    
-    if "What is the greater mission beyond building a profitable business?" in company_response:
-        formatted_text += f"Mission: {company_response.get('What is the greater mission beyond building a profitable business?')}\n\n"
-    
-    if "Describe your solution in detail" in company_response:
-        formatted_text += f"Solution: {company_response.get('Describe your solution in detail')}\n\n"
-    
-    # Market Information
-    formatted_text += "\nMarket Information:\n" + "-" * 20 + "\n"
-    market_fields = [
-        "How large do you think your solution's market is in Crores",
-        "What do you think will be the contribution margin % of the business in 5 years?",
-        "Large Competition", 
-        "Mid Size Competition", 
-        "Small Competition",
-        "What is the market share of the 3 largest competitors?",
-        "How would you best describe the product status of your competition today?",
-        "How would you best describe the tech status of your competition today?"
-    ]
-    
-    for field in market_fields:
-        if field in company_response and company_response[field]:
-            formatted_text += f"{field}: {company_response[field]}\n"
-    
-    # Customer Information
-    formatted_text += "\nCustomer Information:\n" + "-" * 20 + "\n"
-    customer_fields = [
-        "What is your customer type?",
-        "Within India what geography and demography is your customer in?",
-        "What business size are you focused on?",
-        "Which sectors are your customers in?",
-        "What is the annual pricing of your product?",
-        "In Urban what gender is your focus?",
-        "In Rural what gender is your focus?",
-        "Choose your target age group",
-        "What is the target group's income level?",
-        "How much of their annual income could they spend on your product?"
-    ]
-    
-    for field in customer_fields:
-        if field in company_response and company_response[field]:
-            formatted_text += f"{field}: {company_response[field]}\n"
-    
-    # Team Skills and Traits
-    formatted_text += "\nTeam Skills and Traits:\n" + "-" * 20 + "\n"
-    
-    # Skills section
-    skills = [
-        "Analytical", "Communication", "Judgement", "Negotiation", "Problem Solving",
-        "Financial", "Technical", "Sales and Marketing", "Project Management", "Network Building", "Product Management"
-    ]
-    
-    formatted_text += "Skills (rated 1-5):\n"
-    for skill in skills:
-        if skill in company_response and company_response[skill]:
-            formatted_text += f"- {skill}: {company_response[skill]}\n"
-    
-    # Traits section
-    traits = [
-        "Conviction/Belief", "Relentlessness", "Resilience", "Curiosity", "Reliability",
-        "Courage", "Innovative", "Energetic", "Inspiring", "Clear Thinking", "Pace of Execution"
-    ]
-    
-    formatted_text += "\nTraits (rated 1-5):\n"
-    for trait in traits:
-        if trait in company_response and company_response[trait]:
-            formatted_text += f"- {trait}: {company_response[trait]}\n"
-    
-    # Product Information
-    formatted_text += "\nProduct Information:\n" + "-" * 20 + "\n"
-    product_fields = [
-        "What will your product require to be used?",
-        "How many potential users are available for your product?",
-        "What is the level of R&D in Engineering required in your company?",
-        "Intellectual Property",
-        "What is your expected Gross Margin?",
-        "How is your marketing likely to be",
-        "How is your product delivery likely to be"
-    ]
-    
-    for field in product_fields:
-        if field in company_response and company_response[field]:
-            formatted_text += f"{field}: {company_response[field]}\n"
-    
-    # Team Background
-    formatted_text += "\nTeam Background:\n" + "-" * 20 + "\n"
-    background_fields = [
-        "What is your biggest success and why?",
-        "What is your biggest failure and why?",
-        "What is a new concept you learnt recently?",
-        "What have you built before as a team?",
-        "Describe your progress with potential customers"
-    ]
-    
-    for field in background_fields:
-        if field in company_response and company_response[field]:
-            formatted_text += f"{field}:\n{company_response[field]}\n\n"
-    
-    # Include any remaining fields that weren't categorized
-    remaining_fields = set(company_response.keys()) - set(
-        market_fields + customer_fields + skills + traits + product_fields + background_fields + 
-        ["What is your vision for the company?", "What is the greater mission beyond building a profitable business?", "Describe your solution in detail"]
-    )
-    
-    if remaining_fields:
-        formatted_text += "\nAdditional Information:\n" + "-" * 20 + "\n"
-        for field in remaining_fields:
-            if company_response[field]:
-                formatted_text += f"{field}: {company_response[field]}\n"
-    
-    return formatted_text
\ No newline at end of file
+    formatter = get_company_profile_formatter(company_response.keys())
+    if id is None:
+        return formatter.format(company_response)
+
+    key = (id, _row_hash(company_response))
+    with _profile_cache_lock:
+        formatted_text = _profile_cache.get(key)
+        if formatted_text is not None:
+            _profile_cache.move_to_end(key)
+            return formatted_text
+
+    formatted_text = formatter.format(company_response)
+    with _profile_cache_lock:
+        _profile_cache[key] = formatted_text
+        while len(_profile_cache) > PROFILE_CACHE_SIZE:
+            _profile_cache.popitem(last=False)
+    return formatted_text
+
+
+def clear_company_profile_cache():
+    """Drop all memoized profiles and compiled formatters."""
+    with _profile_cache_lock:
+        _profile_cache.clear()
+    _formatters.clear()
@@ -9,7 +9,7 @@ import threading
 import socket
 import datetime
 import re
-import io
+import mimetypes
 
 
 """
@@ -25,11 +25,16 @@ from email.message import EmailMessage
 
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload
 
 from google.oauth2 import service_account
+from google.auth.transport.requests import AuthorizedSession
+import requests
+import hashlib
+import time
 import pandas as pd
 
+from utils.rate_limit import get_rate_limiter
+
 SCOPES = [
 "https://www.googleapis.com/auth/gmail.compose",  # For creating Gmail drafts or sending emails.
 "https://www.googleapis.com/auth/drive.file",     # For uploading files to Drive.
@@ -44,6 +49,18 @@ SCOPES = [
 
 GOOGLE_APPLICATION_CREDENTIALS = 'utils/neat-height-449308-h8-2a37363e5a04.json'
 
+# Bytes requested per ranged request when downloading Drive files, and retries of a failed range
+DRIVE_DOWNLOAD_CHUNK_BYTES = int(os.getenv("DRIVE_DOWNLOAD_CHUNK_BYTES", str(32 * 1024 * 1024)))
+DRIVE_DOWNLOAD_MAX_RETRIES = int(os.getenv("DRIVE_DOWNLOAD_MAX_RETRIES", "5"))
+DRIVE_MEDIA_URL = "https://www.googleapis.com/drive/v3/files/{file_id}?alt=media&supportsAllDrives=true"
+# Bytes held in memory at a time while streaming a range to disk
+STREAM_BLOCK_BYTES = 1024 * 1024
+
+# Credentials by impersonated user (None for the service account itself), and per-thread service objects
+_credentials = {}
+_credentials_lock = threading.Lock()
+_thread_services = threading.local()
+
 
 def get_credentials(subject_email: str = None):
     """
@@ -54,29 +71,74 @@ def get_credentials(subject_email: str = None):
     The code expects the environment variable GOOGLE_APPLICATION_CREDENTIALS
     to point to the service account JSON key file.
 
+    The key file is parsed once per process. The returned credentials are shared, and
+    google-auth only fetches a new access token when the current one has expired.
+
     Args:
     subject_email: (Optional) User email to impersonate for domain-wide delegation.
     Returns:
     google.oauth2.service_account.Credentials object.
     """
-    service_account_file = GOOGLE_APPLICATION_CREDENTIALS
-    if not service_account_file:
-        raise EnvironmentError("Environment variable GOOGLE_APPLICATION_CREDENTIALS is not set")
+    with _credentials_lock:
+        if subject_email not in _credentials:
+            service_account_file = GOOGLE_APPLICATION_CREDENTIALS
+            if not service_account_file:
+                raise EnvironmentError("Environment variable GOOGLE_APPLICATION_CREDENTIALS is not set")
+
+            if None not in _credentials:
+                _credentials[None] = service_account.Credentials.from_service_account_file(
+                    service_account_file, scopes=SCOPES)
+
+            # If you need to access user data with Gmail, you must delegate domain-wide access.
+            if subject_email:
+                _credentials[subject_email] = _credentials[None].with_subject(subject_email)
+
+        return _credentials[subject_email]
+
+
+def get_service(api: str, version: str, subject_email: str = None):
+    """
+    Returns a cached API service object for the calling thread.
+
+    Services are built from the discovery documents bundled with google-api-python-client,
+    so no discovery request is made. The HTTP transport under a service object is not
+    thread-safe, so each thread gets its own.
 
-    creds = service_account.Credentials.from_service_account_file(
-        service_account_file, scopes=SCOPES)
+    Args:
+    api: The API name, e.g. "drive" or "sheets".
+    version: The API version, e.g. "v3".
+    subject_email: (Optional) User email to impersonate, see get_credentials.
+    """
+    services = getattr(_thread_services, "services", None)
+    if services is None:
+        services = _thread_services.services = {}
+    key = (api, version, subject_email)
+    if key not in services:
+        services[key] = build(api, version, credentials=get_credentials(subject_email),
+                              static_discovery=True, cache_discovery=False)
+    return services[key]
 
-    # If you need to access user data with Gmail, you must delegate domain-wide access.
-    if subject_email:
-        creds = creds.with_subject(subject_email)
+def get_authorized_session() -> AuthorizedSession:
+    """Returns an authorized requests session for the calling thread, for raw HTTP calls to Google APIs."""
+    session = getattr(_thread_services, "session", None)
+    if session is None:
+        session = _thread_services.session = AuthorizedSession(get_credentials())
+    return session
 
-    return creds
+def execute_request(request, limiter_name: str):
+    """Execute a Google API request once the API's shared rate limiter allows it."""
+    get_rate_limiter(limiter_name).acquire()
+    return request.execute()
 
 def download_drive_file(id: str, drive_link: str, local_folder_path: str):
     """
     Downloads a file from a Google Drive link to a local folder.
+
+    The file is saved as {id}{extension} so files of different applications, which often
+    share names like "pitch.mp4", never collide. Without an id the Drive name is kept.
     
     Args:
+    id: The application ID the file belongs to, or None.
     drive_link: The Google Drive link to the file (https://drive.google.com/file/d/FILE_ID/...).  
     local_folder_path: The local folder path where the file should be saved.
     
@@ -84,33 +146,24 @@ def download_drive_file(id: str, drive_link: str, local_folder_path: str):
     Dictionary containing the downloaded file's local path and filename.
     """
     if id is not None:
-        mp3_path = os.path.join(local_folder_path, f"{id}.mp3")
-        if os.path.exists(mp3_path) or os.path.exists(f"transcriptions/{id}.json"):
-            print(f"[Drive] MP3 file or its transcription for ID {id} already exists at {mp3_path}. Skipping download.")
+        # Imported here as audio_transcribe builds on this module
+        from utils.audio_transcribe import find_audio_file
+        audio_path = find_audio_file(local_folder_path, id)
+        if audio_path or os.path.exists(f"transcriptions/{id}.json"):
+            print(f"[Drive] Audio file or its transcription for ID {id} already exists. Skipping download.")
             return {
-                'local_path': mp3_path,
-                'filename': f"{id}.mp3",
-                'mime_type': 'audio/mp3',
+                'local_path': audio_path,
+                'filename': os.path.basename(audio_path) if audio_path else None,
+                'mime_type': mimetypes.guess_type(audio_path)[0] if audio_path else None,
                 'cached': True
         }
     
     
-    # For Drive we do not need to impersonate unless required
-    creds = get_credentials()
-    
     try:
-        # Extract file ID from the Drive link
-        file_id_match = re.search(r'(/d/|id=)([a-zA-Z0-9_-]+)', drive_link)
-        if not file_id_match:
-            raise ValueError(f"Could not extract file ID from Drive link: {drive_link}")
-            
-        file_id = file_id_match.group(2)
-        
-        # Build the Drive service
-        service = build("drive", "v3", credentials=creds)
+        file_id = drive_file_id_from_link(drive_link)
         
-        # Get file metadata to determine the filename
-        file_metadata = service.files().get(fileId=file_id, fields="name,mimeType").execute()
+        # Get file metadata to determine the filename, and the size and checksum to verify the download
+        file_metadata = get_drive_file_metadata(file_id)
         filename = file_metadata.get('name')
         mime_type = file_metadata.get('mimeType')
         
@@ -118,22 +171,15 @@ def download_drive_file(id: str, drive_link: str, local_folder_path: str):
         os.makedirs(local_folder_path, exist_ok=True)
         
         # Build the local file path
-        local_file_path = os.path.join(local_folder_path, filename)
-        
-        # Download the file
-        request = service.files().get_media(fileId=file_id)
-        file_handle = io.BytesIO()
-        downloader = MediaIoBaseDownload(file_handle, request)
-        
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            print(f"[Drive] Download progress: {int(status.progress() * 100)}%")
+        if id is not None:
+            extension = os.path.splitext(filename)[1] or mimetypes.guess_extension(mime_type or '') or ''
+            local_file_path = os.path.join(local_folder_path, f"{id}{extension.lower()}")
+        else:
+            local_file_path = os.path.join(local_folder_path, filename)
         
-        # Save the file to disk
-        file_handle.seek(0)
-        with open(local_file_path, 'wb') as f:
-            f.write(file_handle.read())
+        # Download the file straight to disk
+        stream_drive_file(file_id, local_file_path, size=file_metadata.get('size'),
+                          md5_checksum=file_metadata.get('md5Checksum'))
         
         print(f"[Drive] File downloaded to: {local_file_path}")
         
@@ -152,6 +198,242 @@ def download_drive_file(id: str, drive_link: str, local_folder_path: str):
         print(f"[Drive] An unexpected error occurred: {e}")
         return None
 
+def drive_file_id_from_link(drive_link: str) -> str:
+    """Extracts the file ID from a Google Drive link."""
+    file_id_match = re.search(r'(/d/|id=)([a-zA-Z0-9_-]+)', drive_link)
+    if not file_id_match:
+        raise ValueError(f"Could not extract file ID from Drive link: {drive_link}")
+    return file_id_match.group(2)
+
+def get_drive_file_metadata(file_id: str) -> dict:
+    """
+    Returns the name, mimeType, size (as an int, None if unknown) and md5Checksum of a Drive file.
+    Errors are raised.
+    """
+    # For Drive we do not need to impersonate unless required
+    metadata = execute_request(get_service("drive", "v3").files().get(
+        fileId=file_id, fields="name,mimeType,size,md5Checksum", supportsAllDrives=True), "drive")
+    metadata['size'] = int(metadata['size']) if metadata.get('size') else None
+    return metadata
+
+def iter_drive_file(file_id: str, offset: int = 0, size: int = None, chunk_size: int = DRIVE_DOWNLOAD_CHUNK_BYTES):
+    """
+    Yields the bytes of a Drive file from `offset` onwards, in blocks of at most STREAM_BLOCK_BYTES.
+
+    The file is requested in ranges of chunk_size bytes. A failed range (connection error,
+    5xx or 429) is requested again from the last byte yielded, up to DRIVE_DOWNLOAD_MAX_RETRIES
+    times in a row, so callers see one uninterrupted stream.
+
+    Args:
+    file_id: The Drive file ID.
+    offset: Byte to start at.
+    size: The file size in bytes from the file metadata, if known.
+    chunk_size: Bytes requested per ranged request.
+    """
+    url = DRIVE_MEDIA_URL.format(file_id=file_id)
+    session = get_authorized_session()
+    failures = 0
+    while size is None or offset < size:
+        end = offset + chunk_size - 1
+        if size is not None:
+            end = min(end, size - 1)
+        requested = end - offset + 1
+        received = 0
+        whole_file = False
+        get_rate_limiter("drive").acquire()
+        try:
+            with session.get(url, headers={"Range": f"bytes={offset}-{end}"}, stream=True, timeout=(10, 120)) as response:
+                if response.status_code == 416:
+                    # Nothing left past offset (the size was unknown)
+                    return
+                response.raise_for_status()
+                # If the range was ignored the whole file is sent, so skip what was already yielded
+                whole_file = response.status_code == 200
+                skip = offset if whole_file else 0
+                for block in response.iter_content(STREAM_BLOCK_BYTES):
+                    if skip:
+                        dropped = min(skip, len(block))
+                        block, skip = block[dropped:], skip - dropped
+                        if not block:
+                            continue
+                    offset += len(block)
+                    received += len(block)
+                    yield block
+        except requests.RequestException as e:
+            status = e.response.status_code if getattr(e, "response", None) is not None else None
+            if status is not None and status < 500 and status != 429:
+                raise
+            failures += 1
+            if failures > DRIVE_DOWNLOAD_MAX_RETRIES:
+                raise
+            print(f"[Drive] Chunk download failed at byte {offset} ({e}), retrying ({failures}/{DRIVE_DOWNLOAD_MAX_RETRIES})")
+            time.sleep(min(2 ** failures, 30))
+            continue
+
+        failures = 0
+        if size:
+            print(f"[Drive] Download progress: {int(offset * 100 / size)}%")
+        # A short range means the end of a file of unknown size
+        if whole_file or (size is None and received < requested):
+            return
+
+def stream_drive_file(file_id: str, local_file_path: str, size: int = None, md5_checksum: str = None,
+                      chunk_size: int = DRIVE_DOWNLOAD_CHUNK_BYTES) -> str:
+    """
+    Downloads a Drive file to disk in ranged chunks, resuming where an earlier attempt stopped.
+
+    Bytes are streamed into `local_file_path + ".part"` as they arrive, so memory use does
+    not depend on the file size. A .part file left by an interrupted run is continued
+    (see iter_drive_file for retries within a run). The finished file is checked against
+    md5_checksum (when given) and renamed into place atomically.
+
+    Args:
+    file_id: The Drive file ID.
+    local_file_path: Where the file should end up.
+    size: The file size in bytes from the file metadata, if known.
+    md5_checksum: The md5Checksum from the file metadata, if known.
+    chunk_size: Bytes requested per ranged request.
+
+    Returns:
+    The local file path.
+    """
+    part_path = f"{local_file_path}.part"
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if size is not None and offset > size:
+        offset = 0
+    if offset:
+        print(f"[Drive] Resuming download of {local_file_path} at byte {offset}")
+
+    with open(part_path, "ab" if offset else "wb") as f:
+        for block in iter_drive_file(file_id, offset=offset, size=size, chunk_size=chunk_size):
+            f.write(block)
+            offset += len(block)
+        f.flush()
+        os.fsync(f.fileno())
+
+    if size is not None and offset != size:
+        raise IOError(f"Downloaded {offset} bytes of {local_file_path}, expected {size}")
+    if md5_checksum:
+        digest = hashlib.md5()
+        with open(part_path, "rb") as f:
+            for block in iter(lambda: f.read(STREAM_BLOCK_BYTES), b""):
+                digest.update(block)
+        if digest.hexdigest() != md5_checksum:
+            os.remove(part_path)
+            raise IOError(f"Checksum mismatch for {local_file_path}, discarded the download")
+    os.replace(part_path, local_file_path)
+    return local_file_path
+
+# Long form questions whose short column headers in the sheet are ambiguous
+SHEET_COLUMN_RENAMES = {"How large do you think your solution's market is?": "How large do you think your solution's market is in Crores", "Large": "Large Competition", "Mid Size": "Mid Size Competition", "Small": "Small Competition", "Product": "How would you best describe the product status of your competition today?", "Technology": "How would you best describe the tech status of your competition today?", "India":"Within India what geography and demography is your customer in?", "US":"Within US what geography and demography is your customer in?","Urban": "In Urban what gender is your focus?", "Rural": "In Rural what gender is your focus?", "Engineering":"What is the level of R&D in Engineering required in your company?", "Product.1": "What is the level of Product R&D required in your company?", "Marketing":"How is your marketing likely to be", "Product/Service Delivery":"How is your product delivery likely to be" }
+
+def spreadsheet_id_from_link(sheets_link: str) -> str:
+    """Extracts the spreadsheet ID from a Google Sheets URL."""
+    # Method 1: Direct extraction from URL path
+    if 'spreadsheets/d/' in sheets_link:
+        parts = sheets_link.split('spreadsheets/d/')[1]
+    elif '/d/' in sheets_link:
+        parts = sheets_link.split('/d/')[1]
+    else:
+        raise ValueError(f"Could not extract spreadsheet ID from link: {sheets_link}")
+    return parts.split('/')[0].split('?')[0].split('#')[0]
+
+def resolve_sheet_title(service, spreadsheet_id: str, sheet_name: str = None) -> str:
+    """
+    Returns the title of the sheet to read, using a single metadata request.
+
+    If sheet_name is None or not found, the first sheet of the spreadsheet is used.
+    """
+    try:
+        metadata = execute_request(service.spreadsheets().get(
+            spreadsheetId=spreadsheet_id,
+            fields="properties.title,sheets.properties.title"
+        ), "sheets")
+    except HttpError as e:
+        print(f"Error accessing spreadsheet: {e}")
+        if '404' in str(e):
+            # Important: Make sure the Google Sheet is shared with the service account email
+            print("IMPORTANT: Make sure the spreadsheet exists and is shared with your service account email.")
+            creds = get_credentials()
+            print(f"Your service account might be: {creds.service_account_email if hasattr(creds, 'service_account_email') else 'Unknown'}")
+        raise
+    print(f"Successfully connected to sheet: {metadata.get('properties', {}).get('title')}")
+
+    titles = [sheet.get('properties', {}).get('title') for sheet in metadata.get('sheets', [])]
+    if sheet_name and sheet_name not in titles:
+        print(f"[Sheets] Sheet '{sheet_name}' not found. Available sheets: {titles}. Using first sheet instead.")
+        sheet_name = None
+    if not sheet_name:
+        sheet_name = titles[0] if titles else "Sheet1"
+    return sheet_name
+
+def sheet_range(sheet_title: str, range_name: str = None) -> str:
+    """A1 notation of a range within a sheet, or of the whole sheet if range_name is None."""
+    return f"'{sheet_title}'" + (f"!{range_name}" if range_name else "")
+
+def read_sheet_values(sheets_link: str, sheet_name: str = None, range_name: str = None):
+    """
+    Reads the raw cell values of a sheet. Unlike read_google_sheets, errors are raised.
+
+    Returns:
+    tuple: (rows as lists of values, title of the sheet that was read)
+    """
+    spreadsheet_id = spreadsheet_id_from_link(sheets_link)
+    print(f"Extracted spreadsheet ID: {spreadsheet_id}")
+
+    # For Sheets we may need to impersonate for proper authorization - using default credential
+    service = get_service("sheets", "v4")
+    sheet_title = resolve_sheet_title(service, spreadsheet_id, sheet_name)
+    range_to_read = sheet_range(sheet_title, range_name)
+    print(f"Reading range: {range_to_read}")
+
+    result = execute_request(service.spreadsheets().values().get(
+        spreadsheetId=spreadsheet_id,
+        range=range_to_read,
+        valueRenderOption="UNFORMATTED_VALUE"
+    ), "sheets")
+    return result.get('values', []), sheet_title
+
+def read_sheet_ranges(sheets_link: str, ranges: list) -> list:
+    """
+    Reads several ranges of a spreadsheet in one request. Errors are raised.
+
+    Returns:
+    list: The rows of each range, in the order of `ranges`
+    """
+    result = execute_request(get_service("sheets", "v4").spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id_from_link(sheets_link),
+        ranges=ranges,
+        valueRenderOption="UNFORMATTED_VALUE"
+    ), "sheets")
+    return [value_range.get('values', []) for value_range in result.get('valueRanges', [])]
+
+def get_sheet_modified_time(sheets_link: str) -> str:
+    """Returns the Drive modifiedTime of a spreadsheet, which changes on every edit. Errors are raised."""
+    metadata = execute_request(get_service("drive", "v3").files().get(
+        fileId=spreadsheet_id_from_link(sheets_link),
+        fields="modifiedTime",
+        supportsAllDrives=True
+    ), "drive")
+    return metadata.get('modifiedTime')
+
+def values_to_dataframe(values: list) -> pd.DataFrame:
+    """Converts the rows of a sheet, first row being the headers, to a DataFrame."""
+    if not values:
+        print("[Sheets] No data found in the specified sheet.")
+        return pd.DataFrame()
+
+    # Convert to DataFrame - assuming first row is headers
+    headers = values[0]
+
+    # Pad rows with None values if they're shorter than the header row (without changing `values`)
+    data = [row + [None] * (len(headers) - len(row)) for row in values[1:]]
+
+    # Create the DataFrame
+    df = pd.DataFrame(data, columns=headers)
+    df.rename(columns=SHEET_COLUMN_RENAMES, inplace=True)
+    return df
+
 def read_google_sheets(sheets_link: str, sheet_name: str = None, range_name: str = None):
     """
     Reads data from a Google Sheets document.
@@ -164,114 +446,10 @@ def read_google_sheets(sheets_link: str, sheet_name: str = None, range_name: str
     Returns:
     DataFrame containing the sheet data.
     """
-    # For Sheets we may need to impersonate for proper authorization - using default credential
-    # You might need to modify this if the sheets require specific user access
-    creds = get_credentials()
-    
     try:
-        # Method 1: Direct extraction from URL path
-        if 'spreadsheets/d/' in sheets_link:
-            parts = sheets_link.split('spreadsheets/d/')[1]
-            spreadsheet_id = parts.split('/')[0].split('?')[0].split('#')[0]
-        elif '/d/' in sheets_link:
-            parts = sheets_link.split('/d/')[1]
-            spreadsheet_id = parts.split('/')[0].split('?')[0].split('#')[0]
-        else:
-            raise ValueError(f"Could not extract spreadsheet ID from link: {sheets_link}")
-        
-        print(f"Extracted spreadsheet ID: {spreadsheet_id}")
-        
-        # Build the Sheets service
-        service = build("sheets", "v4", credentials=creds)
-        
-        # If sheet_name is provided, we need to find its gid
-        if sheet_name:
-            # Get all sheet metadata first
-            spreadsheet_metadata = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-            sheets = spreadsheet_metadata.get('sheets', [])
-            
-            # Find the sheet by name
-            sheet_found = False
-            for sheet in sheets:
-                properties = sheet.get('properties', {})
-                if properties.get('title') == sheet_name:
-                    sheet_found = True
-                    range_to_read = f"'{sheet_name}'" + (f"!{range_name}" if range_name else "")
-                    break
-                    
-            if not sheet_found:
-                print(f"[Sheets] Sheet '{sheet_name}' not found. Using first sheet instead.")
-                range_to_read = range_name if range_name else ""
-        else:
-            range_to_read = range_name if range_name else ""
-        
-        print("Building sheets service...")
-        service = build("sheets", "v4", credentials=creds)
-        print("Service built successfully")
-
-        # Important: Make sure the Google Sheet is shared with the service account email
-        # You can find this email in your service account JSON file or in the Google Cloud Console
-        print("Attempting to access spreadsheet...")
-
-        # For debugging
-        try:
-            info = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
-            print(f"Successfully connected to sheet: {info.get('properties', {}).get('title')}")
-        except HttpError as e:
-            print(f"Error accessing spreadsheet: {e}")
-            if '404' in str(e):
-                print("IMPORTANT: Make sure the spreadsheet exists and is shared with your service account email.")
-                print(f"Your service account might be: {creds.service_account_email if hasattr(creds, 'service_account_email') else 'Unknown'}")
-            raise
-
-        # Check if we need to target a specific sheet
-        if sheet_name:
-            sheets = service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute().get('sheets', [])
-            sheet_found = False
-            for sheet in sheets:
-                if sheet.get('properties', {}).get('title') == sheet_name:
-                    sheet_found = True
-                    range_to_read = f"'{sheet_name}'" + (f"!{range_name}" if range_name else "")
-                    break
-                    
-            if not sheet_found:
-                print(f"Sheet '{sheet_name}' not found. Available sheets: {[s.get('properties', {}).get('title') for s in sheets]}")
-                range_to_read = range_name if range_name else "Sheet1"
-        else:
-            # If no sheet name specified, use the first sheet or the range name if provided
-            range_to_read = range_name if range_name else "Sheet1"
-
-        print(f"Reading range: {range_to_read if range_to_read else 'default sheet'}")
-        
-        # Read the data from the sheet
-        result = service.spreadsheets().values().get(
-            spreadsheetId=spreadsheet_id,
-            range=range_to_read,
-            valueRenderOption="UNFORMATTED_VALUE"
-        ).execute()
-        
-        # Extract the values
-        values = result.get('values', [])
-        
-        if not values:
-            print("[Sheets] No data found in the specified sheet.")
-            return pd.DataFrame()
-            
-        # Convert to DataFrame - assuming first row is headers
-        headers = values[0]
-        data = values[1:] if len(values) > 1 else []
-        
-        # Pad rows with None values if they're shorter than the header row
-        for row in data:
-            while len(row) < len(headers):
-                row.append(None)
-                
-        # Create the DataFrame
-        df = pd.DataFrame(data, columns=headers)
-        df.rename(columns={"How large do you think your solution's market is?": "How large do you think your solution's market is in Crores", "Large": "Large Competition", "Mid Size": "Mid Size Competition", "Small": "Small Competition", "Product": "How would you best describe the product status of your competition today?", "Technology": "How would you best describe the tech status of your competition today?", "India":"Within India what geography and demography is your customer in?", "US":"Within US what geography and demography is your customer in?","Urban": "In Urban what gender is your focus?", "Rural": "In Rural what gender is your focus?", "Engineering":"What is the level of R&D in Engineering required in your company?", "Product.1": "What is the level of Product R&D required in your company?", "Marketing":"How is your marketing likely to be", "Product/Service Delivery":"How is your product delivery likely to be" }, inplace=True)
+        values, _ = read_sheet_values(sheets_link, sheet_name, range_name)
+        df = values_to_dataframe(values)
         print(f"[Sheets] Successfully read {len(df)} rows from the Google Sheet")
-        
-        
         return df
         
     except HttpError as error:
@@ -280,6 +458,3 @@ def read_google_sheets(sheets_link: str, sheet_name: str = None, range_name: str
     except Exception as e:
         print(f"[Sheets] An unexpected error occurred: {e}")
         return pd.DataFrame()
-    
-
-    
\ No newline at end of file
@@ -0,0 +1,294 @@
+"""
+Persistent local mirror of files in a Hugging Face Dataset repository.
+
+Files read through the mirror are kept on disk across lookups and process restarts.
+A local copy is served as long as it is known to match the hub:
+  - in bulk, when the repo revision has not changed since the copy was validated, or
+    after one listing of the mirrored tree confirms its blob ETag, and otherwise
+  - per file, with a metadata (HEAD) request comparing its ETag.
+Only files whose ETag changed are downloaded again. The mirror has a size cap and
+evicts the least recently read files when it is exceeded.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from huggingface_hub import get_hf_file_metadata, hf_hub_download, hf_hub_url
+from huggingface_hub.utils import EntryNotFoundError
+
+from utils.hf_utils import api, HF_TOKEN, REPO_TYPE, DATASET_REPO_ID
+
+logger = logging.getLogger(__name__)
+
+# --- Constants --- #
+MIRROR_DIR = os.getenv("HF_MIRROR_DIR", ".hf_mirror")
+MIRROR_MAX_BYTES = int(os.getenv("HF_MIRROR_MAX_BYTES", str(256 * 1024 * 1024)))
+# Minimum seconds between checks of the repo revision
+MIRROR_REVISION_CHECK_SECONDS = float(os.getenv("HF_MIRROR_REVISION_CHECK_SECONDS", "30"))
+
+INDEX_FILE_NAME = "mirror_index.json"
+
+
+def git_blob_etag(content: bytes) -> str:
+    """The ETag the hub reports for a regular (non-LFS) file: its git blob id."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class HfDatasetMirror:
+    """
+    On-disk mirror of one tree of a Hugging Face Dataset repository.
+
+    Args:
+        repo_id: The dataset repository
+        prefix: Path in the repository of the mirrored tree, e.g. "responses"
+        root: Local directory holding the mirror
+        max_bytes: Size cap of the mirrored files
+    """
+
+    def __init__(self, repo_id: str = DATASET_REPO_ID, prefix: str = "", root: str = None,
+                 max_bytes: int = MIRROR_MAX_BYTES):
+        self.repo_id = repo_id
+        self.prefix = prefix.strip("/")
+        self.root = root or os.path.join(MIRROR_DIR, repo_id.replace("/", "--"))
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        # Held by the thread checking the repo revision
+        self._check_lock = threading.Lock()
+        self._index_path = os.path.join(self.root, INDEX_FILE_NAME)
+        # path_in_repo -> {"etag", "size", "last_access", "validated_revision"}
+        self._entries = {}
+        self._revision = None
+        self._revision_checked_at = 0.0
+        self.hits = 0
+        self.revalidated = 0
+        self.downloads = 0
+        self.evictions = 0
+        self._load_index()
+
+    # --- Index persistence --- #
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, "r") as f:
+                data = json.load(f)
+            self._entries = data.get("entries", {})
+            self._revision = data.get("revision")
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"Ignoring unreadable mirror index {self._index_path}: {e}")
+            self._entries = {}
+        # Drop entries whose file did not survive
+        for path in [path for path in self._entries if not os.path.exists(self.local_path(path))]:
+            del self._entries[path]
+
+    def _save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = f"{self._index_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"revision": self._revision, "entries": self._entries}, f)
+        os.replace(temp_path, self._index_path)
+
+    def local_path(self, path_in_repo: str) -> str:
+        return os.path.join(self.root, path_in_repo)
+
+    # --- Revalidation --- #
+
+    def _current_revision(self):
+        """
+        The repo's latest commit, checked at most every MIRROR_REVISION_CHECK_SECONDS.
+
+        The revision and tree listing are fetched without holding self._lock, so readers
+        and writers are not held up by them; only one thread checks at a time.
+        """
+        with self._lock:
+            if self._revision is not None and time.monotonic() - self._revision_checked_at < MIRROR_REVISION_CHECK_SECONDS:
+                return self._revision
+            known_revision = self._revision
+        # Once a revision is known, readers use it while another thread checks for a newer one
+        if not self._check_lock.acquire(blocking=known_revision is None):
+            return known_revision
+        try:
+            with self._lock:
+                if self._revision is not None and time.monotonic() - self._revision_checked_at < MIRROR_REVISION_CHECK_SECONDS:
+                    return self._revision
+                known_revision = self._revision
+            try:
+                revision = api.repo_info(self.repo_id, repo_type=REPO_TYPE, token=HF_TOKEN).sha
+            except Exception as e:
+                logger.warning(f"Could not read revision of {self.repo_id}, serving mirrored files unvalidated: {e}")
+                return None
+            checked_at = time.monotonic()
+            if revision != known_revision:
+                self._revalidate_tree(revision)
+            with self._lock:
+                self._revision_checked_at = checked_at
+            return revision
+        finally:
+            self._check_lock.release()
+
+    def _revalidate_tree(self, revision: str):
+        """Revalidate every mirrored file against one listing of the tree at `revision`."""
+        with self._lock:
+            etags = {path: entry["etag"] for path, entry in self._entries.items()}
+        try:
+            tree = {
+                item.path: (item.lfs.sha256 if getattr(item, "lfs", None) else item.blob_id)
+                for item in api.list_repo_tree(self.repo_id, path_in_repo=self.prefix or None, recursive=True,
+                                               revision=revision, repo_type=REPO_TYPE, token=HF_TOKEN)
+                if hasattr(item, "blob_id")
+            }
+        except Exception as e:
+            logger.warning(f"Could not list {self.repo_id}/{self.prefix}, falling back to per-file revalidation: {e}")
+            with self._lock:
+                self._revision = revision
+            return
+
+        with self._lock:
+            stale = 0
+            for path, entry in list(self._entries.items()):
+                etag = tree.get(path)
+                if etags.get(path) != entry["etag"] or (etag is None and entry.get("validated_revision") is None):
+                    # Uploaded since the revision was read; validated with a later one
+                    continue
+                if etag is None and path.startswith(self.prefix):
+                    # Deleted from the hub
+                    self._remove(path)
+                    stale += 1
+                elif etag == entry["etag"]:
+                    entry["validated_revision"] = revision
+                else:
+                    stale += 1
+            self._revision = revision
+            self._save_index()
+            current = len(self._entries) - stale
+        logger.info(f"Revalidated mirror of {self.repo_id} at revision {revision[:12]}: "
+                    f"{current} current, {stale} stale")
+
+    # --- Reads and writes --- #
+
+    def get(self, path_in_repo: str):
+        """
+        Returns the local path of an up-to-date copy of a file, downloading it if needed.
+
+        Returns:
+            str: Local file path, or None if the file does not exist on the hub.
+        """
+        local_path = self.local_path(path_in_repo)
+        revision = self._current_revision()
+        with self._lock:
+            entry = self._entries.get(path_in_repo)
+            have_copy = entry is not None and os.path.exists(local_path)
+            if have_copy and (revision is None or entry.get("validated_revision") == revision):
+                self.hits += 1
+                return self._touch(path_in_repo)
+
+        # Network requests run outside the lock so concurrent readers don't queue behind each other
+        try:
+            metadata = get_hf_file_metadata(
+                hf_hub_url(self.repo_id, path_in_repo, repo_type=REPO_TYPE, revision=revision),
+                token=HF_TOKEN
+            )
+        except EntryNotFoundError:
+            with self._lock:
+                if path_in_repo in self._entries:
+                    self._remove(path_in_repo)
+                    self._save_index()
+            return None
+        except Exception as e:
+            if not have_copy:
+                raise
+            logger.warning(f"Serving unvalidated mirror copy of {path_in_repo}: {e}")
+            with self._lock:
+                self.hits += 1
+                return self._touch(path_in_repo)
+
+        if have_copy and entry["etag"] == metadata.etag:
+            with self._lock:
+                self.revalidated += 1
+                entry["validated_revision"] = revision
+                self._touch(path_in_repo)
+                self._save_index()
+            return local_path
+
+        downloaded_path = hf_hub_download(
+            repo_id=self.repo_id,
+            filename=path_in_repo,
+            repo_type=REPO_TYPE,
+            revision=metadata.commit_hash or revision,
+            local_dir=self.root,
+            token=HF_TOKEN
+        )
+        with self._lock:
+            if os.path.abspath(downloaded_path) != os.path.abspath(local_path):
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                shutil.move(downloaded_path, local_path)
+            self.downloads += 1
+            self._entries[path_in_repo] = {
+                "etag": metadata.etag,
+                "size": os.path.getsize(local_path),
+                "validated_revision": revision,
+            }
+            self._touch(path_in_repo)
+            self._evict()
+            self._save_index()
+        return local_path
+
+    def put(self, path_in_repo: str, content: bytes):
+        """Mirror a file that was just uploaded, so reading it back does not download it."""
+        with self._lock:
+            local_path = self.local_path(path_in_repo)
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            temp_path = f"{local_path}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(content)
+            os.replace(temp_path, local_path)
+            # Validated against the next revision listing, which will include this upload
+            self._entries[path_in_repo] = {
+                "etag": git_blob_etag(content),
+                "size": len(content),
+                "validated_revision": None,
+            }
+            self._touch(path_in_repo)
+            self._evict()
+            self._save_index()
+
+    def _touch(self, path_in_repo: str) -> str:
+        # Access times are persisted with the next structural change to the index
+        self._entries[path_in_repo]["last_access"] = time.time()
+        return self.local_path(path_in_repo)
+
+    def _remove(self, path_in_repo: str):
+        self._entries.pop(path_in_repo, None)
+        try:
+            os.remove(self.local_path(path_in_repo))
+        except OSError:
+            pass
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for path, entry in sorted(self._entries.items(), key=lambda item: item[1].get("last_access", 0)):
+            if total <= self.max_bytes:
+                break
+            total -= entry["size"]
+            self._remove(path)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "bytes": sum(entry["size"] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "revision": self._revision,
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "downloads": self.downloads,
+                "evictions": self.evictions,
+            }
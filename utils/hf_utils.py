@@ -2,10 +2,18 @@
 Utility functions for interacting with Hugging Face Datasets.
 """
 import os
+import json
+import time
+import base64
+import atexit
+import hashlib
 import logging
-from huggingface_hub import HfApi, hf_hub_download, upload_file
+import threading
+from huggingface_hub import HfApi, CommitOperationAdd, hf_hub_download, upload_file
 from dotenv import load_dotenv, find_dotenv
 
+from utils.rate_limit import get_rate_limiter
+
 load_dotenv(find_dotenv())
 
 # Configure logging
@@ -23,6 +31,12 @@ REPO_TYPE = "dataset"
 HF_TOKEN = os.getenv("HF_TOKEN")
 api = HfApi(token=HF_TOKEN)
 
+# --- Commit buffer settings --- #
+COMMIT_BUFFER_MAX_FILES = int(os.getenv("HF_COMMIT_BUFFER_MAX_FILES", "50"))
+COMMIT_BUFFER_MAX_BYTES = int(os.getenv("HF_COMMIT_BUFFER_MAX_BYTES", str(8 * 1024 * 1024)))
+COMMIT_BUFFER_FLUSH_INTERVAL_SECONDS = float(os.getenv("HF_COMMIT_BUFFER_FLUSH_INTERVAL_SECONDS", "300"))
+COMMIT_JOURNAL_DIR = os.getenv("HF_COMMIT_JOURNAL_DIR", "hf_journal")
+
 
 def upload_file_to_hf_dataset(local_file_path: str, path_in_repo: str, repo_id: str = DATASET_REPO_ID):
     """
@@ -43,6 +57,7 @@ def upload_file_to_hf_dataset(local_file_path: str, path_in_repo: str, repo_id:
 
     try:
         logger.info(f"Uploading {local_file_path} to {repo_id}/{path_in_repo}...")
+        get_rate_limiter("hf_commits", repo_id).acquire()
         response = upload_file(
             path_or_fileobj=local_file_path,
             path_in_repo=path_in_repo,
@@ -105,6 +120,208 @@ def download_file_from_hf_dataset(path_in_repo: str, local_destination_path: str
         return None
 
 
+class HfCommitBuffer:
+    """
+    Collects files to upload and commits them to the hub together.
+
+    Each call to upload_file creates its own hub commit. The buffer instead groups pending
+    files per repository into a single multi-operation commit, flushed when the number or
+    size of pending files reaches its limits, when the oldest pending file is older than
+    the flush interval, or explicitly (e.g. at the end of a scheduler run).
+
+    Every pending file is first written to a local journal directory, and removed from it
+    only once its commit succeeded, so unflushed files survive a crash or restart and are
+    picked up again by the next buffer using the same journal.
+    """
+
+    def __init__(self, journal_dir: str = COMMIT_JOURNAL_DIR, max_files: int = COMMIT_BUFFER_MAX_FILES,
+                 max_bytes: int = COMMIT_BUFFER_MAX_BYTES, flush_interval: float = COMMIT_BUFFER_FLUSH_INTERVAL_SECONDS):
+        self.journal_dir = journal_dir
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        # (repo_id, path_in_repo) -> {"content": bytes, "seq": int, "added_at": float}
+        self._pending = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+        self.commits = 0
+        self.files_committed = 0
+        self._recover()
+
+    # --- Journal --- #
+
+    def _journal_path(self, repo_id: str, path_in_repo: str) -> str:
+        key = hashlib.sha1(f"{repo_id}\0{path_in_repo}".encode()).hexdigest()
+        return os.path.join(self.journal_dir, f"{key}.json")
+
+    def _write_journal(self, repo_id: str, path_in_repo: str, content: bytes, seq: int):
+        os.makedirs(self.journal_dir, exist_ok=True)
+        journal_path = self._journal_path(repo_id, path_in_repo)
+        temp_path = f"{journal_path}.{seq}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({
+                "repo_id": repo_id,
+                "path_in_repo": path_in_repo,
+                "seq": seq,
+                "content": base64.b64encode(content).decode("ascii"),
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, journal_path)
+
+    def _recover(self):
+        if not os.path.isdir(self.journal_dir):
+            return
+        for name in sorted(os.listdir(self.journal_dir)):
+            journal_path = os.path.join(self.journal_dir, name)
+            if name.endswith(".tmp"):
+                # Interrupted before it was complete; the previous journal entry (if any) is still intact
+                os.remove(journal_path)
+                continue
+            try:
+                with open(journal_path, "r") as f:
+                    entry = json.load(f)
+                key = (entry["repo_id"], entry["path_in_repo"])
+                self._seq = max(self._seq, entry["seq"])
+                self._pending[key] = {
+                    "content": base64.b64decode(entry["content"]),
+                    "seq": entry["seq"],
+                    "added_at": time.time(),
+                }
+            except Exception as e:
+                logger.error(f"Skipping unreadable commit journal entry {journal_path}: {e}")
+        if self._pending:
+            logger.info(f"Recovered {len(self._pending)} unflushed file(s) from commit journal {self.journal_dir}")
+
+    # --- Buffering --- #
+
+    def add(self, path_in_repo: str, content, repo_id: str = DATASET_REPO_ID):
+        """
+        Queue a file for the next commit. A file added again before it is flushed replaces the earlier content.
+
+        Args:
+            path_in_repo: The path (including filename) in the repository
+            content: File content as bytes or str
+            repo_id: The Hugging Face repository ID
+        """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            self._write_journal(repo_id, path_in_repo, content, seq)
+            self._pending[(repo_id, path_in_repo)] = {"content": content, "seq": seq, "added_at": time.time()}
+            over_limit = (len(self._pending) >= self.max_files or
+                          sum(len(entry["content"]) for entry in self._pending.values()) >= self.max_bytes)
+        self._ensure_flusher()
+        if over_limit:
+            self.flush(reason="size")
+
+    def pending_content(self, path_in_repo: str, repo_id: str = DATASET_REPO_ID):
+        """Content of a file waiting to be committed, or None."""
+        with self._lock:
+            entry = self._pending.get((repo_id, path_in_repo))
+            return entry["content"] if entry else None
+
+    def pending_paths(self, repo_id: str = DATASET_REPO_ID) -> list:
+        """Paths in a repository waiting to be committed."""
+        with self._lock:
+            return [path for pending_repo_id, path in self._pending if pending_repo_id == repo_id]
+
+    def flush(self, reason: str = "explicit", commit_message: str = None) -> bool:
+        """
+        Commit every pending file, with one commit per repository.
+
+        Returns:
+            bool: True if nothing failed. Files of a failed commit stay pending and journaled.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = {key: dict(entry) for key, entry in self._pending.items()}
+            if not batch:
+                return True
+
+            by_repo = {}
+            for (repo_id, path_in_repo), entry in batch.items():
+                by_repo.setdefault(repo_id, []).append((path_in_repo, entry))
+
+            ok = True
+            for repo_id, files in by_repo.items():
+                operations = [
+                    CommitOperationAdd(path_in_repo=path_in_repo, path_or_fileobj=entry["content"])
+                    for path_in_repo, entry in files
+                ]
+                try:
+                    logger.info(f"Committing {len(operations)} file(s) to {repo_id} ({reason} flush)...")
+                    get_rate_limiter("hf_commits", repo_id).acquire()
+                    api.create_commit(
+                        repo_id=repo_id,
+                        repo_type=REPO_TYPE,
+                        operations=operations,
+                        commit_message=commit_message or f"Upload {len(operations)} file(s)",
+                        token=HF_TOKEN
+                    )
+                except Exception as e:
+                    ok = False
+                    logger.error(f"Failed to commit {len(operations)} file(s) to {repo_id}, keeping them journaled: {e}")
+                    continue
+
+                self.commits += 1
+                self.files_committed += len(operations)
+                with self._lock:
+                    for path_in_repo, entry in files:
+                        key = (repo_id, path_in_repo)
+                        # Keep files that were added again while this commit was in flight
+                        if key in self._pending and self._pending[key]["seq"] == entry["seq"]:
+                            del self._pending[key]
+                            try:
+                                os.remove(self._journal_path(repo_id, path_in_repo))
+                            except OSError:
+                                pass
+                logger.info(f"Committed {len(operations)} file(s) to {repo_id}")
+            return ok
+
+    # --- Interval flushing --- #
+
+    def _ensure_flusher(self):
+        if self._flusher is not None or self.flush_interval <= 0:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, name="hf-commit-flusher", daemon=True)
+                self._flusher.start()
+
+    def _flush_periodically(self):
+        check_every = min(self.flush_interval, 10)
+        while not self._stop.wait(check_every):
+            with self._lock:
+                oldest = min((entry["added_at"] for entry in self._pending.values()), default=None)
+            if oldest is not None and time.time() - oldest >= self.flush_interval:
+                self.flush(reason="interval")
+
+    def close(self):
+        """Stop the interval flusher and flush what is pending."""
+        self._stop.set()
+        self.flush(reason="shutdown")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending_files": len(self._pending),
+                "pending_bytes": sum(len(entry["content"]) for entry in self._pending.values()),
+                "commits": self.commits,
+                "files_committed": self.files_committed,
+            }
+
+
+# Shared buffer for response and tracking uploads; flushed on interpreter exit as a last resort
+commit_buffer = HfCommitBuffer()
+atexit.register(commit_buffer.close)
+
+
 if __name__ == '__main__':
     # Example Usage (requires a valid DATASET_REPO_ID and a dummy file):
     logger.info("Testing Hugging Face Utils...")
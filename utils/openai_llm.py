@@ -1,21 +1,171 @@
 import os
-from openai import OpenAI
+import atexit
+import threading
+import httpx
+from openai import OpenAI, RateLimitError
 from dotenv import load_dotenv, find_dotenv
 
+from utils.rate_limit import get_rate_limiter
+
 
 load_dotenv(find_dotenv())
 
+# Timeouts (seconds) and retries per kind of request: scoring calls should fail fast,
+# audio uploads of a whole pitch need much longer
+OPENAI_OPERATION_POLICIES = {
+    "chat": {
+        "timeout": float(os.getenv("OPENAI_CHAT_TIMEOUT_SECONDS", "90")),
+        "connect_timeout": 5.0,
+        "max_retries": int(os.getenv("OPENAI_CHAT_MAX_RETRIES", "2")),
+    },
+    "audio": {
+        "timeout": float(os.getenv("OPENAI_AUDIO_TIMEOUT_SECONDS", "600")),
+        "connect_timeout": 10.0,
+        "max_retries": int(os.getenv("OPENAI_AUDIO_MAX_RETRIES", "1")),
+    },
+}
+# Connection pool shared by every OpenAI client in the process
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = 60.0
+# Completion tokens reserved from the token budget before a response's actual usage is known
+COMPLETION_TOKEN_ESTIMATE = int(os.getenv("OPENAI_COMPLETION_TOKEN_ESTIMATE", "2000"))
+# Seconds the OpenAI limiters pause after a 429 without a Retry-After header
+RATE_LIMIT_BACKOFF_SECONDS = 10.0
+
+
+class ConnectionStats:
+    """Counts requests and newly opened connections on the shared HTTP pool."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self._lock = threading.Lock()
+
+    def on_request(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+        # httpcore reports connection setup through the trace extension
+        request.extensions["trace"] = self._trace
+
+    def _trace(self, event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            with self._lock:
+                self.tls_handshakes += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            reused = self.requests - self.connections_opened
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes,
+                "reused_requests": max(0, reused),
+                "reuse_rate": round(max(0, reused) / self.requests, 3) if self.requests else None,
+            }
+
+
+connection_stats = ConnectionStats()
+_http_client = None
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """The process-wide keep-alive connection pool used by all OpenAI clients."""
+    global _http_client
+    with _clients_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+                ),
+                event_hooks={"request": [connection_stats.on_request]},
+            )
+        return _http_client
+
+
+def get_openai_client(operation: str = "chat") -> OpenAI:
+    """
+    A shared, thread-safe OpenAI client for a kind of request.
+
+    Clients are cached per operation (and API key and base URL, so OPENAI_BASE_URL
+    changes are honored) and all share one HTTP connection pool.
+
+    Args:
+        operation: A key of OPENAI_OPERATION_POLICIES, "chat" or "audio"
+    """
+    policy = OPENAI_OPERATION_POLICIES[operation]
+    api_key = os.getenv("OPENAI_API_KEY")
+    base_url = os.getenv("OPENAI_BASE_URL")
+    key = (operation, api_key, base_url)
+    http_client = get_http_client()
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=httpx.Timeout(policy["timeout"], connect=policy["connect_timeout"]),
+                max_retries=policy["max_retries"],
+                http_client=http_client,
+            )
+        return _clients[key]
+
+
+def openai_connection_stats() -> dict:
+    """Requests sent through the shared pool and how many of them reused a connection."""
+    return connection_stats.as_dict()
+
+
+def _close_http_client():
+    if _http_client is not None:
+        _http_client.close()
+
+
+atexit.register(_close_http_client)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+def rate_limit_backoff(error: RateLimitError):
+    """Pause the OpenAI limiters for as long as a 429 response asks."""
+    try:
+        seconds = float(error.response.headers.get("retry-after", RATE_LIMIT_BACKOFF_SECONDS))
+    except (AttributeError, TypeError, ValueError):
+        seconds = RATE_LIMIT_BACKOFF_SECONDS
+    get_rate_limiter("openai_requests").backoff(seconds)
+    get_rate_limiter("openai_tokens").backoff(seconds)
+
+
 def get_response_from_openai(system_prompt: str, user_prompt: str, model_name: str = "gpt-4.1-mini") -> str:
 
-    open_ai_api_key = os.getenv("OPENAI_API_KEY")
-    client = OpenAI(api_key=open_ai_api_key)
-    response = client.chat.completions.create(
-        model=model_name,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        response_format={"type": "json_object"},
-        temperature=0,
-    )
-    return response.choices[0].message.content
\ No newline at end of file
+    reserved_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + COMPLETION_TOKEN_ESTIMATE
+    get_rate_limiter("openai_requests").acquire()
+    get_rate_limiter("openai_tokens").acquire(reserved_tokens)
+
+    client = get_openai_client("chat")
+    try:
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            response_format={"type": "json_object"},
+            temperature=0,
+        )
+    except RateLimitError as e:
+        rate_limit_backoff(e)
+        raise
+    # Settle the reservation against the tokens actually used
+    if response.usage is not None:
+        get_rate_limiter("openai_tokens").adjust(response.usage.total_tokens - reserved_tokens)
+    return response.choices[0].message.content
@@ -0,0 +1,154 @@
+"""
+Shared token-bucket rate limiters for the external APIs the pipeline calls.
+
+Every worker thread draws from the same bucket per API, so a concurrent batch runs
+each API at its budget without exceeding it. Buckets refill continuously at their
+per-minute rate and hold up to BURST_SECONDS of budget. Time spent waiting for a bucket
+is counted per limiter; rate_limit_stats() shows which API is the bottleneck.
+
+Budgets come from environment variables. A budget of 0 turns its limiter off.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- Constants --- #
+# Limiter name -> budget per minute
+RATE_LIMITS = {
+    "openai_requests": float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500")),
+    # Must match the tokens-per-minute limit of the account's usage tier; 200k is only a default
+    "openai_tokens": float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000")),
+    "drive": float(os.getenv("DRIVE_REQUESTS_PER_MINUTE", "600")),
+    "sheets": float(os.getenv("SHEETS_REQUESTS_PER_MINUTE", "60")),
+    # Per repository
+    "hf_commits": float(os.getenv("HF_COMMITS_PER_MINUTE", "2")),
+}
+# Seconds of budget a bucket can save up for a burst
+BURST_SECONDS = float(os.getenv("RATE_LIMIT_BURST_SECONDS", "10"))
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket.
+
+    Args:
+        name: Name used in logs and statistics
+        rate_per_minute: Tokens added per minute. 0 or less disables the limiter.
+        capacity: Most tokens the bucket holds. Defaults to BURST_SECONDS of refill (at least 1).
+    """
+
+    def __init__(self, name: str, rate_per_minute: float, capacity: float = None):
+        self.name = name
+        self.rate_per_minute = rate_per_minute
+        self._rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self._rate * BURST_SECONDS)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.acquired = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.backoffs = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._rate > 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Take `amount` tokens, blocking until they are available.
+
+        A request larger than the bucket waits for a full bucket and leaves it in debt,
+        which later requests wait out.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        if self.enabled:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self._refill(now)
+                    needed = min(amount, self.capacity)
+                    if now >= self._blocked_until and self._tokens >= needed:
+                        self._tokens -= amount
+                        break
+                    delay = max(self._blocked_until - now, (needed - self._tokens) / self._rate)
+                time.sleep(delay)
+                waited += delay
+
+        with self._lock:
+            self.acquisitions += 1
+            self.acquired += amount
+            if waited > 0:
+                self.waits += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return waited
+
+    def adjust(self, amount: float):
+        """Take (or, if negative, give back) tokens without waiting, e.g. once actual usage is known."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self.capacity, self._tokens - amount)
+            self.acquired += amount
+
+    def backoff(self, seconds: float):
+        """Pause the limiter after the API rejected a request for exceeding its rate limit."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = min(self._tokens, 0.0)
+            self.backoffs += 1
+        logger.warning(f"Rate limiter {self.name} backing off for {seconds:.1f}s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rate_per_minute": self.rate_per_minute,
+                "acquisitions": self.acquisitions,
+                "acquired": round(self.acquired, 1),
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 2),
+                "max_wait_seconds": round(self.max_wait_seconds, 2),
+                "backoffs": self.backoffs,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str, key: str = None) -> TokenBucket:
+    """
+    The shared limiter for an API, see RATE_LIMITS.
+
+    Args:
+        name: The limiter, e.g. "openai_requests"
+        key: For budgets that apply per resource, e.g. HF commits per repository, the resource.
+            Each key gets its own bucket with the limiter's budget.
+    """
+    limiter_name = f"{name}:{key}" if key else name
+    with _limiters_lock:
+        if limiter_name not in _limiters:
+            _limiters[limiter_name] = TokenBucket(limiter_name, RATE_LIMITS[name])
+        return _limiters[limiter_name]
+
+
+def rate_limit_stats() -> dict:
+    """Usage and wait-time statistics of every limiter used so far, by limiter name."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
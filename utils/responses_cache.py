@@ -1,14 +1,31 @@
-from utils.audio_transcribe import ensure_cache_folders
 import os
 import json
+import copy
+import time
 import logging
-from utils.hf_utils import upload_file_to_hf_dataset, download_file_from_hf_dataset, DATASET_REPO_ID
+import threading
+from collections import OrderedDict
+from utils.hf_utils import download_file_from_hf_dataset, commit_buffer, api, DATASET_REPO_ID, REPO_TYPE, HF_TOKEN
+from utils.hf_mirror import HfDatasetMirror
+from utils.application_store import normalize_application_id
+from utils.results_store import results_writer
+import re
 
 TRACKING_DATA_REPO_ID = "tech-ajvc/last_processed_data"
 TRACKING_FILE_PATH_IN_REPO = "last_processed_id.json"
 LOCAL_TEMP_TRACKING_DIR = "tracking" # Local directory for temporary tracking files
 RESPONSES_DIR = "responses" # Local temporary directory
 
+# In-process LRU in front of the Hugging Face responses dataset
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+# Responses not found on HF are remembered for a shorter time, so reruns don't retry them every time
+RESPONSE_CACHE_MISS_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_MISS_TTL_SECONDS", "60"))
+# Seconds a listing of the responses tree is trusted to answer "is there a response?" without a request
+RESPONSE_INDEX_TTL_SECONDS = float(os.getenv("RESPONSE_INDEX_TTL_SECONDS", "300"))
+RESPONSE_TYPES = ("behavior", "skill")
+RESPONSE_PATH_PATTERN = re.compile(r"^responses/(?P<id>[^/]+?)_responses_(?P<type>[^/_]+)\.json$")
+
 # Ensure the local temporary directory for responses exists
 os.makedirs(RESPONSES_DIR, exist_ok=True)
 
@@ -16,68 +33,246 @@ os.makedirs(RESPONSES_DIR, exist_ok=True)
 os.makedirs(LOCAL_TEMP_TRACKING_DIR, exist_ok=True)
 
 
+class ResponseLRUCache:
+    """
+    Thread-safe in-memory LRU cache of response JSON with a size bound and TTL.
+
+    Values are copied in and out so callers can't mutate cached entries. A value of
+    None records that the response does not exist on HF.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+                 miss_ttl: float = RESPONSE_CACHE_MISS_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Returns (found, value). found is False if the key is absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, copy.deepcopy(entry[1])
+
+    def put(self, key, value):
+        ttl = self.ttl if value is not None else self.miss_ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Drops one key, or every entry if key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                # Every hit is a Hugging Face download that did not happen
+                "round_trips_saved": self.hits,
+            }
+
+
+response_cache = ResponseLRUCache()
+
+# Durable on-disk copy of the responses tree, revalidated against the hub instead of re-downloaded
+responses_mirror = HfDatasetMirror(DATASET_REPO_ID, prefix="responses")
+
+
+class ResponseIndex:
+    """
+    Which (application ID, response type) pairs have a stored response, from one listing of the repo.
+
+    IDs are normalized with normalize_application_id, so 688 and "688" are the same application.
+    """
+
+    def __init__(self, entries=(), revision: str = None):
+        self._entries = {(normalize_application_id(id), type) for id, type in entries}
+        self._lock = threading.Lock()
+        self.revision = revision
+        self.loaded_at = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.loaded_at
+
+    def add(self, id, type: str):
+        with self._lock:
+            self._entries.add((normalize_application_id(id), type))
+
+    def has(self, id, type: str) -> bool:
+        with self._lock:
+            return (normalize_application_id(id), type) in self._entries
+
+    def ids_with(self, type: str) -> set:
+        """Application IDs with a stored response of the given type."""
+        with self._lock:
+            return {id for id, entry_type in self._entries if entry_type == type}
+
+    def complete_ids(self, types=RESPONSE_TYPES) -> set:
+        """Application IDs with a stored response of every given type."""
+        ids = None
+        for type in types:
+            ids = self.ids_with(type) if ids is None else ids & self.ids_with(type)
+        return ids or set()
+
+    def missing_types(self, id, types=RESPONSE_TYPES) -> list:
+        """Response types not yet stored for an application."""
+        return [type for type in types if not self.has(id, type)]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# The most recently loaded index; kept current with responses stored by this process
+_response_index = None
+_response_index_lock = threading.Lock()
+
+
+def get_response_index(max_age: float = RESPONSE_INDEX_TTL_SECONDS, force_refresh: bool = False) -> ResponseIndex:
+    """
+    Returns an index of stored responses, listing the responses tree of the repo in a single request
+    when the current index is older than max_age.
+
+    Responses queued in the commit buffer but not yet committed are included.
+    """
+    global _response_index
+    with _response_index_lock:
+        if _response_index is not None and not force_refresh and _response_index.age() < max_age:
+            return _response_index
+
+        listed = True
+        paths, revision = [], None
+        try:
+            revision = api.repo_info(DATASET_REPO_ID, repo_type=REPO_TYPE, token=HF_TOKEN).sha
+            paths = [
+                item.path
+                for item in api.list_repo_tree(DATASET_REPO_ID, path_in_repo="responses", recursive=True,
+                                               revision=revision, repo_type=REPO_TYPE, token=HF_TOKEN)
+            ]
+        except Exception as e:
+            logging.error(f"Error listing responses in {DATASET_REPO_ID}: {e}")
+            if _response_index is not None:
+                return _response_index
+            listed = False
+
+        entries = []
+        for path in paths + commit_buffer.pending_paths(DATASET_REPO_ID):
+            match = RESPONSE_PATH_PATTERN.match(path)
+            if match:
+                entries.append((match.group("id"), match.group("type")))
+        index = ResponseIndex(entries, revision)
+        if not listed:
+            # Incomplete; don't let get_cached_response treat everything else as missing
+            return index
+        _response_index = index
+        logging.info(f"Indexed {len(index)} stored responses in {DATASET_REPO_ID}")
+        return index
+
+
+def get_response_cache_stats() -> dict:
+    """Hit/miss/eviction counters of the in-process response cache and the local HF mirror."""
+    return dict(response_cache.stats(), mirror=responses_mirror.stats())
+
+
 def get_cached_response(id: str, type: str):
-    """Fetches a cached response from Hugging Face Datasets."""
+    """Fetches a cached response, from the in-process LRU or else from Hugging Face Datasets."""
+    cache_key = (str(id), type)
+    found, response_data = response_cache.get(cache_key)
+    if found:
+        logging.debug(f"Response for ID {id}, type {type} served from in-process cache")
+        return response_data
+
+    response_data = _download_cached_response(id, type)
+    response_cache.put(cache_key, response_data)
+    return response_data
+
+
+def _download_cached_response(id: str, type: str):
     hf_path_in_repo = f"responses/{id}_responses_{type}.json"
-    local_temp_download_path = os.path.join(RESPONSES_DIR, f"{id}_responses_{type}_temp_dl.json")
     response_data = None
 
-    logging.info(f"Attempting to download cached response from HF: {DATASET_REPO_ID}/{hf_path_in_repo}")
-    downloaded_file = download_file_from_hf_dataset(
-        path_in_repo=hf_path_in_repo,
-        local_destination_path=local_temp_download_path,
-        repo_id=DATASET_REPO_ID
-    )
+    # A response stored but not yet committed to HF is only in the commit buffer
+    pending = commit_buffer.pending_content(hf_path_in_repo, DATASET_REPO_ID)
+    if pending is not None:
+        return json.loads(pending)
 
-    if downloaded_file and os.path.exists(downloaded_file):
+    # A recent listing of the repo already tells whether there is anything to fetch
+    index = _response_index
+    if index is not None and index.age() < RESPONSE_INDEX_TTL_SECONDS and not index.has(id, type):
+        logging.info(f"No cached response for ID {id}, type {type} in the response index.")
+        return None
+
+    logging.info(f"Looking up cached response in local mirror of HF: {DATASET_REPO_ID}/{hf_path_in_repo}")
+    try:
+        mirrored_file = responses_mirror.get(hf_path_in_repo)
+    except Exception as e:
+        logging.error(f"Failed to fetch {hf_path_in_repo} from {DATASET_REPO_ID}: {e}")
+        mirrored_file = None
+
+    if mirrored_file and os.path.exists(mirrored_file):
         try:
-            with open(downloaded_file, 'r') as f:
+            with open(mirrored_file, 'r') as f:
                 response_data = json.load(f)
-            logging.info(f"Successfully loaded response for ID {id} from HF via temp file {downloaded_file}")
+            logging.info(f"Successfully loaded response for ID {id} from mirror file {mirrored_file}")
         except Exception as e:
-            logging.error(f"Error reading downloaded cached response for ID {id}: {e}")
+            logging.error(f"Error reading mirrored cached response for ID {id}: {e}")
             response_data = None # Ensure None if loading fails
-        finally:
-            try:
-                os.remove(downloaded_file)
-                logging.debug(f"Cleaned up temporary downloaded file: {downloaded_file}")
-            except OSError as e:
-                logging.error(f"Error removing temporary downloaded file {downloaded_file}: {e}")
     else:
         logging.info(f"Cached response not found on HF for ID {id}, type {type}.")
 
     return response_data
 
 def store_response(id: str, response: dict, type: str):
-    """Stores a response to Hugging Face Datasets via a temporary local file."""
-    local_temp_upload_path = os.path.join(RESPONSES_DIR, f"{id}_responses_{type}_temp_ul.json")
+    """Stores a response to Hugging Face Datasets.
+
+    The file is queued in the shared commit buffer, which commits it together with other
+    pending files; see HfCommitBuffer for when that happens. The response is also appended
+    to the cohort's results shard (see utils/results_store.py).
+    """
     hf_path_in_repo = f"responses/{id}_responses_{type}.json"
 
-    try:
-        with open(local_temp_upload_path, 'w') as f:
-            json.dump(response, f, indent=4)
-        logging.debug(f"Temporary response file created at {local_temp_upload_path} for ID {id}")
-
-        logging.info(f"Uploading response for ID {id} to HF: {DATASET_REPO_ID}/{hf_path_in_repo}")
-        upload_url = upload_file_to_hf_dataset(
-            local_file_path=local_temp_upload_path,
-            path_in_repo=hf_path_in_repo,
-            repo_id=DATASET_REPO_ID
-        )
-        if upload_url:
-            logging.info(f"Successfully cached response for ID {id} to HF: {upload_url}")
-        else:
-            logging.error(f"Failed to cache response for ID {id} to HF.")
+    # Write through the in-process cache so later lookups don't need to download it again
+    response_cache.put((str(id), type), response)
 
+    try:
+        content = json.dumps(response, indent=4).encode("utf-8")
+        logging.info(f"Queueing response for ID {id} for upload to HF: {DATASET_REPO_ID}/{hf_path_in_repo}")
+        commit_buffer.add(hf_path_in_repo, content, repo_id=DATASET_REPO_ID)
+        responses_mirror.put(hf_path_in_repo, content)
+        results_writer.append(id, type, response)
+        if _response_index is not None:
+            _response_index.add(id, type)
     except Exception as e:
-        logging.error(f"Error preparing or uploading cached response for ID {id}: {e}")
-    finally:
-        if os.path.exists(local_temp_upload_path):
-            try:
-                os.remove(local_temp_upload_path)
-                logging.debug(f"Cleaned up temporary upload file: {local_temp_upload_path}")
-            except OSError as e:
-                logging.error(f"Error removing temporary upload file {local_temp_upload_path}: {e}")
+        logging.error(f"Error preparing or queueing cached response for ID {id}: {e}")
+        response_cache.invalidate((str(id), type))
 
 
 def ensure_tracking_folder(): # This function now ensures the local *temporary* tracking folder
@@ -86,30 +281,18 @@ def ensure_tracking_folder(): # This function now ensures the local *temporary*
 
 
 def store_last_processed_id(id):
-    """Store the last processed application ID to Hugging Face Dataset."""
-    ensure_tracking_folder() # Ensures local temp dir exists
-    
-    local_temp_tracking_file = os.path.join(LOCAL_TEMP_TRACKING_DIR, "last_processed_id_temp.json")
+    """Store the last processed application ID to Hugging Face Dataset.
+
+    Like store_response, the tracking file is queued in the shared commit buffer.
+    """
     tracking_data = {
         "last_processed_id": id,
         "timestamp": __import__("datetime").datetime.now().isoformat()
     }
     
     try:
-        with open(local_temp_tracking_file, 'w') as f:
-            json.dump(tracking_data, f, indent=4)
-        
-        logging.info(f"Uploading tracking data for ID {id} to HF: {TRACKING_DATA_REPO_ID}/{TRACKING_FILE_PATH_IN_REPO}")
-        upload_url = upload_file_to_hf_dataset(
-            local_file_path=local_temp_tracking_file,
-            path_in_repo=TRACKING_FILE_PATH_IN_REPO,
-            repo_id=TRACKING_DATA_REPO_ID
-        )
-        if upload_url:
-            logging.info(f"Successfully updated last processed ID to {id} on HF: {upload_url}")
-        else:
-            logging.error(f"Failed to update last processed ID {id} on HF.")
-            
+        logging.info(f"Queueing tracking data for ID {id} for upload to HF: {TRACKING_DATA_REPO_ID}/{TRACKING_FILE_PATH_IN_REPO}")
+        commit_buffer.add(TRACKING_FILE_PATH_IN_REPO, json.dumps(tracking_data, indent=4), repo_id=TRACKING_DATA_REPO_ID)
     except Exception as e:
         logging.error(f"Error storing last processed ID {id} to HF: {e}")
 
@@ -122,6 +305,11 @@ def get_last_processed_id():
     downloaded_file = None
     last_id = None
 
+    # An update that has not been committed yet is newer than what is on HF
+    pending = commit_buffer.pending_content(TRACKING_FILE_PATH_IN_REPO, TRACKING_DATA_REPO_ID)
+    if pending is not None:
+        return json.loads(pending).get("last_processed_id")
+
     logging.info(f"Attempting to download last_processed_id from HF: {TRACKING_DATA_REPO_ID}/{TRACKING_FILE_PATH_IN_REPO}")
     downloaded_file = download_file_from_hf_dataset(
         path_in_repo=TRACKING_FILE_PATH_IN_REPO,
@@ -147,26 +335,13 @@ def get_last_processed_id():
 
 
 def get_all_processed_ids():
-    """Get a list of all processed application IDs based on the files in the responses folder
+    """Get a list of all processed application IDs, from a single listing of the responses dataset
     
     Returns:
-        A set of application IDs that have been processed
+        A set of application IDs that have every response type stored
     """
-    ensure_cache_folders()
-    processed_ids = set()
-    
     try:
-        # Look for response files in the responses directory
-        if os.path.exists("responses"):
-            for filename in os.listdir("responses"):
-                # Parse IDs from filenames like '123_responses_behavior.json'
-                if filename.endswith("_responses_behavior.json"):
-                    try:
-                        id_str = filename.split("_")[0]
-                        processed_ids.add(int(id_str))
-                    except (ValueError, IndexError):
-                        continue
+        return get_response_index().complete_ids()
     except Exception as e:
         logging.error(f"Error getting processed IDs: {str(e)}")
-    
-    return processed_ids
\ No newline at end of file
+        return set()
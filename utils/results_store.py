@@ -0,0 +1,318 @@
+"""
+Consolidated, sharded store of scoring results.
+
+Alongside the per-file responses/{id}_responses_{type}.json layout, every stored response
+is appended to a gzip-compressed JSON Lines shard partitioned by cohort:
+
+    results/cohort=<cohort>/part-<timestamp>-<suffix>.jsonl.gz
+
+Each line is one (application, response type) record. Shards are append-only and go to
+the hub through the shared commit buffer. A whole cohort's ratings then load into one
+DataFrame from a few shard reads, instead of thousands of per-application downloads.
+
+Every scheduler run and UI analysis adds a small shard, so once a cohort has more than
+RESULTS_COMPACT_MAX_SHARDS of them, compact_cohort rewrites its latest records into one
+shard and deletes the parts in the same commit.
+
+Usage (migrate the existing per-file responses into one shard per cohort, or compact one):
+    python -m utils.results_store migrate [--cohort "AJVC Phase 2"]
+    python -m utils.results_store compact [--cohort "AJVC Phase 2"]
+"""
+import argparse
+import atexit
+import datetime
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+
+import pandas as pd
+
+from constants import FILTRATION_SHEET_NAME
+from huggingface_hub import CommitOperationAdd, CommitOperationDelete
+
+from utils.hf_utils import api, commit_buffer, DATASET_REPO_ID, REPO_TYPE, HF_TOKEN
+from utils.hf_mirror import HfDatasetMirror
+from utils.application_store import normalize_application_id
+from utils.rate_limit import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+RESULTS_PREFIX = "results"
+# Buffered records that trigger writing a shard
+RESULTS_SHARD_MAX_RECORDS = 200
+# Committed shards of a cohort above which it is compacted into one
+RESULTS_COMPACT_MAX_SHARDS = int(os.getenv("RESULTS_COMPACT_MAX_SHARDS", "20"))
+
+results_mirror = HfDatasetMirror(DATASET_REPO_ID, prefix=RESULTS_PREFIX)
+
+
+def cohort_slug(cohort: str) -> str:
+    """Partition name of a cohort, e.g. "AJVC Phase 2" -> "ajvc-phase-2"."""
+    return re.sub(r"[^A-Za-z0-9]+", "-", str(cohort)).strip("-").lower()
+
+
+def cohort_path(cohort: str) -> str:
+    return f"{RESULTS_PREFIX}/cohort={cohort_slug(cohort)}"
+
+
+def encode_shard(records: list) -> bytes:
+    """gzip-compressed JSON Lines bytes of a list of result records."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")).encode("utf-8"))
+            f.write(b"\n")
+    return buffer.getvalue()
+
+
+def make_record(id, type: str, response: dict, cohort: str = FILTRATION_SHEET_NAME, stored_at: str = None) -> dict:
+    return {
+        "application_id": normalize_application_id(id),
+        "type": type,
+        "cohort": cohort,
+        "stored_at": stored_at or datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "response": response,
+    }
+
+
+class ResultsShardWriter:
+    """Buffers result records in memory and writes them out as one shard per cohort."""
+
+    def __init__(self, max_records: int = RESULTS_SHARD_MAX_RECORDS):
+        self.max_records = max_records
+        self._records = []
+        self._lock = threading.Lock()
+
+    def append(self, id, type: str, response: dict, cohort: str = FILTRATION_SHEET_NAME):
+        with self._lock:
+            self._records.append(make_record(id, type, response, cohort))
+            full = len(self._records) >= self.max_records
+        if full:
+            self.flush()
+
+    def flush(self) -> list:
+        """
+        Queue a shard per cohort for the buffered records in the commit buffer.
+
+        Returns:
+            list: Paths in the repository of the queued shards
+        """
+        with self._lock:
+            records, self._records = self._records, []
+        by_cohort = {}
+        for record in records:
+            by_cohort.setdefault(record["cohort"], []).append(record)
+
+        paths = []
+        timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S")
+        for cohort, cohort_records in by_cohort.items():
+            path_in_repo = f"{cohort_path(cohort)}/part-{timestamp}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+            commit_buffer.add(path_in_repo, encode_shard(cohort_records), repo_id=DATASET_REPO_ID)
+            paths.append(path_in_repo)
+            logger.info(f"Queued results shard {path_in_repo} with {len(cohort_records)} records")
+        return paths
+
+
+results_writer = ResultsShardWriter()
+# Registered after the commit buffer's own exit hook, so it runs first and the shard is still committed
+atexit.register(results_writer.flush)
+
+
+def _list_committed_shards(cohort: str) -> list:
+    return [
+        item.path
+        for item in api.list_repo_tree(DATASET_REPO_ID, path_in_repo=cohort_path(cohort), recursive=True,
+                                       repo_type=REPO_TYPE, token=HF_TOKEN)
+        if item.path.endswith(".jsonl.gz")
+    ]
+
+
+def list_cohort_shards(cohort: str = FILTRATION_SHEET_NAME) -> list:
+    """Paths in the repository of a cohort's shards, oldest first."""
+    try:
+        paths = _list_committed_shards(cohort)
+    except Exception as e:
+        logger.error(f"Error listing results shards of cohort {cohort}: {e}")
+        paths = []
+    # Shards not committed yet are already readable from the commit buffer
+    paths += [path for path in commit_buffer.pending_paths(DATASET_REPO_ID)
+              if path.startswith(cohort_path(cohort) + "/") and path.endswith(".jsonl.gz")]
+    return sorted(set(paths))
+
+
+def _read_shard(path_in_repo: str) -> pd.DataFrame:
+    pending = commit_buffer.pending_content(path_in_repo, DATASET_REPO_ID)
+    source = io.BytesIO(gzip.decompress(pending)) if pending is not None else results_mirror.get(path_in_repo)
+    if source is None:
+        return pd.DataFrame()
+    return pd.read_json(source, lines=True, compression=None if pending is not None else "gzip",
+                        dtype={"application_id": object})
+
+
+def load_cohort_records(cohort: str = FILTRATION_SHEET_NAME, latest_only: bool = True) -> pd.DataFrame:
+    """
+    One row per stored (application, response type) record of a cohort.
+
+    Args:
+        cohort: The cohort, e.g. the filtration sheet name
+        latest_only: Keep only the most recently stored record of each (application, type)
+
+    Returns:
+        DataFrame with columns application_id, type, cohort, stored_at, response
+    """
+    return _load_shards(list_cohort_shards(cohort), latest_only)
+
+
+def _load_shards(paths: list, latest_only: bool) -> pd.DataFrame:
+    frames = [frame for frame in (_read_shard(path) for path in paths) if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=["application_id", "type", "cohort", "stored_at", "response"])
+    records = pd.concat(frames, ignore_index=True)
+    if latest_only:
+        records = (records.sort_values("stored_at", kind="stable")
+                   .drop_duplicates(subset=["application_id", "type"], keep="last")
+                   .reset_index(drop=True))
+    return records
+
+
+def compact_cohort(cohort: str = FILTRATION_SHEET_NAME, max_shards: int = RESULTS_COMPACT_MAX_SHARDS) -> str:
+    """
+    Rewrite a cohort's committed shards into one holding the latest record of each
+    (application, type), if it has more than max_shards of them.
+
+    The new shard is added and the old ones deleted in a single commit, so readers see
+    either all the old shards or the compacted one. Shards still in the commit buffer are
+    left alone.
+
+    Returns:
+        str: Path in the repository of the compacted shard, or None if nothing was compacted
+    """
+    try:
+        paths = _list_committed_shards(cohort)
+    except Exception as e:
+        logger.error(f"Error listing results shards of cohort {cohort}, not compacting: {e}")
+        return None
+    if len(paths) <= max_shards:
+        return None
+
+    records = _load_shards(paths, latest_only=True)
+    # read_json parses stored_at into Timestamps; shards store ISO strings
+    records = [
+        {"application_id": application_id, "type": type, "cohort": record_cohort,
+         "stored_at": stored_at.isoformat() if hasattr(stored_at, "isoformat") else stored_at,
+         "response": response}
+        for application_id, type, record_cohort, stored_at, response in zip(
+            records["application_id"], records["type"], records["cohort"], records["stored_at"], records["response"])
+    ]
+    timestamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S")
+    path_in_repo = f"{cohort_path(cohort)}/part-{timestamp}-compacted-{uuid.uuid4().hex[:8]}.jsonl.gz"
+    operations = [CommitOperationAdd(path_in_repo=path_in_repo, path_or_fileobj=encode_shard(records))]
+    operations += [CommitOperationDelete(path_in_repo=path) for path in paths]
+    try:
+        get_rate_limiter("hf_commits", DATASET_REPO_ID).acquire()
+        api.create_commit(
+            repo_id=DATASET_REPO_ID,
+            repo_type=REPO_TYPE,
+            operations=operations,
+            commit_message=f"Compact {len(paths)} results shards of {cohort}",
+            token=HF_TOKEN
+        )
+    except Exception as e:
+        # The old shards are untouched; the next run tries again
+        logger.error(f"Failed to compact results shards of cohort {cohort}: {e}")
+        return None
+    logger.info(f"Compacted {len(paths)} results shards of cohort {cohort} into {path_in_repo} "
+                f"with {len(records)} records")
+    return path_in_repo
+
+
+def load_cohort_ratings(cohort: str = FILTRATION_SHEET_NAME) -> pd.DataFrame:
+    """
+    A cohort's ratings in long form: one row per (application, response type, skill or behavior).
+
+    Returns:
+        DataFrame with columns application_id, type, dimension, rating, citations, reasoning
+    """
+    records = load_cohort_records(cohort)
+    rows = [
+        (application_id, type, dimension, data.get("Rating"), data.get("Citations"), data.get("Reasoning"))
+        for application_id, type, response in zip(records["application_id"], records["type"], records["response"])
+        for dimension, data in (response or {}).items()
+        if isinstance(data, dict)
+    ]
+    ratings = pd.DataFrame(rows, columns=["application_id", "type", "dimension", "rating", "citations", "reasoning"])
+    ratings["rating"] = pd.to_numeric(ratings["rating"], errors="coerce")
+    return ratings
+
+
+def ratings_table(ratings: pd.DataFrame) -> pd.DataFrame:
+    """Wide view of load_cohort_ratings: one row per application, one column per (type, dimension)."""
+    return ratings.pivot_table(index="application_id", columns=["type", "dimension"], values="rating", aggfunc="last")
+
+
+def migrate_per_file_responses(cohort: str = FILTRATION_SHEET_NAME, flush: bool = True) -> str:
+    """
+    Convert the existing responses/{id}_responses_{type}.json objects into a single shard of a cohort.
+
+    Returns:
+        str: Path in the repository of the written shard, or None if there was nothing to migrate
+    """
+    from utils.responses_cache import RESPONSE_PATH_PATTERN, responses_mirror
+
+    paths = [
+        item.path
+        for item in api.list_repo_tree(DATASET_REPO_ID, path_in_repo="responses", recursive=True,
+                                       repo_type=REPO_TYPE, token=HF_TOKEN)
+    ]
+    records = []
+    for path in paths:
+        match = RESPONSE_PATH_PATTERN.match(path)
+        if not match:
+            continue
+        local_path = responses_mirror.get(path)
+        if local_path is None:
+            continue
+        try:
+            with open(local_path, "r") as f:
+                response = json.load(f)
+        except Exception as e:
+            logger.error(f"Skipping unreadable response {path}: {e}")
+            continue
+        records.append(make_record(match.group("id"), match.group("type"), response, cohort))
+
+    if not records:
+        logger.info("No per-file responses to migrate")
+        return None
+
+    path_in_repo = f"{cohort_path(cohort)}/part-migrated-{uuid.uuid4().hex[:8]}.jsonl.gz"
+    commit_buffer.add(path_in_repo, encode_shard(records), repo_id=DATASET_REPO_ID)
+    logger.info(f"Migrated {len(records)} per-file responses into {path_in_repo}")
+    if flush:
+        commit_buffer.flush(reason="migration", commit_message=f"Migrate {len(records)} responses to {path_in_repo}")
+    return path_in_repo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consolidated results store tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Convert per-file responses into a cohort shard")
+    migrate_parser.add_argument("--cohort", default=FILTRATION_SHEET_NAME)
+    compact_parser = subparsers.add_parser("compact", help="Rewrite a cohort's shards into one")
+    compact_parser.add_argument("--cohort", default=FILTRATION_SHEET_NAME)
+    summary_parser = subparsers.add_parser("summary", help="Print a cohort's average ratings")
+    summary_parser.add_argument("--cohort", default=FILTRATION_SHEET_NAME)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "migrate":
+        migrate_per_file_responses(args.cohort)
+    elif args.command == "compact":
+        compact_cohort(args.cohort, max_shards=0)
+    elif args.command == "summary":
+        ratings = load_cohort_ratings(args.cohort)
+        print(ratings.groupby(["type", "dimension"])["rating"].mean().round(2).to_string())
@@ -0,0 +1,303 @@
+"""
+Shared, TTL-cached snapshots of Google Sheets.
+
+The pipeline, scheduler and Streamlit app all read the same filtration sheet. Instead of
+each of them downloading the whole sheet, they share one snapshot per sheet that is
+re-read only once it is older than its TTL or has been explicitly invalidated.
+
+Snapshots are refreshed incrementally, since the sheet only grows as applications come in:
+  - if the spreadsheet's Drive modifiedTime is unchanged, nothing is read;
+  - otherwise the header row, the rows from the last SHEET_VERIFY_SAMPLE_ROWS known rows
+    onwards, the application ID column and as many randomly sampled earlier rows are read
+    in one request, and the new rows are appended to the snapshot;
+  - the whole sheet is read again if the header or a read-back known row changed, if the
+    checksum of the known ID column differs (rows were inserted, removed or renumbered),
+    if nothing was appended (an edit elsewhere), or every SHEET_FULL_RESYNC_SECONDS.
+"""
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+
+import pandas as pd
+
+from constants import (APPLICATION_ID, FILTRATION_SHEET_LINK, FILTRATION_SHEET_NAME, SHEET_SNAPSHOT_TTL_SECONDS,
+                       SHEET_INCREMENTAL_SYNC, SHEET_FULL_RESYNC_SECONDS, SHEET_VERIFY_SAMPLE_ROWS)
+from utils.google_clients import (read_sheet_values, read_sheet_ranges, get_sheet_modified_time, sheet_range,
+                                  values_to_dataframe)
+from utils.application_store import ApplicationRecordStore
+
+logger = logging.getLogger(__name__)
+
+
+class SheetSyncState:
+    """What the next incremental refresh needs to know about the read behind a snapshot."""
+
+    __slots__ = ("sheet_title", "values", "modified_time", "full_read_at", "id_column", "id_checksum")
+
+    def __init__(self, sheet_title: str, values: list, modified_time: str, full_read_at: float):
+        self.sheet_title = sheet_title
+        # Raw rows of the sheet, header row first
+        self.values = values
+        # Drive modifiedTime observed before the rows were read, None if unknown
+        self.modified_time = modified_time
+        self.full_read_at = full_read_at
+        # Index of the application ID column and checksum of its known data cells
+        header = [str(cell) for cell in values[0]] if values else []
+        self.id_column = header.index(APPLICATION_ID) if APPLICATION_ID in header else None
+        self.id_checksum = _column_checksum(values[1:], self.id_column) if self.id_column is not None else None
+
+
+class SheetSnapshot:
+    """
+    An immutable view of a sheet at one point in time.
+
+    The DataFrame is shared between every caller holding the snapshot, so callers that
+    need to modify it must work on a copy.
+
+    Attributes:
+        df: The sheet contents
+        record_store: ApplicationRecordStore indexing df by application ID
+        version: Increases by one every time the sheet contents change
+        content_hash: Hash of the sheet contents
+        fetched_at: time.time() at which the sheet was read
+    """
+
+    def __init__(self, df: pd.DataFrame, version: int, content_hash: str, fetched_at: float,
+                 sync_state: SheetSyncState = None, record_store: ApplicationRecordStore = None):
+        self.df = df
+        self.version = version
+        self.content_hash = content_hash
+        self.fetched_at = fetched_at
+        self.sync_state = sync_state
+        self._record_store = record_store
+        self._record_store_lock = threading.Lock()
+
+    @property
+    def record_store(self) -> ApplicationRecordStore:
+        """The ID-indexed application records of this snapshot, built on first use."""
+        with self._record_store_lock:
+            if self._record_store is None:
+                self._record_store = ApplicationRecordStore(self.df)
+            return self._record_store
+
+    def age(self) -> float:
+        """Seconds since the sheet was read."""
+        return time.time() - self.fetched_at
+
+    def __repr__(self):
+        return f"SheetSnapshot(rows={len(self.df)}, version={self.version}, content_hash={self.content_hash[:12]})"
+
+
+# (sheets_link, sheet_name) -> SheetSnapshot
+_snapshots = {}
+# Keys whose snapshot must be re-read on next access
+_invalidated = set()
+_lock = threading.Lock()
+# Refreshes by kind ("full", "delta", "unchanged") and data rows downloaded
+_sync_stats = {"full": 0, "delta": 0, "unchanged": 0, "rows_fetched": 0}
+
+
+def hash_dataframe(df: pd.DataFrame) -> str:
+    """Stable hash of a DataFrame's columns and values."""
+    digest = hashlib.sha1()
+    digest.update("\x1f".join(map(str, df.columns)).encode())
+    if not df.empty:
+        digest.update(pd.util.hash_pandas_object(df.astype(str), index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def _row_key(row: list) -> str:
+    """Comparable form of a sheet row, ignoring trailing empty cells."""
+    row = list(row)
+    while row and row[-1] in (None, ""):
+        row.pop()
+    return json.dumps(row, default=str)
+
+
+def _column_checksum(rows: list, index: int) -> str:
+    """Checksum of one column of sheet rows, ignoring trailing empty cells as the Sheets API does."""
+    cells = [row[index] if index < len(row) else "" for row in rows]
+    while cells and cells[-1] in (None, ""):
+        cells.pop()
+    return hashlib.sha1(json.dumps(cells, default=str).encode()).hexdigest()
+
+
+def _column_letter(index: int) -> str:
+    """A1 notation letter of a zero-based column index, e.g. 0 -> "A", 27 -> "AB"."""
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def _modified_time(sheets_link: str):
+    try:
+        return get_sheet_modified_time(sheets_link)
+    except Exception as e:
+        logger.warning(f"[Sheets] Could not read modifiedTime, incremental refreshes disabled for this read: {e}")
+        return None
+
+
+def _read_full(sheets_link: str, sheet_name: str):
+    """Reads the whole sheet. Returns (rows, sync state)."""
+    # Observed before the read, so an edit made during the read is picked up by the next refresh
+    modified_time = _modified_time(sheets_link) if SHEET_INCREMENTAL_SYNC else None
+    values, sheet_title = read_sheet_values(sheets_link, sheet_name)
+    return values, SheetSyncState(sheet_title, values, modified_time, time.time())
+
+
+def _read_delta(sheets_link: str, state: SheetSyncState):
+    """
+    Reads what changed since `state` if the sheet was only appended to.
+
+    Returns:
+        tuple: (new data rows, sync state), or None if the whole sheet must be read again
+    """
+    modified_time = get_sheet_modified_time(sheets_link)
+    if modified_time == state.modified_time:
+        return [], state
+
+    # The known rows are read back from the last SHEET_VERIFY_SAMPLE_ROWS onwards: if the last one
+    # moved or any of them changed, rows were edited or removed. The known ID column and a random
+    # sample of earlier rows are read too, to catch edits made alongside an append.
+    known_rows = len(state.values)
+    first_row = max(2, known_rows - SHEET_VERIFY_SAMPLE_ROWS + 1) if known_rows > 1 else 1
+    sampled_rows = sorted(random.sample(range(2, first_row), min(SHEET_VERIFY_SAMPLE_ROWS, max(0, first_row - 2))))
+    ranges = [
+        sheet_range(state.sheet_title, "A1:ZZ1"),
+        sheet_range(state.sheet_title, f"A{first_row}:ZZ"),
+    ]
+    if state.id_column is not None and known_rows > 1:
+        column = _column_letter(state.id_column)
+        ranges.append(sheet_range(state.sheet_title, f"{column}2:{column}{known_rows}"))
+    ranges += [sheet_range(state.sheet_title, f"A{row}:ZZ{row}") for row in sampled_rows]
+    header, tail, *checks = read_sheet_ranges(sheets_link, ranges)
+    if not header or _row_key(header[0]) != _row_key(state.values[0]):
+        logger.info("[Sheets] Header row changed, reading the whole sheet")
+        return None
+    known_tail = state.values[first_row - 1:]
+    if len(tail) < len(known_tail) or any(_row_key(row) != _row_key(known)
+                                          for row, known in zip(tail, known_tail)):
+        logger.info(f"[Sheets] Rows {first_row}-{known_rows} changed, reading the whole sheet")
+        return None
+    if state.id_column is not None and known_rows > 1:
+        id_rows = checks.pop(0)
+        if _column_checksum([[row[0] if row else ""] for row in id_rows], 0) != state.id_checksum:
+            logger.info("[Sheets] Application ID column changed, reading the whole sheet")
+            return None
+    for row, rows in zip(sampled_rows, checks):
+        if _row_key(rows[0] if rows else []) != _row_key(state.values[row - 1]):
+            logger.info(f"[Sheets] Row {row} changed, reading the whole sheet")
+            return None
+    new_rows = tail[len(known_tail):]
+    if not new_rows:
+        logger.info("[Sheets] Sheet was modified but no rows were appended, reading the whole sheet")
+        return None
+    return new_rows, SheetSyncState(state.sheet_title, state.values + new_rows, modified_time, state.full_read_at)
+
+
+def _refresh(sheets_link: str, sheet_name: str, snapshot: SheetSnapshot):
+    """
+    Reads the sheet, incrementally when possible.
+
+    Returns:
+        tuple: (DataFrame, sync state, kind of refresh, record store to reuse or None).
+        The DataFrame is empty if the sheet could not be read.
+    """
+    state = snapshot.sync_state if snapshot is not None else None
+    if (SHEET_INCREMENTAL_SYNC and state is not None and state.modified_time is not None
+            and time.time() - state.full_read_at < SHEET_FULL_RESYNC_SECONDS):
+        try:
+            delta = _read_delta(sheets_link, state)
+        except Exception as e:
+            logger.warning(f"[Sheets] Incremental refresh of '{sheet_name}' failed, reading the whole sheet: {e}")
+            delta = None
+        if delta is not None:
+            new_rows, new_state = delta
+            _sync_stats["rows_fetched"] += len(new_rows)
+            if not new_rows:
+                _sync_stats["unchanged"] += 1
+                return snapshot.df, new_state, "unchanged", snapshot._record_store
+            _sync_stats["delta"] += 1
+            df = pd.concat([snapshot.df, values_to_dataframe([state.values[0]] + new_rows)], ignore_index=True)
+            return df, new_state, "delta", None
+
+    try:
+        values, new_state = _read_full(sheets_link, sheet_name)
+    except Exception as e:
+        print(f"[Sheets] An unexpected error occurred: {e}")
+        return pd.DataFrame(), None, "full", None
+    _sync_stats["full"] += 1
+    _sync_stats["rows_fetched"] += max(0, len(values) - 1)
+    return values_to_dataframe(values), new_state, "full", None
+
+
+def sheet_sync_stats() -> dict:
+    """Number of full, incremental and no-op refreshes, and data rows downloaded, since start-up."""
+    with _lock:
+        return dict(_sync_stats)
+
+
+def get_sheet_snapshot(sheets_link: str = FILTRATION_SHEET_LINK, sheet_name: str = FILTRATION_SHEET_NAME,
+                       ttl: float = None, force_refresh: bool = False) -> SheetSnapshot:
+    """
+    Returns the shared snapshot of a sheet, re-reading it if it is missing or expired.
+
+    Args:
+        sheets_link: The Google Sheets URL. Defaults to the filtration sheet.
+        sheet_name: The sheet to read. Defaults to the filtration sheet name.
+        ttl: Maximum age in seconds of a snapshot that can be reused. Defaults to SHEET_SNAPSHOT_TTL_SECONDS.
+        force_refresh: Re-read the sheet even if the snapshot has not expired
+
+    Returns:
+        SheetSnapshot: The current snapshot. If a refresh fails the previous snapshot is
+        returned, and if there is none the snapshot has an empty DataFrame.
+    """
+    ttl = SHEET_SNAPSHOT_TTL_SECONDS if ttl is None else ttl
+    key = (sheets_link, sheet_name)
+
+    # Holding the lock while reading means concurrent callers wait for one read instead of all reading
+    with _lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is not None and not force_refresh and key not in _invalidated and snapshot.age() < ttl:
+            return snapshot
+
+        df, sync_state, refresh_kind, record_store = _refresh(sheets_link, sheet_name, snapshot)
+        _invalidated.discard(key)
+        if df.empty and snapshot is not None:
+            logger.warning(f"[Sheets] Refresh of '{sheet_name}' returned no data, keeping snapshot version {snapshot.version}")
+            return snapshot
+
+        content_hash = snapshot.content_hash if refresh_kind == "unchanged" else hash_dataframe(df)
+        if snapshot is not None and snapshot.content_hash == content_hash:
+            version = snapshot.version
+        else:
+            version = snapshot.version + 1 if snapshot is not None else 1
+        new_snapshot = SheetSnapshot(df, version, content_hash, time.time(), sync_state, record_store)
+
+        if df.empty:
+            # Nothing worth sharing; let the next caller try again
+            return new_snapshot
+        _snapshots[key] = new_snapshot
+        logger.info(f"[Sheets] Refreshed snapshot of '{sheet_name}' ({refresh_kind}): {new_snapshot}")
+        return new_snapshot
+
+
+def invalidate_sheet_snapshot(sheets_link: str = None, sheet_name: str = None):
+    """
+    Forces the next get_sheet_snapshot call to re-read the sheet.
+
+    Args:
+        sheets_link: The sheet to invalidate. If None, every snapshot is invalidated.
+        sheet_name: The sheet name within sheets_link. Defaults to the filtration sheet name.
+    """
+    with _lock:
+        if sheets_link is None:
+            _invalidated.update(_snapshots)
+        else:
+            _invalidated.add((sheets_link, sheet_name or FILTRATION_SHEET_NAME))
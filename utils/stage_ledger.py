@@ -0,0 +1,222 @@
+"""
+Per-application checkpoint ledger of the scoring pipeline.
+
+For every application the ledger records which checkpoints it reached and when, the
+number of attempts and the last error:
+
+    downloaded -> transcoded -> transcribed -> scored_<dimension>... -> scored -> uploaded
+
+The pipeline stages consult it to resume an application where it stopped, and the
+scheduler uses it to retry failed applications and skip finished ones. The ledger is
+saved locally after every change and synced to the tracking dataset on HF.
+"""
+import datetime
+import json
+import logging
+import os
+import threading
+
+from utils.hf_utils import commit_buffer, download_file_from_hf_dataset
+from utils.responses_cache import TRACKING_DATA_REPO_ID, LOCAL_TEMP_TRACKING_DIR
+from utils.application_store import normalize_application_id
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINTS = ("downloaded", "transcoded", "transcribed", "scored", "uploaded")
+# Checkpoint reached by each pipeline stage
+STAGE_CHECKPOINTS = {
+    "fetch": "downloaded",
+    "transcode": "transcoded",
+    "transcribe": "transcribed",
+    "score": "scored",
+    "persist": "uploaded",
+}
+
+LEDGER_PATH_IN_REPO = "stage_ledger.json"
+LOCAL_LEDGER_PATH = os.path.join(LOCAL_TEMP_TRACKING_DIR, "stage_ledger.json")
+# Failed applications are retried by the scheduler until they have had this many attempts
+STAGE_LEDGER_MAX_ATTEMPTS = int(os.getenv("STAGE_LEDGER_MAX_ATTEMPTS", "3"))
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _key(id) -> str:
+    return str(normalize_application_id(id))
+
+
+class StageLedger:
+    """
+    Thread-safe ledger of per-application checkpoints.
+
+    Args:
+        local_path: JSON file the ledger is saved to after every change
+    """
+
+    def __init__(self, local_path: str = LOCAL_LEDGER_PATH):
+        self.local_path = local_path
+        # Application ID -> {"stages": {checkpoint: timestamp}, "attempts", "error", "updated_at"}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    # --- Persistence --- #
+
+    def load(self, include_remote: bool = True):
+        """Load the local ledger, merged with the copy on HF so a fresh machine resumes too."""
+        local = self._read(self.local_path) or {}
+        remote = self._read_remote() if include_remote else {}
+        with self._lock:
+            self._entries = self._merge(remote or {}, local)
+            self._save()
+        logger.info(f"Loaded stage ledger with {len(self._entries)} applications")
+        return self
+
+    @staticmethod
+    def _read(path: str):
+        try:
+            with open(path, "r") as f:
+                return json.load(f).get("applications", {})
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Ignoring unreadable stage ledger {path}: {e}")
+            return None
+
+    def _read_remote(self):
+        pending = commit_buffer.pending_content(LEDGER_PATH_IN_REPO, TRACKING_DATA_REPO_ID)
+        if pending is not None:
+            return json.loads(pending).get("applications", {})
+        downloaded_file = download_file_from_hf_dataset(
+            path_in_repo=LEDGER_PATH_IN_REPO,
+            local_destination_path=os.path.join(LOCAL_TEMP_TRACKING_DIR, "stage_ledger_temp_dl.json"),
+            repo_id=TRACKING_DATA_REPO_ID
+        )
+        return self._read(downloaded_file) if downloaded_file else None
+
+    @staticmethod
+    def _merge(base: dict, newer: dict) -> dict:
+        merged = {id: dict(entry, stages=dict(entry.get("stages", {}))) for id, entry in base.items()}
+        for id, entry in newer.items():
+            current = merged.get(id)
+            if current is None:
+                merged[id] = entry
+                continue
+            # Checkpoints are facts, so keep every one either copy reached
+            current["stages"].update(entry.get("stages", {}))
+            current["attempts"] = max(current.get("attempts", 0), entry.get("attempts", 0))
+            if entry.get("updated_at", "") >= current.get("updated_at", ""):
+                current["error"] = entry.get("error")
+                current["updated_at"] = entry.get("updated_at")
+        return merged
+
+    def _serialize(self) -> str:
+        return json.dumps({"updated_at": _now(), "applications": self._entries}, indent=2)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.local_path) or ".", exist_ok=True)
+        temp_path = f"{self.local_path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self._serialize())
+        os.replace(temp_path, self.local_path)
+
+    def sync(self):
+        """Queue the ledger for upload to the tracking dataset in the shared commit buffer."""
+        with self._lock:
+            content = self._serialize()
+        try:
+            commit_buffer.add(LEDGER_PATH_IN_REPO, content, repo_id=TRACKING_DATA_REPO_ID)
+        except Exception as e:
+            logger.error(f"Error queueing stage ledger for upload: {e}")
+
+    # --- Updates --- #
+
+    def _entry(self, id) -> dict:
+        return self._entries.setdefault(_key(id), {"stages": {}, "attempts": 0, "error": None, "updated_at": None})
+
+    def begin(self, id):
+        """Count a new attempt at an application."""
+        with self._lock:
+            entry = self._entry(id)
+            entry["attempts"] = entry.get("attempts", 0) + 1
+            entry["updated_at"] = _now()
+            self._save()
+
+    def mark(self, id, checkpoint: str):
+        """Record that an application reached a checkpoint."""
+        with self._lock:
+            entry = self._entry(id)
+            entry["stages"][checkpoint] = _now()
+            if entry.get("error") and (entry["error"]["stage"] == checkpoint or checkpoint == "uploaded"):
+                entry["error"] = None
+            entry["updated_at"] = entry["stages"][checkpoint]
+            self._save()
+
+    def fail(self, id, checkpoint: str, error: Exception):
+        """Record that an application failed while working towards a checkpoint."""
+        with self._lock:
+            entry = self._entry(id)
+            entry["error"] = {
+                "stage": checkpoint,
+                "type": type(error).__name__,
+                "message": str(error)[:1000],
+                "at": _now(),
+            }
+            entry["updated_at"] = entry["error"]["at"]
+            self._save()
+
+    # --- Queries --- #
+
+    def entry(self, id) -> dict:
+        with self._lock:
+            entry = self._entries.get(_key(id))
+            return json.loads(json.dumps(entry)) if entry is not None else None
+
+    def __contains__(self, id) -> bool:
+        with self._lock:
+            return _key(id) in self._entries
+
+    def reached(self, id, checkpoint: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(_key(id))
+            return entry is not None and checkpoint in entry["stages"]
+
+    def is_complete(self, id) -> bool:
+        return self.reached(id, "uploaded")
+
+    def last_error(self, id):
+        with self._lock:
+            entry = self._entries.get(_key(id))
+            return entry.get("error") if entry is not None else None
+
+    def exhausted(self, id, max_attempts: int = STAGE_LEDGER_MAX_ATTEMPTS) -> bool:
+        """Whether a failed application has used up its attempts."""
+        with self._lock:
+            entry = self._entries.get(_key(id))
+            return (entry is not None and entry.get("error") is not None
+                    and entry.get("attempts", 0) >= max_attempts)
+
+    def summary(self) -> dict:
+        """Number of applications whose furthest checkpoint is each checkpoint, and failures."""
+        with self._lock:
+            counts = {checkpoint: 0 for checkpoint in CHECKPOINTS}
+            failed = 0
+            for entry in self._entries.values():
+                reached = [checkpoint for checkpoint in CHECKPOINTS if checkpoint in entry["stages"]]
+                if reached:
+                    counts[reached[-1]] += 1
+                failed += entry.get("error") is not None
+            return {"applications": len(self._entries), "furthest_checkpoint": counts, "failed": failed}
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_stage_ledger() -> StageLedger:
+    """The process-wide stage ledger, loaded on first use."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = StageLedger().load()
+        return _ledger
@@ -0,0 +1,288 @@
+"""
+Shared pool of ffmpeg processes sized to the machine's cores.
+
+Transcodes from every caller (pipeline stages, the batch engine, the scheduler) go through
+one pool, so the number of ffmpeg processes running at once matches the cores available
+to the process however many applications are in flight. Each ffmpeg gets
+FFMPEG_THREADS threads so the pool as a whole does not oversubscribe the CPU.
+
+Jobs have a timeout after which ffmpeg is killed, and can be cancelled whether they are
+still queued or already running. Processes the caller drives itself (e.g. ffmpeg reading a
+download from stdin) can be attached to the pool with popen: they don't take a worker, but
+get the same timeout, cancellation and stats.
+
+Usage:
+    pool = get_transcode_pool()
+    job = pool.submit(["ffmpeg", "-i", "in.mp4", ..., "out.mp3"], name="688")
+    completed = job.result()   # subprocess.CompletedProcess, or raises TimeoutExpired/CancelledError
+
+    with pool.popen(["ffmpeg", "-i", "pipe:0", ...], name="688", stdin=subprocess.PIPE) as process:
+        process.stdin.write(...)
+"""
+import contextlib
+import logging
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> int:
+    """Cores this process may run on (respects CPU affinity, e.g. in containers)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# ffmpeg processes run at once. Audio extraction is mostly single-threaded, so one per core.
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", "0")) or available_cpus()
+# Threads each ffmpeg may use, splitting the cores between the pool's workers
+FFMPEG_THREADS = int(os.getenv("FFMPEG_THREADS", "0")) or max(1, available_cpus() // TRANSCODE_WORKERS)
+# Seconds after which a transcode is killed
+TRANSCODE_TIMEOUT_SECONDS = float(os.getenv("TRANSCODE_TIMEOUT_SECONDS", "900"))
+
+
+class TranscodeJob:
+    """
+    One ffmpeg invocation submitted to a TranscodePool.
+
+    Attributes:
+        name: Label used in logs, e.g. the application ID
+        cmd: The command line
+        timeout: Seconds the process may run before it is killed
+    """
+
+    def __init__(self, name: str, cmd: list, timeout: float):
+        self.name = name
+        self.cmd = cmd
+        self.timeout = timeout
+        self.future = None
+        self.started_at = None
+        self.finished_at = None
+        self._process = None
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def _run(self) -> subprocess.CompletedProcess:
+        with self._lock:
+            if self._cancelled:
+                raise CancelledError()
+            self.started_at = time.monotonic()
+            self._process = subprocess.Popen(self.cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            _, stderr = self._process.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.communicate()
+            logger.error(f"Transcode {self.name} timed out after {self.timeout:.0f}s, killed ffmpeg")
+            raise
+        finally:
+            self.finished_at = time.monotonic()
+        if self._cancelled:
+            raise CancelledError()
+        return subprocess.CompletedProcess(self.cmd, self._process.returncode, None,
+                                           stderr.decode(errors="replace"))
+
+    def cancel(self) -> bool:
+        """
+        Cancel the job: drop it if it is still queued, kill ffmpeg if it is running.
+
+        Returns:
+            bool: False if the job had already finished
+        """
+        with self._lock:
+            if self.future.done():
+                return False
+            self._cancelled = True
+            if self.future.cancel():
+                return True
+            if self._process is not None and self._process.poll() is None:
+                self._process.kill()
+            return True
+
+    def result(self, timeout: float = None) -> subprocess.CompletedProcess:
+        """
+        Wait for the job.
+
+        Args:
+            timeout: Seconds to wait. This only bounds the wait; the job keeps its own timeout.
+
+        Returns:
+            subprocess.CompletedProcess: With the return code and ffmpeg's stderr
+
+        Raises:
+            subprocess.TimeoutExpired: ffmpeg ran longer than the job's timeout
+            concurrent.futures.CancelledError: The job was cancelled
+        """
+        return self.future.result(timeout)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def __repr__(self):
+        return f"TranscodeJob(name={self.name}, done={self.future.done() if self.future else False})"
+
+
+class TranscodePool:
+    """
+    Runs ffmpeg jobs on a fixed number of worker threads, one process per worker.
+
+    Args:
+        workers: Jobs run at once. Defaults to TRANSCODE_WORKERS.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or TRANSCODE_WORKERS
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="transcode")
+        self._jobs = set()
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "succeeded": 0, "failed": 0, "timed_out": 0, "cancelled": 0,
+                       "busy_seconds": 0.0, "queued_seconds": 0.0}
+
+    def submit(self, cmd: list, name: str = None, timeout: float = TRANSCODE_TIMEOUT_SECONDS) -> TranscodeJob:
+        """Queue an ffmpeg command. Returns the job, which can be waited on or cancelled."""
+        job = TranscodeJob(name or os.path.basename(cmd[-1]), cmd, timeout)
+        submitted_at = time.monotonic()
+        with self._lock:
+            self._jobs.add(job)
+            self._stats["submitted"] += 1
+            job.future = self._executor.submit(job._run)
+        job.future.add_done_callback(lambda future: self._finished(job, submitted_at))
+        return job
+
+    def run(self, cmd: list, name: str = None, timeout: float = TRANSCODE_TIMEOUT_SECONDS) -> subprocess.CompletedProcess:
+        """Submit an ffmpeg command and wait for it, see TranscodeJob.result."""
+        return self.submit(cmd, name, timeout).result()
+
+    @contextlib.contextmanager
+    def popen(self, cmd: list, name: str = None, timeout: float = TRANSCODE_TIMEOUT_SECONDS, **popen_kwargs):
+        """
+        Start a process the caller drives itself, tracked like a job but outside the workers.
+
+        For ffmpeg processes fed through stdin or probes that are mostly waiting: they don't take
+        a worker, but are killed after `timeout`, killed by cancel_all and counted in stats.
+        The process is waited for on exit, and killed if the block raised.
+
+        Args:
+            popen_kwargs: Passed to subprocess.Popen, e.g. stdin=subprocess.PIPE
+
+        Yields:
+            subprocess.Popen: The running process
+
+        Raises:
+            subprocess.TimeoutExpired: On exit, if the process ran longer than `timeout`
+            concurrent.futures.CancelledError: On exit, if the job was cancelled
+        """
+        job = TranscodeJob(name or os.path.basename(cmd[-1]), cmd, timeout)
+        job.future = Future()
+        job.future.set_running_or_notify_cancel()
+        submitted_at = time.monotonic()
+        with self._lock:
+            self._jobs.add(job)
+            self._stats["submitted"] += 1
+        job.future.add_done_callback(lambda future: self._finished(job, submitted_at))
+
+        timed_out = threading.Event()
+
+        def kill_on_timeout():
+            timed_out.set()
+            job._process.kill()
+
+        timer = threading.Timer(timeout, kill_on_timeout)
+        timer.daemon = True
+        try:
+            with job._lock:
+                if job._cancelled:
+                    raise CancelledError()
+                job.started_at = time.monotonic()
+                job._process = subprocess.Popen(cmd, **popen_kwargs)
+            timer.start()
+            yield job._process
+        except BaseException as e:
+            timer.cancel()
+            if job._process is not None and job._process.poll() is None:
+                job._process.kill()
+                job._process.wait()
+            job.finished_at = time.monotonic()
+            job.future.set_exception(e)
+            raise
+        timer.cancel()
+        returncode = job._process.wait()
+        job.finished_at = time.monotonic()
+        if timed_out.is_set():
+            logger.error(f"Transcode {job.name} timed out after {timeout:.0f}s, killed ffmpeg")
+            error = subprocess.TimeoutExpired(cmd, timeout)
+        elif job._cancelled:
+            error = CancelledError()
+        else:
+            job.future.set_result(subprocess.CompletedProcess(cmd, returncode))
+            return
+        job.future.set_exception(error)
+        raise error
+
+    def _finished(self, job: TranscodeJob, submitted_at: float):
+        with self._lock:
+            self._jobs.discard(job)
+            if job.future.cancelled() or job._cancelled:
+                self._stats["cancelled"] += 1
+            elif isinstance(job.future.exception(), subprocess.TimeoutExpired):
+                self._stats["timed_out"] += 1
+            elif job.future.exception() is None and job.future.result().returncode == 0:
+                self._stats["succeeded"] += 1
+            else:
+                self._stats["failed"] += 1
+            if job.started_at is not None:
+                self._stats["queued_seconds"] += job.started_at - submitted_at
+                self._stats["busy_seconds"] += (job.finished_at or time.monotonic()) - job.started_at
+
+    @staticmethod
+    def wait(jobs: list, timeout: float = None):
+        """
+        Wait for several jobs.
+
+        Returns:
+            tuple: (finished jobs, unfinished jobs)
+        """
+        by_future = {job.future: job for job in jobs}
+        done, not_done = wait(by_future, timeout=timeout)
+        return [by_future[future] for future in done], [by_future[future] for future in not_done]
+
+    def cancel_all(self) -> int:
+        """Cancel every queued and running job. Returns the number of jobs cancelled."""
+        with self._lock:
+            jobs = list(self._jobs)
+        cancelled = sum(job.cancel() for job in jobs)
+        if cancelled:
+            logger.warning(f"Cancelled {cancelled} transcode jobs")
+        return cancelled
+
+    def stats(self) -> dict:
+        """Job outcomes, time jobs spent queued and running, and how busy the workers were."""
+        with self._lock:
+            stats = dict(self._stats, workers=self.workers, ffmpeg_threads=FFMPEG_THREADS, in_flight=len(self._jobs))
+        stats["busy_seconds"] = round(stats["busy_seconds"], 2)
+        stats["queued_seconds"] = round(stats["queued_seconds"], 2)
+        return stats
+
+    def shutdown(self, cancel_pending: bool = True):
+        if cancel_pending:
+            self.cancel_all()
+        self._executor.shutdown(wait=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_transcode_pool() -> TranscodePool:
+    """The process-wide transcode pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TranscodePool()
+            logger.info(f"Transcode pool with {_pool.workers} workers, {FFMPEG_THREADS} ffmpeg threads each")
+        return _pool
@@ -0,0 +1,235 @@
+"""
+Pluggable transcription backends.
+
+Every transcription in the pipeline goes through the backend selected by
+TRANSCRIPTION_BACKEND (constants.py):
+
+    openai  The OpenAI transcription API (default).
+    stub    A deterministic offline stand-in for tests and benchmarks: the transcript is
+            derived from the audio bytes and its length from the audio's duration.
+    local   faster-whisper on this machine's CPUs, for working through a backlog or
+            during provider outages. Needs `pip install faster-whisper`.
+
+Backends transcribe one file (transcribe) or several (transcribe_batch), and count calls,
+failures, wall time and audio seconds so their speed can be compared (stats). Callers that
+already know a file's duration pass it in, so the file is not probed again. Backends
+that run a single model of their own (single_model) ignore the requested model name, so
+the transcription strategies only run them once per file.
+"""
+import abc
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import TRANSCRIPTION_BACKEND
+from utils.audio_transcribe import audio_duration_seconds
+from utils.openai_llm import get_openai_client
+from utils.rate_limit import get_rate_limiter
+from utils.transcode_pool import available_cpus
+
+try:
+    from faster_whisper import WhisperModel
+except ImportError:
+    WhisperModel = None
+
+logger = logging.getLogger(__name__)
+
+# faster-whisper model size or path, and the CTranslate2 compute type it runs with on CPU
+LOCAL_WHISPER_MODEL = os.getenv("LOCAL_WHISPER_MODEL", "small")
+LOCAL_WHISPER_COMPUTE_TYPE = os.getenv("LOCAL_WHISPER_COMPUTE_TYPE", "int8")
+# Files transcribed at once by transcribe_batch on the remote backends
+TRANSCRIPTION_BATCH_CONCURRENCY = int(os.getenv("TRANSCRIPTION_BATCH_CONCURRENCY", "4"))
+
+
+class TranscriptionBackend(abc.ABC):
+    """
+    Base class of transcription backends.
+
+    Subclasses implement _transcribe. The model argument names the requested model
+    (e.g. "whisper-1"); backends that run a single model of their own ignore it and set
+    single_model.
+    """
+
+    name = None
+    # Whether the backend ignores the model name, so every model gives the same transcript
+    single_model = False
+    # Files a backend can usefully transcribe at once
+    batch_concurrency = TRANSCRIPTION_BATCH_CONCURRENCY
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0, "seconds": 0.0, "audio_seconds": 0.0}
+
+    @abc.abstractmethod
+    def _transcribe(self, audio_path: str, model: str, audio_seconds: float) -> str:
+        """Transcribes one audio file of audio_seconds seconds to plain text."""
+
+    def transcribe(self, audio_path: str, model: str = None, audio_seconds: float = None) -> str:
+        """
+        Transcribes one audio file to plain text.
+
+        Args:
+            audio_path: The audio file
+            model: The requested model
+            audio_seconds: Duration of the file, if known. Probed with ffmpeg otherwise.
+        """
+        if audio_seconds is None:
+            audio_seconds = audio_duration_seconds(audio_path) or 0.0
+        started_at = time.perf_counter()
+        try:
+            text = self._transcribe(audio_path, model, audio_seconds)
+        except Exception:
+            with self._lock:
+                self._stats["failures"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._stats["calls"] += 1
+                self._stats["seconds"] += time.perf_counter() - started_at
+        with self._lock:
+            self._stats["audio_seconds"] += audio_seconds
+        return text
+
+    def transcribe_batch(self, audio_paths: list, model: str = None, concurrency: int = None,
+                         audio_seconds: list = None) -> list:
+        """
+        Transcribes several audio files, up to batch_concurrency at once. Texts are in input order.
+
+        Args:
+            audio_paths: The audio files
+            model: The requested model
+            concurrency: Files transcribed at once, if fewer than batch_concurrency
+            audio_seconds: Durations of the files in the same order, if known
+        """
+        audio_seconds = audio_seconds or [None] * len(audio_paths)
+        workers = min(self.batch_concurrency, concurrency or self.batch_concurrency, len(audio_paths))
+        if workers <= 1:
+            return [self.transcribe(path, model, seconds) for path, seconds in zip(audio_paths, audio_seconds)]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"transcribe-{self.name}") as executor:
+            return list(executor.map(lambda path, seconds: self.transcribe(path, model, seconds),
+                                     audio_paths, audio_seconds))
+
+    def stats(self) -> dict:
+        """Calls, failures, time spent and audio transcribed, and seconds of audio per second of work."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["realtime_factor"] = round(stats["audio_seconds"] / stats["seconds"], 2) if stats["seconds"] else None
+        stats["seconds"] = round(stats["seconds"], 2)
+        stats["audio_seconds"] = round(stats["audio_seconds"], 2)
+        return dict(stats, backend=self.name)
+
+
+class OpenAIBackend(TranscriptionBackend):
+    """The OpenAI transcription API, through the shared audio client and request rate limiter."""
+
+    name = "openai"
+
+    def _transcribe(self, audio_path: str, model: str, audio_seconds: float) -> str:
+        # Each request gets its own file handle, as the upload reads the file to the end
+        with open(audio_path, 'rb') as audio_file:
+            get_rate_limiter("openai_requests").acquire()
+            return get_openai_client("audio").audio.transcriptions.create(
+                model=model or "gpt-4o-transcribe",
+                file=audio_file,
+                response_format="text",
+            )
+
+
+class StubBackend(TranscriptionBackend):
+    """
+    Deterministic offline backend.
+
+    Returns about STUB_WORDS_PER_MINUTE pseudo-words per minute of audio, chosen by a hash
+    of the file's bytes: the same audio always gives the same transcript, whatever the model.
+    """
+
+    name = "stub"
+    single_model = True
+    STUB_WORDS_PER_MINUTE = 130
+    STUB_VOCABULARY = ["we", "build", "software", "for", "small", "businesses", "customers", "pay", "monthly",
+                       "and", "our", "team", "has", "shipped", "three", "products", "revenue", "grew", "last", "year"]
+
+    def _transcribe(self, audio_path: str, model: str, audio_seconds: float) -> str:
+        digest = hashlib.sha256()
+        with open(audio_path, 'rb') as audio_file:
+            for block in iter(lambda: audio_file.read(1024 * 1024), b""):
+                digest.update(block)
+        seed = digest.digest()
+        word_count = max(1, int(audio_seconds * self.STUB_WORDS_PER_MINUTE / 60))
+        words = [self.STUB_VOCABULARY[(seed[index % len(seed)] + index) % len(self.STUB_VOCABULARY)]
+                 for index in range(word_count)]
+        return " ".join(words).capitalize() + "."
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    faster-whisper on the local CPU.
+
+    The model (LOCAL_WHISPER_MODEL) is loaded on first use and uses every available core,
+    so files are transcribed one at a time.
+    """
+
+    name = "local"
+    single_model = True
+    batch_concurrency = 1
+
+    def __init__(self, model_size: str = LOCAL_WHISPER_MODEL, compute_type: str = LOCAL_WHISPER_COMPUTE_TYPE):
+        if WhisperModel is None:
+            raise RuntimeError("The local transcription backend needs faster-whisper: pip install faster-whisper")
+        super().__init__()
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    def _load(self):
+        if self._model is None:
+            started_at = time.perf_counter()
+            self._model = WhisperModel(self.model_size, device="cpu", compute_type=self.compute_type,
+                                       cpu_threads=available_cpus())
+            logger.info(f"Loaded faster-whisper model {self.model_size} ({self.compute_type}) "
+                        f"in {time.perf_counter() - started_at:.1f}s")
+        return self._model
+
+    def _transcribe(self, audio_path: str, model: str, audio_seconds: float) -> str:
+        # One transcription at a time: each already uses all cores
+        with self._model_lock:
+            segments, _ = self._load().transcribe(audio_path, beam_size=5, vad_filter=True)
+            return " ".join(segment.text.strip() for segment in segments)
+
+
+# TRANSCRIPTION_BACKEND value -> backend class
+TRANSCRIPTION_BACKENDS = {
+    "openai": OpenAIBackend,
+    "stub": StubBackend,
+    "local": LocalWhisperBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_transcription_backend(name: str = None) -> TranscriptionBackend:
+    """
+    The shared instance of a transcription backend.
+
+    Args:
+        name: A key of TRANSCRIPTION_BACKENDS. Defaults to TRANSCRIPTION_BACKEND.
+    """
+    name = name or TRANSCRIPTION_BACKEND
+    if name not in TRANSCRIPTION_BACKENDS:
+        raise ValueError(f"Unknown transcription backend {name}, expected one of {', '.join(TRANSCRIPTION_BACKENDS)}")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = TRANSCRIPTION_BACKENDS[name]()
+        return _backends[name]
+
+
+def transcription_backend_stats() -> dict:
+    """Statistics of every backend used so far, by name."""
+    with _backends_lock:
+        backends = dict(_backends)
+    return {name: backend.stats() for name, backend in backends.items()}
@@ -0,0 +1,197 @@
+"""
+Strategies for choosing between transcription models.
+
+Transcribing every pitch with two models and keeping the longer text doubles the latency
+and cost of every transcription, and length says little about quality: a looping
+hallucination is long too. A strategy decides which models run and which transcript
+is kept:
+
+    primary_only  The primary model only.
+    fallback      The primary model; the fallback model too only if the primary transcript
+                  fails the quality check (or the request fails). The better one is kept.
+    parallel      Both models at once; the better transcript is kept.
+
+Backends that run a single model of their own (e.g. the local one) would give the same
+transcript for every model, so for them every strategy runs as primary_only.
+
+Transcripts are compared with transcript_quality, which checks speech rate against the
+audio's duration and penalizes repeated phrases. Every decision, with the quality
+figures of each candidate, is appended to TRANSCRIPTION_DECISION_LOG (JSON Lines).
+"""
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from constants import TRANSCRIPTION_STRATEGY
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTION_PRIMARY_MODEL = os.getenv("TRANSCRIPTION_PRIMARY_MODEL", "gpt-4o-transcribe")
+TRANSCRIPTION_FALLBACK_MODEL = os.getenv("TRANSCRIPTION_FALLBACK_MODEL", "whisper-1")
+TRANSCRIPTION_DECISION_LOG = os.getenv("TRANSCRIPTION_DECISION_LOG", "transcriptions/decisions.jsonl")
+
+# Conversational speech runs at roughly 120-160 words per minute. Far fewer words than that
+# means speech was dropped (e.g. a truncated transcript), far more means invented text.
+EXPECTED_WORDS_PER_MINUTE = 130
+MIN_WORDS_PER_MINUTE = 50
+MAX_WORDS_PER_MINUTE = 300
+# Share of repeated three-word phrases above which a transcript is considered to loop
+MAX_REPEATED_TRIGRAM_RATIO = 0.3
+
+
+def _words(text: str) -> list:
+    return [word for word in re.sub(r"[^\w\s']", " ", text.lower()).split() if word]
+
+
+def transcript_quality(text: str, audio_seconds: float = None) -> dict:
+    """
+    Heuristic quality of a transcript.
+
+    Args:
+        text: The transcript
+        audio_seconds: Duration of the transcribed audio, if known
+
+    Returns:
+        dict: words, words_per_minute, repeated_trigram_ratio, a score between 0 and 1
+        (higher is better), ok (whether it passes the quality check) and the problems found
+    """
+    words = _words(text or "")
+    words_per_minute = len(words) * 60 / audio_seconds if audio_seconds else None
+    trigrams = list(zip(words, words[1:], words[2:]))
+    repeated_ratio = 1 - len(set(trigrams)) / len(trigrams) if trigrams else 0.0
+
+    if words_per_minute is None:
+        coverage = 1.0 if words else 0.0
+    elif words_per_minute > MAX_WORDS_PER_MINUTE:
+        coverage = MAX_WORDS_PER_MINUTE / words_per_minute
+    else:
+        coverage = min(1.0, words_per_minute / EXPECTED_WORDS_PER_MINUTE)
+    score = coverage * (1 - repeated_ratio)
+
+    problems = []
+    if not words:
+        problems.append("empty transcript")
+    elif words_per_minute is not None and words_per_minute < MIN_WORDS_PER_MINUTE:
+        problems.append(f"only {words_per_minute:.0f} words per minute")
+    elif words_per_minute is not None and words_per_minute > MAX_WORDS_PER_MINUTE:
+        problems.append(f"{words_per_minute:.0f} words per minute")
+    if repeated_ratio > MAX_REPEATED_TRIGRAM_RATIO:
+        problems.append(f"{repeated_ratio:.0%} of phrases repeated")
+
+    return {
+        "words": len(words),
+        "words_per_minute": round(words_per_minute, 1) if words_per_minute is not None else None,
+        "repeated_trigram_ratio": round(repeated_ratio, 3),
+        "score": round(score, 4),
+        "ok": not problems,
+        "problems": problems,
+    }
+
+
+def _attempt(transcribe, model: str, audio_seconds: float) -> dict:
+    """Runs one model. Returns a candidate: model, seconds, and text and quality or error."""
+    started_at = time.perf_counter()
+    try:
+        text = transcribe(model)
+    except Exception as e:
+        logger.error(f"Transcription with {model} failed: {e}")
+        return {"model": model, "seconds": round(time.perf_counter() - started_at, 2),
+                "error": f"{type(e).__name__}: {e}"}
+    return {"model": model, "seconds": round(time.perf_counter() - started_at, 2), "text": text,
+            "quality": transcript_quality(text, audio_seconds)}
+
+
+def _best(candidates: list) -> dict:
+    """The successful candidate with the highest quality score; earlier candidates win ties."""
+    succeeded = [candidate for candidate in candidates if "text" in candidate]
+    if not succeeded:
+        return None
+    return max(succeeded, key=lambda candidate: (candidate["quality"]["ok"], candidate["quality"]["score"]))
+
+
+def primary_only(transcribe, audio_seconds: float) -> list:
+    return [_attempt(transcribe, TRANSCRIPTION_PRIMARY_MODEL, audio_seconds)]
+
+
+def fallback(transcribe, audio_seconds: float) -> list:
+    candidates = [_attempt(transcribe, TRANSCRIPTION_PRIMARY_MODEL, audio_seconds)]
+    if "text" not in candidates[0] or not candidates[0]["quality"]["ok"]:
+        candidates.append(_attempt(transcribe, TRANSCRIPTION_FALLBACK_MODEL, audio_seconds))
+    return candidates
+
+
+def parallel(transcribe, audio_seconds: float) -> list:
+    models = [TRANSCRIPTION_PRIMARY_MODEL, TRANSCRIPTION_FALLBACK_MODEL]
+    with ThreadPoolExecutor(max_workers=len(models), thread_name_prefix="transcribe-model") as executor:
+        return list(executor.map(lambda model: _attempt(transcribe, model, audio_seconds), models))
+
+
+# Strategy name -> function(transcribe, audio_seconds) returning the candidates it produced
+TRANSCRIPTION_STRATEGIES = {
+    "primary_only": primary_only,
+    "fallback": fallback,
+    "parallel": parallel,
+}
+
+_log_lock = threading.Lock()
+
+
+def log_decision(entry: dict):
+    """Appends a decision to TRANSCRIPTION_DECISION_LOG."""
+    try:
+        with _log_lock:
+            os.makedirs(os.path.dirname(TRANSCRIPTION_DECISION_LOG) or ".", exist_ok=True)
+            with open(TRANSCRIPTION_DECISION_LOG, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+    except Exception as e:
+        logger.error(f"Error writing transcription decision log: {e}")
+
+
+def transcribe_with_strategy(id, transcribe, audio_seconds: float = None,
+                             strategy: str = TRANSCRIPTION_STRATEGY, single_model: bool = False) -> str:
+    """
+    Transcribes an application's audio with a strategy and logs the decision.
+
+    Args:
+        id: The application ID, for the decision log
+        transcribe: Function transcribing the audio with a given model name
+        audio_seconds: Duration of the audio, used by the quality check
+        strategy: A key of TRANSCRIPTION_STRATEGIES
+        single_model: Whether the transcription backend ignores the model name, in which
+            case the strategy falls back to primary_only
+
+    Returns:
+        str: The chosen transcript
+
+    Raises:
+        RuntimeError: Every model the strategy tried failed
+    """
+    if strategy not in TRANSCRIPTION_STRATEGIES:
+        raise ValueError(f"Unknown transcription strategy {strategy}, expected one of {', '.join(TRANSCRIPTION_STRATEGIES)}")
+    if single_model and strategy != "primary_only":
+        logger.info(f"The transcription backend runs a single model, using primary_only instead of {strategy}")
+        strategy = "primary_only"
+    started_at = time.perf_counter()
+    candidates = TRANSCRIPTION_STRATEGIES[strategy](transcribe, audio_seconds)
+    chosen = _best(candidates)
+
+    log_decision({
+        "at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "application_id": str(id),
+        "strategy": strategy,
+        "audio_seconds": round(audio_seconds, 2) if audio_seconds else None,
+        "chosen_model": chosen["model"] if chosen else None,
+        "seconds": round(time.perf_counter() - started_at, 2),
+        "candidates": [{key: value for key, value in candidate.items() if key != "text"} for candidate in candidates],
+    })
+    if chosen is None:
+        raise RuntimeError(f"Transcription failed for ID {id}: " +
+                           "; ".join(f"{candidate['model']}: {candidate['error']}" for candidate in candidates))
+    logger.info(f"Using {chosen['model']} transcription for {id} ({strategy} strategy), "
+                 f"quality {chosen['quality']}")
+    return chosen["text"]